@@ -1,21 +1,383 @@
 ﻿import os
-from flask import Flask, render_template, request, redirect, url_for, flash, get_flashed_messages
+import atexit
+import functools
+import click
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, get_flashed_messages, has_request_context, g
+from flask import has_app_context, make_response
+from flask import before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
+from markupsafe import Markup
 from sqlalchemy import Enum
 from datetime import datetime
-import sqlite3
-from sqlalchemy import func, and_, or_
-from datetime import datetime, date
-from flask import send_file
-import pandas as pd
-from io import BytesIO
-
-app = Flask(__name__)
-app.secret_key = 'fleet_management_secret_key'
+from sqlalchemy import func, and_, or_, event, type_coerce, text, bindparam, create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload, selectinload, load_only
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from datetime import datetime, date, timedelta
+from flask import jsonify, Response, stream_with_context, send_file
+from collections import namedtuple
+import base64
+import math
+import cProfile
+import io
+import logging
+import pstats
+import tempfile
+import platform
+import subprocess
+import sys
+import tracemalloc
+import json
+import threading
+import time
+from exports import EXPORT_FORMATS, SINGLE_SHEET_FORMATS, iter_csv, build_file, iter_file, discard, write_file, counted
+from report_jobs import JobQueue, job_id as report_job_id
+from search import ensure_search_index, drop_search_table, rebuild_search_index, search
+from telemetry import TelemetryWriter, parse_reading
+from seed import fleet
+from metrics import Registry, COUNT_BUCKETS
+from benchmarks import summarize, percentile, load_baseline, save_baseline, regressions
+from render_cache import RenderCache, MemoryBackend, DiskBackend
+from lazy import lazy_module
+from migrations import Migration, schema_version, pending as pending_migrations, migrate
+from snapshots import Snapshot
+from versions import ensure_version_tracking, table_versions, version_key, etag_for
+from changes import (ensure_change_log, changes_since, latest_seq, compact as compact_changes,
+                     reset as reset_change_log, CursorExpired)
+from availability import IntervalIndex, OPEN_END, to_days, find_overlaps
+from utilization import (PERIODS as UTILIZATION_PERIODS, merge_spans, daily_counts, monthly_days, month_start,
+                         period_start, open_counts, open_monthly_days)
+from compliance import evaluate as evaluate_compliance, to_date
+from fuel import (TOTAL_COLUMNS as FUEL_TOTALS, add_intervals as fuel_intervals, totals as fuel_totals,
+                  merge_totals as merge_fuel_totals, economy as fuel_economy)
+from spatial import parse_position, grid_cell, cell_key, unit_vector, distances_km, nearest as nearest_points
+from geofence import make_fence, match_intervals, inside_assigned_fences, find_exits, benchmark as benchmark_geofences
+from bulk_import import open_upload, chunked, parse_text, parse_upper, parse_float, parse_int, parse_date
+
+# Imported on first use, so a worker starts without them
+np = lazy_module('numpy')
+pd = lazy_module('pandas')
+
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'fleet.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+
+def load_config(app):
+    """Read the settings from the environment into `app.config`."""
+    app.secret_key = 'fleet_management_secret_key'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'fleet.db'))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DASHBOARD_CACHE_TTL'] = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))
+    app.config['TELEMETRY_QUEUE_SIZE'] = int(os.environ.get('TELEMETRY_QUEUE_SIZE', 100000))
+    app.config['TELEMETRY_BATCH_SIZE'] = int(os.environ.get('TELEMETRY_BATCH_SIZE', 5000))
+    app.config['TELEMETRY_FLUSH_INTERVAL'] = float(os.environ.get('TELEMETRY_FLUSH_INTERVAL', 0.5))
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 500))
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+    app.config['PROFILING'] = os.environ.get('PROFILING') == '1'
+    app.config['REPORT_CACHE_SIZE'] = int(os.environ.get('REPORT_CACHE_SIZE', 256))
+    # Directory shared by all workers; unset keeps the report cache in memory only
+    app.config['REPORT_CACHE_DIR'] = os.environ.get('REPORT_CACHE_DIR')
+    app.config['REPORT_CACHE_DISK_ENTRIES'] = int(os.environ.get('REPORT_CACHE_DISK_ENTRIES', 2000))
+    # Shared by all workers so any of them can report progress and serve the file
+    app.config['REPORT_JOB_DIR'] = os.environ.get(
+        'REPORT_JOB_DIR', os.path.join(tempfile.gettempdir(), 'fleet_report_jobs'))
+    app.config['REPORT_JOB_WORKERS'] = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+    app.config['REPORT_JOB_TTL'] = int(os.environ.get('REPORT_JOB_TTL', 24 * 3600))
+    # Superseded change log entries are kept this long, deletes longer so slow consumers still see them
+    app.config['CHANGE_LOG_RETENTION_DAYS'] = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 7))
+    app.config['CHANGE_LOG_TOMBSTONE_DAYS'] = int(os.environ.get('CHANGE_LOG_TOMBSTONE_DAYS', 30))
+    # REPORT_SNAPSHOT=1 sends report and export reads to a backup copy of the
+    # database, refreshed once it is older than REPORT_SNAPSHOT_MAX_AGE seconds
+    app.config['REPORT_SNAPSHOT'] = os.environ.get('REPORT_SNAPSHOT') == '1'
+    app.config['REPORT_SNAPSHOT_MAX_AGE'] = int(os.environ.get('REPORT_SNAPSHOT_MAX_AGE', 300))
+    # Defaults to the database path plus ".snapshot"
+    app.config['REPORT_SNAPSHOT_PATH'] = os.environ.get('REPORT_SNAPSHOT_PATH')
+    # Each gunicorn worker has its own pool; size it for the worker's threads
+    # plus the telemetry writer
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': 30,
+    }
+    # SCHEMA_AUTO_MIGRATE=0 leaves migrations to "flask --app app migrate",
+    # e.g. as a release step before the workers start
+    app.config['SCHEMA_AUTO_MIGRATE'] = os.environ.get('SCHEMA_AUTO_MIGRATE', '1') == '1'
+    app.config['SCHEMA_MIGRATE_TIMEOUT'] = int(os.environ.get('SCHEMA_MIGRATE_TIMEOUT', 300))
+
+class RoutingSession(FlaskSession):
+    """Session that reads from the report snapshot inside reads_snapshot views."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('snapshot_engine') is not None:
+            return g.snapshot_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+# Every route and command; create_app() registers it without a URL prefix
+bp = Blueprint('fleet', __name__, cli_group=None)
+
+# SQLITE CONNECTIONS
+# WAL lets readers in every worker run alongside one writer. Transactions
+# that will write start with BEGIN IMMEDIATE so they queue on busy_timeout
+# for the write lock up front; a deferred transaction that read first and
+# upgrades later fails at once with "database is locked" when another
+# writer got in between.
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+LOCK_RETRIES = 3
+
+def configure_sqlite(dbapi_connection, connection_record):
+    # Hand transaction control to the begin hook below
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f"PRAGMA busy_timeout={current_app.config['SQLITE_BUSY_TIMEOUT']}")
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA mmap_size={current_app.config['SQLITE_MMAP_SIZE']}")
+    cursor.close()
+
+def begin_sqlite(conn):
+    immediate = conn.get_execution_options().get('begin_immediate') or (
+        has_request_context() and request.method in WRITE_METHODS)
+    conn.exec_driver_sql('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+
+def write_engine(engine):
+    """Engine whose transactions take the write lock as they begin."""
+    return engine.execution_options(begin_immediate=True)
+
+def retry_on_lock(fn, attempts=LOCK_RETRIES, delay=0.2):
+    """Call `fn`, retrying when SQLite is still locked after busy_timeout."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except OperationalError as e:
+            if 'locked' not in str(e.orig) or attempt == attempts - 1:
+                raise
+            time.sleep(delay * (attempt + 1))
+
+_daily_threads = {}
+_daily_threads_lock = threading.Lock()
+
+def seconds_until_tomorrow():
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    return max((tomorrow - datetime.now()).total_seconds(), 0)
+
+def run_daily(name, task):
+    """Run `task` on this worker's `name` thread, at once and then just after every midnight.
+
+    Started from the first request rather than create_app(), so CLI
+    commands never get one. Daily writes run here instead of in a request.
+    """
+    if name in _daily_threads:
+        return
+    with _daily_threads_lock:
+        if name in _daily_threads:
+            return
+        app = current_app._get_current_object()
+
+        def run():
+            while True:
+                with app.app_context():
+                    try:
+                        retry_on_lock(task)
+                    except Exception:
+                        app.logger.exception('Daily task %s failed', name)
+                time.sleep(seconds_until_tomorrow() + 1)
+        _daily_threads[name] = threading.Thread(target=run, name=name, daemon=True)
+        _daily_threads[name].start()
+
+# INSTRUMENTATION
+# Request time is split into SQL (cursor events), template rendering (Flask
+# template signals) and the rest, which for the export routes is mostly the
+# file writers. Timing stops when the response is closed, so streamed
+# exports are measured in full. Slow requests and statements are logged to
+# the "fleet.slow" logger with their SQL text.
+slow_log = logging.getLogger('fleet.slow')
+metrics = Registry()
+REQUEST_SECONDS = metrics.histogram(
+    'fleet_request_seconds', 'Request latency, including streamed bodies', ('endpoint', 'method', 'status'))
+REQUEST_SQL_SECONDS = metrics.histogram(
+    'fleet_request_sql_seconds', 'Time spent in SQL per request', ('endpoint',))
+REQUEST_SQL_STATEMENTS = metrics.histogram(
+    'fleet_request_sql_statements', 'SQL statements per request', ('endpoint',), COUNT_BUCKETS)
+REQUEST_TEMPLATE_SECONDS = metrics.histogram(
+    'fleet_request_template_seconds', 'Template rendering time per request', ('endpoint',))
+SQL_SECONDS = metrics.histogram(
+    'fleet_sql_seconds', 'SQL statement latency by statement type', ('operation',))
+SLOW_REQUESTS = metrics.counter(
+    'fleet_slow_requests_total', 'Requests over SLOW_REQUEST_MS', ('endpoint',))
+SLOW_QUERIES = metrics.counter(
+    'fleet_slow_queries_total', 'SQL statements over SLOW_QUERY_MS', ('operation',))
+metrics.gauge('fleet_telemetry_queue_depth', 'GPS readings waiting for the telemetry writer',
+              lambda: telemetry_writer.depth if telemetry_writer else 0)
+PROFILE_LINES = 60
+
+def _request_stats():
+    return g.get('request_stats') if has_request_context() else None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    SQL_SECONDS.observe(elapsed, operation=operation)
+    stats = _request_stats()
+    if stats is not None:
+        stats['sql_statements'] += 1
+        stats['sql_seconds'] += elapsed
+    if elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        SLOW_QUERIES.inc(operation=operation)
+        slow_log.warning('slow query %.0f ms (%s): %s', elapsed * 1000,
+                         request.endpoint if stats is not None else 'background', statement)
+
+def _query_failed(exception_context):
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+def instrument(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _query_failed)
+
+def _template_started(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+def _template_finished(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None and g.get('template_started') is not None:
+        stats['template_seconds'] += time.perf_counter() - g.pop('template_started')
+
+@bp.before_app_request
+def start_request_stats():
+    g.request_stats = {'started': time.perf_counter(), 'sql_statements': 0, 'sql_seconds': 0.0,
+                       'template_seconds': 0.0}
+    # Opt-in profiling: with PROFILING=1, add ?profile=1 to any URL
+    if current_app.config['PROFILING'] and request.args.get('profile'):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+def _finish_request_stats(stats, endpoint, method, status, path, slow_ms):
+    elapsed = time.perf_counter() - stats['started']
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=method, status=status)
+    REQUEST_SQL_SECONDS.observe(stats['sql_seconds'], endpoint=endpoint)
+    REQUEST_SQL_STATEMENTS.observe(stats['sql_statements'], endpoint=endpoint)
+    REQUEST_TEMPLATE_SECONDS.observe(stats['template_seconds'], endpoint=endpoint)
+    if elapsed * 1000 >= slow_ms:
+        SLOW_REQUESTS.inc(endpoint=endpoint)
+        slow_log.warning('slow request %.0f ms: %s %s (sql %d statements %.0f ms, templates %.0f ms)',
+                         elapsed * 1000, method, path, stats['sql_statements'],
+                         stats['sql_seconds'] * 1000, stats['template_seconds'] * 1000)
+
+def _profile_response(response, profiler):
+    # Run any streamed body inside the profiler before reporting
+    response.get_data()
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return Response(out.getvalue(), mimetype='text/plain')
+
+@bp.after_app_request
+def record_request_stats(response):
+    stats = g.get('request_stats')
+    if stats is None:
+        return response
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        response = _profile_response(response, profiler)
+    endpoint = request.endpoint or 'unmatched'
+    method, path, status = request.method, request.path, response.status_code
+    # Runs after the app context is gone, so it gets the threshold now
+    slow_ms = current_app.config['SLOW_REQUEST_MS']
+    response.call_on_close(lambda: _finish_request_stats(stats, endpoint, method, status, path, slow_ms))
+    return response
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# REPORT SNAPSHOT
+# Report and export views are wrapped in reads_snapshot. With REPORT_SNAPSHOT
+# on, their session reads from a copy of the database made with SQLite's
+# backup API (snapshots.py) through a separate read-only engine, so the
+# several queries of one report all see the same committed state and long
+# reads never hold up the form handlers' writes. The copy is refreshed in
+# the background once it is older than REPORT_SNAPSHOT_MAX_AGE, or on demand
+# with POST /reports/snapshot; the engine is disposed when the file changes
+# so new connections open the new copy. Report pages and exports carry the
+# snapshot time in the X-Snapshot-Taken-At header.
+report_snapshot = None
+_snapshot_engine = {'engine': None, 'identity': None}
+_snapshot_engine_lock = threading.Lock()
+
+def init_report_snapshot(app):
+    global report_snapshot
+    report_snapshot = None
+    if app.config['REPORT_SNAPSHOT'] and db.engine.dialect.name == 'sqlite' and db.engine.url.database:
+        database = os.path.abspath(db.engine.url.database)
+        report_snapshot = Snapshot(database, app.config['REPORT_SNAPSHOT_PATH'] or database + '.snapshot',
+                                   app.config['REPORT_SNAPSHOT_MAX_AGE'])
+
+def snapshot_engine():
+    """Read-only engine on the current snapshot, taking the first one if needed."""
+    report_snapshot.ensure()
+    identity = report_snapshot.identity()
+    with _snapshot_engine_lock:
+        engine = _snapshot_engine['engine']
+        if engine is None:
+            # immutable: the file never changes in place, so SQLite skips locking
+            engine = create_engine(f'sqlite:///file:{report_snapshot.path}?mode=ro&immutable=1&uri=true')
+            instrument(engine)
+            _snapshot_engine['engine'] = engine
+        elif identity != _snapshot_engine['identity']:
+            # Checked-out connections finish on the old file and are closed when returned
+            engine.dispose()
+        _snapshot_engine['identity'] = identity
+    return engine, identity[1] / 1e9
+
+def use_snapshot(engine, taken_at):
+    g.snapshot_engine = engine
+    g.snapshot_taken_at = datetime.fromtimestamp(taken_at)
+
+def reads_snapshot(view):
+    """Serve the view's database reads from the report snapshot when REPORT_SNAPSHOT is on."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if report_snapshot is None:
+            return view(*args, **kwargs)
+        use_snapshot(*snapshot_engine())
+        response = make_response(view(*args, **kwargs))
+        response.headers['X-Snapshot-Taken-At'] = g.snapshot_taken_at.isoformat(timespec='seconds')
+        return response
+    return wrapper
+
+def snapshot_status():
+    if report_snapshot is None:
+        return {'enabled': False}
+    status = report_snapshot.status()
+    if status['taken_at']:
+        status['taken_at'] = datetime.fromtimestamp(status['taken_at']).isoformat(timespec='seconds')
+    return dict(status, enabled=True)
+
+@bp.route('/reports/snapshot', methods=['GET', 'POST'])
+def report_snapshot_status():
+    if request.method == 'POST':
+        if report_snapshot is None:
+            return jsonify({'error': 'Report snapshots are off; set REPORT_SNAPSHOT=1'}), 409
+        report_snapshot.refresh_in_background()
+        return jsonify(snapshot_status()), 202
+    return jsonify(snapshot_status())
+
+@bp.cli.command('refresh-report-snapshot')
+def refresh_report_snapshot_command():
+    """Take a fresh report snapshot now."""
+    if report_snapshot is None:
+        raise SystemExit('Report snapshots are off; set REPORT_SNAPSHOT=1')
+    if not report_snapshot.take():
+        raise SystemExit('Another process is refreshing the report snapshot')
+    click.echo(f"Report snapshot taken: {snapshot_status()['taken_at']} ({report_snapshot.path})")
 
 # Enums for option fields
 VEHICLE_TYPES = ('Pickup', 'V8', 'Hardtop', 'Other')
@@ -37,16 +399,17 @@ class Vehicle(db.Model):
     fuel_capacity = db.Column(db.Float)
     fuel_consumption = db.Column(db.Float)
     loading_capacity = db.Column(db.String(100))
-    assigned_for = db.Column(Enum(*ASSIGNMENT_TYPES, name='assignment_types'))
+    assigned_for = db.Column(Enum(*ASSIGNMENT_TYPES, name='assignment_types'), index=True)
     
     # Relationships
-    compliance = db.relationship('Compliance', backref='vehicle', uselist=False)
+    # The compliance record is keyed by the plate, so it goes with the vehicle
+    compliance = db.relationship('Compliance', backref='vehicle', uselist=False, cascade='all, delete-orphan')
     maintenance = db.relationship('Maintenance', backref='vehicle')
     assignments = db.relationship('Assignment', backref='vehicle')
 
 class Driver(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     id_number = db.Column(db.String(50), unique=True)
     phone = db.Column(db.String(15))
     reporting_to = db.Column(db.String(100))
@@ -56,20 +419,20 @@ class Driver(db.Model):
 class Compliance(db.Model):
     plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), primary_key=True)
     insurance_type = db.Column(Enum(*INSURANCE_TYPES, name='insurance_types'))
-    insurance_date = db.Column(db.Date)
-    yearly_inspection = db.Column(Enum(*YES_NO, name='yes_no_types'))
-    inspection_date = db.Column(db.Date)
+    insurance_date = db.Column(db.Date, index=True)
+    yearly_inspection = db.Column(Enum(*YES_NO, name='yes_no_types'), index=True)
+    inspection_date = db.Column(db.Date, index=True)
     safety_audit = db.Column(Enum(*SAFETY_TYPES, name='safety_types'))
     utilization_history = db.Column(db.Text)
     accident_history = db.Column(db.Text)
 
 class Maintenance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'))
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), index=True)
     last_service_km = db.Column(db.Integer)
     last_service_date = db.Column(db.Date)
     next_service_km = db.Column(db.Integer)
-    next_service_date = db.Column(db.Date)
+    next_service_date = db.Column(db.Date, index=True)
     maintenance_center = db.Column(Enum(*MAINTENANCE_CENTERS, name='maintenance_centers'))
 
 class Assignment(db.Model):
@@ -82,66 +445,540 @@ class Assignment(db.Model):
     gps_position = db.Column(db.String(50))
     geofence_violations = db.Column(db.Integer)
 
+    # Every "active assignment" lookup filters on end_date, by vehicle, by driver or fleet-wide
+    __table_args__ = (
+        db.Index('ix_assignment_plate_number_end_date', 'plate_number', 'end_date'),
+        db.Index('ix_assignment_driver_id_end_date', 'driver_id', 'end_date'),
+        db.Index('ix_assignment_end_date', 'end_date'),
+        # Double-booking checks look for intervals of one vehicle or driver around a date
+        db.Index('ix_assignment_plate_number_start_date', 'plate_number', 'start_date'),
+        db.Index('ix_assignment_driver_id_start_date', 'driver_id', 'start_date'),
+    )
+
+class GpsReading(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+    speed = db.Column(db.Float)
+
+    # A device resending the same fix is ignored instead of stored twice
+    __table_args__ = (
+        db.UniqueConstraint('plate_number', 'recorded_at', name='uq_gps_reading_plate_number_recorded_at'),
+    )
+
+class VehiclePosition(db.Model):
+    """Latest GPS fix per vehicle, maintained by the telemetry writer."""
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), primary_key=True)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+    speed = db.Column(db.Float)
+
+class VehicleLocation(db.Model):
+    """Last known position per vehicle, keyed for nearest-vehicle searches (spatial.py)."""
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), primary_key=True)
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(10), nullable=False)  # 'gps' or 'assignment'
+    located_at = db.Column(db.DateTime)
+    cell = db.Column(db.Integer, nullable=False)  # Z-order key of the grid cell
+    # Unit vector of the position, so SQL can rank by distance with arithmetic alone
+    x = db.Column(db.Float, nullable=False)
+    y = db.Column(db.Float, nullable=False)
+    z = db.Column(db.Float, nullable=False)
+
+    # Searches rank the points of a few cell ranges; the index covers them
+    # so the ranking never visits the table
+    __table_args__ = (
+        db.Index('ix_vehicle_location_cell', 'cell', 'x', 'y', 'z', 'plate_number'),
+    )
+
+class Odometer(db.Model):
+    """Latest odometer reading per vehicle, from telemetry or entered by hand."""
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), primary_key=True)
+    km = db.Column(db.Integer, nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+
+class MaintenanceSchedule(db.Model):
+    """Next service due per vehicle, kept in step with its latest maintenance record and odometer."""
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), primary_key=True)
+    maintenance_id = db.Column(db.Integer, db.ForeignKey('maintenance.id'), nullable=False)
+    maintenance_center = db.Column(Enum(*MAINTENANCE_CENTERS, name='maintenance_centers'))
+    last_service_date = db.Column(db.Date)
+    last_service_km = db.Column(db.Integer)
+    next_service_date = db.Column(db.Date)
+    next_service_km = db.Column(db.Integer)
+    odometer_km = db.Column(db.Integer)
+    km_remaining = db.Column(db.Integer)
+    due_date = db.Column(db.Date)  # earlier of next_service_date and the day the km threshold is (projected to be) reached
+    due_by = db.Column(db.String(4))  # 'date' or 'km'
+
+    # Ranked due/overdue lists read these in due_date order, fleet-wide or per center
+    __table_args__ = (
+        db.Index('ix_maintenance_schedule_center_due_date', 'maintenance_center', 'due_date'),
+        db.Index('ix_maintenance_schedule_due_date', 'due_date'),
+    )
+
+class ComplianceStatus(db.Model):
+    """Stored result of the compliance rules for each vehicle with a compliance record."""
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), primary_key=True)
+    status = db.Column(db.String(10), nullable=False)  # 'ok', 'warning' or 'violation'
+    issue_count = db.Column(db.Integer, nullable=False)
+    summary = db.Column(db.String(200))
+    issues = db.Column(db.Text)  # JSON list of {issue, severity, expires}
+    insurance_expires = db.Column(db.Date)
+    inspection_expires = db.Column(db.Date)
+    next_check = db.Column(db.Date)  # first day the status can change without an edit
+    evaluated_on = db.Column(db.Date, nullable=False)
+
+    vehicle = db.relationship('Vehicle')
+
+    __table_args__ = (
+        db.Index('ix_compliance_status_status_plate_number', 'status', 'plate_number'),
+        db.Index('ix_compliance_status_issue_count_plate_number', 'issue_count', 'plate_number'),
+        db.Index('ix_compliance_status_next_check', 'next_check'),
+    )
+
+    @property
+    def issue_list(self):
+        return json.loads(self.issues or '[]')
+
+class UtilizationSpan(db.Model):
+    """Days a vehicle was on assignment, merged across its assignments."""
+    id = db.Column(db.Integer, primary_key=True)
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), nullable=False, index=True)
+    assigned_for = db.Column(db.String(20), nullable=False)  # vehicle category the span was counted under
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date)  # None while the vehicle's current assignment is open-ended
+
+    # Open spans are read on every utilization query and grow each day without a write
+    __table_args__ = (
+        db.Index('ix_utilization_span_end_date', 'end_date'),
+    )
+
+class UtilizationDay(db.Model):
+    """Vehicles of a category on a closed span each day; open spans are added when read."""
+    assigned_for = db.Column(db.String(20), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    vehicles = db.Column(db.Integer, nullable=False)
+
+    # Fleet-wide reports read a date range across every category
+    __table_args__ = (
+        db.Index('ix_utilization_day_day', 'day'),
+    )
+
+class UtilizationMonth(db.Model):
+    """Days of each month a vehicle spent on closed spans."""
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    days = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_utilization_month_month', 'month'),
+    )
+
+class FuelLog(db.Model):
+    """One fill-up; the interval columns cover the distance driven on this fill's fuel."""
+    id = db.Column(db.Integer, primary_key=True)
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), nullable=False)
+    filled_on = db.Column(db.Date, nullable=False)
+    liters = db.Column(db.Float, nullable=False)
+    odometer_km = db.Column(db.Integer, nullable=False)
+    station = db.Column(db.String(100))
+    cost = db.Column(db.Float)
+    distance_km = db.Column(db.Integer)  # since the previous fill; None on a vehicle's first fill
+    km_per_liter = db.Column(db.Float)
+    anomaly = db.Column(db.String(4))  # 'low' or 'high' against the vehicle's rated consumption
+
+    # Re-imported fill-ups are skipped; a vehicle's fills are read in odometer order
+    __table_args__ = (
+        db.UniqueConstraint('plate_number', 'odometer_km', 'filled_on',
+                            name='uq_fuel_log_plate_number_odometer_km_filled_on'),
+    )
+
+class FuelStats(db.Model):
+    """Running fuel totals per vehicle, kept in step with its fuel log."""
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), primary_key=True)
+    fuel_type = db.Column(db.String(20), nullable=False)  # fuel_fleet_stats row the totals are counted in
+    vehicle_type = db.Column(db.String(20), nullable=False)
+    rated_km_per_liter = db.Column(db.Float)
+    fills = db.Column(db.Integer, nullable=False)
+    first_km = db.Column(db.Integer, nullable=False)
+    last_km = db.Column(db.Integer, nullable=False)
+    last_filled_on = db.Column(db.Date, nullable=False)
+    distance_km = db.Column(db.Integer, nullable=False)
+    liters = db.Column(db.Float, nullable=False)  # burned over distance_km, so the first fill is left out
+    cost = db.Column(db.Float, nullable=False)
+    costed_km = db.Column(db.Integer, nullable=False)  # distance on fills with a cost
+    anomalies = db.Column(db.Integer, nullable=False)
+    recent = db.Column(db.Text)  # JSON list of [distance_km, liters] for the latest intervals
+    km_per_liter = db.Column(db.Float)
+    recent_km_per_liter = db.Column(db.Float)
+    cost_per_km = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index('ix_fuel_stats_anomalies', 'anomalies'),
+    )
+
+class FuelFleetStats(db.Model):
+    """fuel_stats totals summed per fuel type and vehicle type."""
+    fuel_type = db.Column(db.String(20), primary_key=True)
+    vehicle_type = db.Column(db.String(20), primary_key=True)
+    vehicles = db.Column(db.Integer, nullable=False)
+    fills = db.Column(db.Integer, nullable=False)
+    distance_km = db.Column(db.Integer, nullable=False)
+    liters = db.Column(db.Float, nullable=False)
+    cost = db.Column(db.Float, nullable=False)
+    costed_km = db.Column(db.Integer, nullable=False)
+    anomalies = db.Column(db.Integer, nullable=False)
+
+class Geofence(db.Model):
+    """Polygon a vehicle must stay inside, for one assignment or every assignment at a work place."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    work_place = db.Column(db.String(100), index=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), index=True)
+    polygon = db.Column(db.Text, nullable=False)  # JSON list of [lat, lon] vertices
+
+class GeofenceViolation(db.Model):
+    """One exit of an assignment's vehicle from all of its geofences."""
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    plate_number = db.Column(db.String(20), db.ForeignKey('vehicle.plate_number'), nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_geofence_violation_assignment_id_recorded_at', 'assignment_id', 'recorded_at'),
+    )
+
+class GeofenceState(db.Model):
+    """Whether each assignment's vehicle was inside its geofences at the last evaluated fix."""
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), primary_key=True)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    inside = db.Column(db.Boolean, nullable=False)
+
+# ACTIVE ASSIGNMENTS
+def assignment_is_active(on=None):
+    """Filter for assignments that have not ended by `on` (default today)."""
+    on = on or date.today()
+    return or_(Assignment.end_date.is_(None), Assignment.end_date >= on)
+
+def vehicle_is_assigned(on=None):
+    """Correlated EXISTS for vehicles with an active assignment, served from
+    ix_assignment_plate_number_end_date."""
+    return db.session.query(Assignment.id).filter(
+        Assignment.plate_number == Vehicle.plate_number,
+        assignment_is_active(on)
+    ).exists()
+
+def active_assignment_counts(on=None):
+    """Return (ongoing assignments, unassigned vehicles) for the summary reports."""
+    ongoing = db.session.query(func.count(Assignment.id)).filter(assignment_is_active(on)).scalar()
+    unassigned = db.session.query(func.count(Vehicle.plate_number)).filter(~vehicle_is_assigned(on)).scalar()
+    return ongoing, unassigned
+
+# PAGINATION
+PAGE_SIZE = 50
+TYPEAHEAD_LIMIT = 20
+EXPORT_CHUNK_SIZE = 1000
+
+Page = namedtuple('Page', ['items', 'sort', 'descending', 'next_url', 'first_url'])
+
+# Sort options per list page. Each list pages by (sort expression, primary key)
+# so the cursor stays stable when sort values repeat.
+VEHICLE_SORTS = {
+    'plate_number': Vehicle.plate_number,
+    'make': func.coalesce(Vehicle.make, ''),
+    'year': func.coalesce(Vehicle.year, ''),
+    'vehicle_type': func.coalesce(Vehicle.vehicle_type, ''),
+}
+DRIVER_SORTS = {
+    'name': Driver.name,
+    'id_number': func.coalesce(Driver.id_number, ''),
+    'id': Driver.id,
+}
+ASSIGNMENT_SORTS = {
+    'start_date': func.coalesce(type_coerce(Assignment.start_date, db.String), ''),
+    'plate_number': func.coalesce(Assignment.plate_number, ''),
+    'id': Assignment.id,
+}
+
+def encode_cursor(sort_value, key_value):
+    raw = json.dumps([sort_value, key_value]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, key_value = json.loads(raw)
+        return sort_value, key_value
+    except (ValueError, TypeError):
+        return None
+
+def keyset_page(query, sorts, key_column, default_sort):
+    """Return one page of `query` using the sort/dir/cursor request arguments.
+
+    Rows are ordered by (sort expression, key column) and the page starts after
+    the cursor row, so every page costs one indexed range read no matter how
+    deep into the list it is.
+    """
+    sort = request.args.get('sort', default_sort)
+    if sort not in sorts:
+        sort = default_sort
+    sort_expr = sorts[sort]
+    descending = request.args.get('dir') == 'desc'
+
+    decoded = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    if decoded:
+        sort_value, key_value = decoded
+        if descending:
+            query = query.filter(or_(
+                sort_expr < sort_value,
+                and_(sort_expr == sort_value, key_column < key_value)
+            ))
+        else:
+            query = query.filter(or_(
+                sort_expr > sort_value,
+                and_(sort_expr == sort_value, key_column > key_value)
+            ))
+
+    if descending:
+        query = query.order_by(sort_expr.desc(), key_column.desc())
+    else:
+        query = query.order_by(sort_expr, key_column)
+
+    rows = query.add_columns(sort_expr, key_column).limit(PAGE_SIZE + 1).all()
+    items = [row[0] for row in rows[:PAGE_SIZE]]
+
+    args = request.args.to_dict()
+    args.pop('cursor', None)
+    first_url = url_for(request.endpoint, **args)
+    next_url = None
+    if len(rows) > PAGE_SIZE:
+        last = rows[PAGE_SIZE - 1]
+        next_url = url_for(request.endpoint, cursor=encode_cursor(last[1], last[2]), **args)
+    return Page(items, sort, descending, next_url, first_url)
+
+def filter_by_options(query, model, fields):
+    """Apply equality filters from the request for fields whose value is a valid option."""
+    for field, options in fields.items():
+        value = request.args.get(field)
+        if value in options:
+            query = query.filter(getattr(model, field) == value)
+    return query
+
 def get_dashboard_counts():
-    conn = sqlite3.connect('fleet.db')
-    cursor = conn.cursor()
+    vehicle_count = db.session.execute(text("SELECT COUNT(*) FROM vehicle")).scalar()
     
-    cursor.execute("SELECT COUNT(*) FROM vehicle")
-    vehicle_count = cursor.fetchone()[0]
+    driver_count = db.session.execute(text("SELECT COUNT(*) FROM driver")).scalar()
     
-    cursor.execute("SELECT COUNT(*) FROM driver")
-    driver_count = cursor.fetchone()[0]
+    assignment_count = db.session.execute(text("SELECT COUNT(*) FROM assignment WHERE end_date IS NULL")).scalar()
     
-    cursor.execute("SELECT COUNT(*) FROM assignment WHERE end_date IS NULL")
-    assignment_count = cursor.fetchone()[0]
-    
-    cursor.execute('''
-        SELECT v.plate_number, v.make, v.model, m.next_service_date, m.maintenance_center 
-        FROM maintenance m
-        JOIN vehicle v ON m.plate_number = v.plate_number
-        WHERE m.next_service_date <= date('now', '+7 days')
-        ORDER BY m.next_service_date
+    maintenance_due = db.session.execute(text('''
+        SELECT v.plate_number, v.make, v.model, s.due_date, s.maintenance_center 
+        FROM maintenance_schedule s
+        JOIN vehicle v ON s.plate_number = v.plate_number
+        WHERE s.due_date <= date('now', '+7 days')
+        ORDER BY s.due_date
         LIMIT 5
-    ''')
-    maintenance_due = cursor.fetchall()
+    ''')).all()
     
-    cursor.execute('''
-        SELECT v.plate_number, v.make, v.model, 
-               CASE 
-                   WHEN c.yearly_inspection = 'No' THEN 'Inspection Missing'
-                   WHEN c.inspection_date < date('now', '-1 year') THEN 'Inspection Expired'
-                   WHEN c.insurance_date < date('now', '-1 year') THEN 'Insurance Expired'
-                   ELSE 'Unknown Issue'
-               END AS issue_type
-        FROM compliance c
-        JOIN vehicle v ON c.plate_number = v.plate_number
-        WHERE c.yearly_inspection = 'No' 
-            OR c.inspection_date < date('now', '-1 year')
-            OR c.insurance_date < date('now', '-1 year')
+    compliance_issues = db.session.execute(text('''
+        SELECT v.plate_number, v.make, v.model, s.summary AS issue_type
+        FROM compliance_status s
+        JOIN vehicle v ON s.plate_number = v.plate_number
+        WHERE s.status = 'violation'
+        ORDER BY s.plate_number
         LIMIT 5
-    ''')
-    compliance_issues = cursor.fetchall()
-    
-    conn.close()
+    ''')).all()
     
-    return vehicle_count, driver_count, assignment_count, maintenance_due, compliance_issues
+    return (vehicle_count, driver_count, assignment_count,
+            [tuple(r) for r in maintenance_due], [tuple(r) for r in compliance_issues])
+
+# DASHBOARD SNAPSHOT
+class DashboardSnapshot:
+    """Caches the dashboard counts for DASHBOARD_CACHE_TTL seconds.
+
+    Commits that touch any dashboard model drop the cached value in this
+    process; other worker processes pick the change up when their TTL runs out.
+    """
+
+    def __init__(self, compute):
+        self._compute = compute
+        self._lock = threading.Lock()
+        self._value = None
+        self._computed_at = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, ttl):
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._computed_at < ttl:
+                self.hits += 1
+                return self._value
+            self.misses += 1
+        value = self._compute()
+        with self._lock:
+            self._value = value
+            self._computed_at = time.monotonic()
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._computed_at = None
+            self.invalidations += 1
+
+    @property
+    def age(self):
+        if self._computed_at is None:
+            return None
+        return time.monotonic() - self._computed_at
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'age_seconds': round(self.age, 3) if self.age is not None else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+dashboard_snapshot = DashboardSnapshot(get_dashboard_counts)
+
+DASHBOARD_MODELS = (Vehicle, Driver, Assignment, Maintenance, Compliance)
+
+@event.listens_for(db.session, 'after_flush')
+def _track_dashboard_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, DASHBOARD_MODELS):
+            session.info['dashboard_dirty'] = True
+            return
 
-@app.before_request
-def create_tables():
-    db.create_all()
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_dashboard(session):
+    if session.info.pop('dashboard_dirty', False):
+        dashboard_snapshot.invalidate()
 
-@app.route('/')
+@event.listens_for(db.session, 'after_rollback')
+def _discard_dashboard_changes(session):
+    session.info.pop('dashboard_dirty', None)
+
+# SCHEMA
+# The schema is brought up to date once per process, by create_app() at
+# startup or ahead of a deploy with "flask --app app migrate", and never
+# per request. Migrations are numbered (migrations.py) and recorded in the
+# database. Each version has its own step that only does what that version
+# added, so a model change appends a new step to MIGRATIONS rather than
+# editing an applied one.
+SCHEMA_V1_TABLES = (
+    'vehicle', 'driver', 'assignment', 'compliance', 'compliance_status', 'maintenance',
+    'maintenance_schedule', 'gps_reading', 'vehicle_position', 'odometer', 'geofence', 'geofence_state',
+    'geofence_violation', 'utilization_span', 'utilization_day', 'utilization_month', 'fuel_log',
+    'fuel_stats', 'fuel_fleet_stats',
+)
+
+def create_tables(conn, names):
+    """Create the tables `names` and any of their indexes that are missing.
+
+    create_all() only builds indexes together with a new table, so databases
+    created before an index was declared would otherwise never get it.
+    """
+    tables = [db.metadata.tables[name] for name in names]
+    db.metadata.create_all(conn, tables=tables)
+    for table in tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def schema_v1(conn):
+    """Tables up to the fuel log, the version and change-log triggers, search index and derived tables."""
+    create_tables(conn, SCHEMA_V1_TABLES)
+    ensure_version_tracking(conn)
+    ensure_change_log(conn, captured_tables())
+    ensure_search_index(conn)
+    ensure_maintenance_schedule(conn)
+    ensure_compliance_status(conn)
+    ensure_utilization(conn)
+    ensure_fuel_stats(conn)
+
+def schema_v2(conn):
+    """vehicle_location and its grid index, filled from GPS fixes and assignment positions."""
+    create_tables(conn, ['vehicle_location'])
+    refresh_vehicle_locations(conn)
+
+def schema_v3(conn):
+    """Rebuild vehicle_fts on ids from vehicle_fts_key instead of vehicle's implicit rowids."""
+    drop_search_table(conn, 'vehicle_fts')
+    ensure_search_index(conn)
+
+MIGRATIONS = [
+    Migration(1, 'Tables, indexes, triggers, search index and derived tables', schema_v1),
+    Migration(2, 'Vehicle locations on a grid for nearest-vehicle searches', schema_v2),
+    Migration(3, 'Vehicle search index keyed by plate rather than rowid', schema_v3),
+]
+
+def migrate_schema(target=None):
+    """Apply pending migrations; returns those applied."""
+    return migrate(write_engine(db.engine), MIGRATIONS, target)
+
+def bootstrap_schema(app):
+    """Migrate at startup, or wait for the worker that got the write lock first."""
+    with db.engine.connect() as conn:
+        todo = pending_migrations(conn, MIGRATIONS)
+    if not todo:
+        return
+    if not app.config['SCHEMA_AUTO_MIGRATE']:
+        app.logger.warning('%d schema migration(s) pending; run "flask --app app migrate"', len(todo))
+        return
+    deadline = time.time() + app.config['SCHEMA_MIGRATE_TIMEOUT']
+    while True:
+        try:
+            for migration in migrate_schema():
+                app.logger.info('Applied schema migration %d: %s', migration.version, migration.description)
+            return
+        except OperationalError as e:
+            if 'locked' not in str(e.orig) or time.time() > deadline:
+                raise
+
+@bp.cli.command('migrate')
+@click.option('--to', 'target', type=int, help='Stop after this schema version')
+@click.option('--status', 'show_status', is_flag=True, help='List migrations without applying any')
+def migrate_command(target, show_status):
+    """Apply pending schema migrations."""
+    if not show_status:
+        for migration in migrate_schema(target):
+            click.echo(f'Applied {migration.version}: {migration.description}')
+    with db.engine.connect() as conn:
+        version = schema_version(conn)
+    if show_status:
+        for migration in MIGRATIONS:
+            click.echo(f"{'applied' if migration.version <= version else 'pending':<8} "
+                       f"{migration.version:>4}  {migration.description}")
+    click.echo(f'Schema at version {version} of {MIGRATIONS[-1].version}')
+
+@bp.route('/')
 def index():
-    counts = get_dashboard_counts()
+    counts = dashboard_snapshot.get(current_app.config['DASHBOARD_CACHE_TTL'])
     return render_template('index.html', 
                            vehicle_count=counts[0],
                            driver_count=counts[1],
                            assignment_count=counts[2],
                            maintenance_due=counts[3],
-                           compliance_issues=counts[4])
+                           compliance_issues=counts[4],
+                           snapshot=dashboard_snapshot.stats())
+
+@bp.route('/dashboard/stats')
+def dashboard_stats():
+    return jsonify(dashboard_snapshot.stats())
 
 # VEHICLE MANAGEMENT
-@app.route('/vehicles', methods=['GET', 'POST'])
+@bp.route('/vehicles', methods=['GET', 'POST'])
 def manage_vehicles():
     if request.method == 'POST':
         plate_number = request.form['plate_number'].upper().strip()
@@ -149,7 +986,7 @@ def manage_vehicles():
         # Check if plate number already exists
         if Vehicle.query.get(plate_number):
             flash('Plate number already exists!', 'danger')
-            return redirect(url_for('manage_vehicles'))
+            return redirect(url_for('fleet.manage_vehicles'))
         
         new_vehicle = Vehicle(
             plate_number=plate_number,
@@ -167,12 +1004,19 @@ def manage_vehicles():
         db.session.add(new_vehicle)
         db.session.commit()
         flash('Vehicle added successfully!', 'success')
-        return redirect(url_for('manage_vehicles'))
+        return redirect(url_for('fleet.manage_vehicles'))
     
-    vehicles = Vehicle.query.all()
-    return render_template('vehicles.html', vehicles=vehicles)
+    query = filter_by_options(Vehicle.query, Vehicle, {
+        'vehicle_type': VEHICLE_TYPES,
+        'fuel_type': FUEL_TYPES,
+        'assigned_for': ASSIGNMENT_TYPES,
+    })
+    page = keyset_page(query, VEHICLE_SORTS, Vehicle.plate_number, 'plate_number')
+    return render_template('vehicles.html', vehicles=page.items, page=page,
+                           vehicle_types=VEHICLE_TYPES, fuel_types=FUEL_TYPES,
+                           assignment_types=ASSIGNMENT_TYPES)
 
-@app.route('/vehicles/<plate_number>', methods=['GET', 'POST'])
+@bp.route('/vehicles/<plate_number>', methods=['GET', 'POST'])
 def edit_vehicle(plate_number):
     vehicle = Vehicle.query.get_or_404(plate_number)
     
@@ -189,27 +1033,41 @@ def edit_vehicle(plate_number):
         vehicle.assigned_for = request.form['assigned_for']
         db.session.commit()
         flash('Vehicle updated successfully!', 'success')
-        return redirect(url_for('manage_vehicles'))
+        return redirect(url_for('fleet.manage_vehicles'))
     
     return render_template('edit_vehicle.html', vehicle=vehicle)
 
-@app.route('/vehicles/delete/<plate_number>')
+@bp.route('/vehicles/typeahead')
+def vehicle_typeahead():
+    prefix = request.args.get('q', '').upper().strip()
+    query = db.session.query(Vehicle.plate_number, Vehicle.make, Vehicle.model)
+    if prefix:
+        # Range on the primary key instead of LIKE so SQLite can seek the index
+        query = query.filter(Vehicle.plate_number >= prefix,
+                             Vehicle.plate_number < prefix + '\uffff')
+    rows = query.order_by(Vehicle.plate_number).limit(TYPEAHEAD_LIMIT).all()
+    return jsonify([{
+        'value': r.plate_number,
+        'label': f"{r.plate_number} - {r.make or ''} {r.model or ''}".strip()
+    } for r in rows])
+
+@bp.route('/vehicles/delete/<plate_number>')
 def delete_vehicle(plate_number):
     vehicle = Vehicle.query.get_or_404(plate_number)
     db.session.delete(vehicle)
     db.session.commit()
     flash('Vehicle deleted successfully!', 'success')
-    return redirect(url_for('manage_vehicles'))
+    return redirect(url_for('fleet.manage_vehicles'))
 
 # DRIVER MANAGEMENT
-@app.route('/drivers', methods=['GET', 'POST'])
+@bp.route('/drivers', methods=['GET', 'POST'])
 def manage_drivers():
     if request.method == 'POST':
         phone = request.form['phone'].strip()
         # Validate Ethiopian phone number
         #if not phone.startswith('+251'):
             #flash('Phone must start with +251', 'danger')
-        #return redirect(url_for('manage_drivers'))
+        #return redirect(url_for('fleet.manage_drivers'))
         
         new_driver = Driver(
             name=request.form['name'],
@@ -220,12 +1078,16 @@ def manage_drivers():
         db.session.add(new_driver)
         db.session.commit()
         flash('Driver added successfully!', 'success')
-        return redirect(url_for('manage_drivers'))
+        return redirect(url_for('fleet.manage_drivers'))
     
-    drivers = Driver.query.all()
-    return render_template('drivers.html', drivers=drivers)
+    query = Driver.query
+    name = request.args.get('q', '').strip()
+    if name:
+        query = query.filter(Driver.name.like(f'{name}%'))
+    page = keyset_page(query, DRIVER_SORTS, Driver.id, 'name')
+    return render_template('drivers.html', drivers=page.items, page=page)
 
-@app.route('/drivers/<int:driver_id>', methods=['GET', 'POST'])
+@bp.route('/drivers/<int:driver_id>', methods=['GET', 'POST'])
 def edit_driver(driver_id):
     driver = Driver.query.get_or_404(driver_id)
     
@@ -233,7 +1095,7 @@ def edit_driver(driver_id):
         phone = request.form['phone'].strip()
         #if not phone.startswith('+251'):
             #flash('Phone must start with +251', 'danger')
-        #return redirect(url_for('edit_driver', driver_id=driver_id))
+        #return redirect(url_for('fleet.edit_driver', driver_id=driver_id))
             
         driver.name = request.form['name']
         driver.id_number = request.form['id_number']
@@ -241,20 +1103,137 @@ def edit_driver(driver_id):
         driver.reporting_to = request.form['reporting_to']
         db.session.commit()
         flash('Driver updated successfully!', 'success')
-        return redirect(url_for('manage_drivers'))
+        return redirect(url_for('fleet.manage_drivers'))
     
     return render_template('edit_driver.html', driver=driver)
 
-@app.route('/drivers/delete/<int:driver_id>')
+@bp.route('/drivers/typeahead')
+def driver_typeahead():
+    prefix = request.args.get('q', '').strip()
+    query = db.session.query(Driver.id, Driver.name, Driver.id_number)
+    if prefix:
+        query = query.filter(or_(
+            Driver.name.like(f'{prefix}%'),
+            and_(Driver.id_number >= prefix, Driver.id_number < prefix + '\uffff')
+        ))
+    rows = query.order_by(Driver.name, Driver.id).limit(TYPEAHEAD_LIMIT).all()
+    return jsonify([{
+        'value': r.id,
+        'label': f"{r.name} ({r.id_number})"
+    } for r in rows])
+
+@bp.route('/drivers/delete/<int:driver_id>')
 def delete_driver(driver_id):
     driver = Driver.query.get_or_404(driver_id)
     db.session.delete(driver)
     db.session.commit()
     flash('Driver deleted successfully!', 'success')
-    return redirect(url_for('manage_drivers'))
+    return redirect(url_for('fleet.manage_drivers'))
+
+# AVAILABILITY
+# A vehicle or driver may only be on one assignment on any given day. Writes
+# are checked in SQL against the (owner, start_date) indexes, inside the
+# form's BEGIN IMMEDIATE transaction, so two requests cannot book the same
+# slot. Fleet-wide "who is free between two dates" questions are answered
+# from an IntervalIndex over all assignments, rebuilt in each process only
+# when the assignment table's version changes.
+def assignment_conflicts(plate_number, driver_id, start_date, end_date, exclude_id=None):
+    """Assignments of the same vehicle or driver that share a day with the given range."""
+    query = Assignment.query.filter(
+        or_(Assignment.plate_number == plate_number, Assignment.driver_id == driver_id),
+        assignment_is_active(start_date)
+    )
+    if end_date is not None:
+        query = query.filter(or_(Assignment.start_date.is_(None), Assignment.start_date <= end_date))
+    if exclude_id is not None:
+        query = query.filter(Assignment.id != exclude_id)
+    return query.order_by(Assignment.start_date).all()
+
+def conflict_message(conflicts, plate_number):
+    parts = []
+    for other in conflicts:
+        who = f'vehicle {other.plate_number}' if other.plate_number == plate_number else f'driver #{other.driver_id}'
+        until = other.end_date.strftime('%Y-%m-%d') if other.end_date else 'open-ended'
+        parts.append(f'{who} is on assignment #{other.id} ({other.start_date} to {until})')
+    return 'Double booking: ' + '; '.join(parts)
+
+class AvailabilityCache:
+    """IntervalIndex over every assignment, rebuilt when the assignment table changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = None
+        self.builds = 0
+
+    def get(self, conn):
+        version = version_key(table_versions(conn, ['assignment']))
+        with self._lock:
+            if version == self._version:
+                return self._index
+        rows = conn.exec_driver_sql(
+            'SELECT id, plate_number, driver_id, start_date, end_date FROM assignment').all()
+        ids, plates, drivers, starts, ends = zip(*rows) if rows else ((),) * 5
+        index = IntervalIndex(np.array(ids, dtype=np.int64), to_days(starts, 0), to_days(ends, OPEN_END),
+                              {'vehicle': plates, 'driver': drivers})
+        with self._lock:
+            self._version, self._index = version, index
+            self.builds += 1
+        return index
+
+availability_cache = AvailabilityCache()
+
+@bp.route('/api/availability')
+def availability():
+    """Vehicles or drivers with no assignment between ?start= and ?end= (inclusive)."""
+    kind = request.args.get('kind', 'vehicles')
+    if kind not in ('vehicles', 'drivers'):
+        return jsonify({'error': 'kind must be vehicles or drivers'}), 400
+    try:
+        start = date.fromisoformat(request.args['start'])
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else start
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start (and optional end) must be YYYY-MM-DD dates'}), 400
+    if end < start:
+        return jsonify({'error': 'end is before start'}), 400
+
+    index = availability_cache.get(db.session.connection())
+    first, last = to_days([start, end], 0)
+    if kind == 'vehicles':
+        busy = index.busy('vehicle', first, last)
+        query = db.session.query(Vehicle.plate_number)
+        if request.args.get('assigned_for'):
+            query = query.filter(Vehicle.assigned_for == request.args['assigned_for'])
+        free = [plate for plate, in query.order_by(Vehicle.plate_number) if plate not in busy]
+    else:
+        busy = index.busy('driver', first, last)
+        rows = db.session.query(Driver.id, Driver.name).order_by(Driver.id)
+        free = [{'id': driver_id, 'name': name} for driver_id, name in rows if driver_id not in busy]
+    return jsonify({'kind': kind, 'start': start.isoformat(), 'end': end.isoformat(),
+                    'busy': len(busy), 'free': free})
+
+@bp.cli.command('check-double-bookings')
+def check_double_bookings():
+    """List vehicles and drivers booked on overlapping assignments."""
+    index = availability_cache.get(db.session.connection())
+    found = 0
+    for label in ('vehicle', 'driver'):
+        for owner, earlier, later in find_overlaps(index.ids, index.owners[label], index.starts, index.ends):
+            click.echo(f'{label} {owner}: assignment #{later} overlaps #{earlier}')
+            found += 1
+    if found:
+        raise SystemExit(f'{found} double booking(s)')
+    click.echo('No double bookings')
 
 # ASSIGNMENT MANAGEMENT
-@app.route('/assignments', methods=['GET', 'POST'])
+def valid_gps_position(text):
+    """Blank, or a position parse_position() reads."""
+    try:
+        return not text.strip() or bool(parse_position(text))
+    except ValueError:
+        return False
+
+@bp.route('/assignments', methods=['GET', 'POST'])
 def manage_assignments():
     if request.method == 'POST':
         plate_number = request.form['plate_number'].upper().strip()
@@ -263,7 +1242,10 @@ def manage_assignments():
         # Check if vehicle exists
         if not Vehicle.query.get(plate_number):
             flash('Vehicle with this plate number does not exist!', 'danger')
-            return redirect(url_for('manage_assignments'))
+            return redirect(url_for('fleet.manage_assignments'))
+        if not valid_gps_position(request.form['gps_position']):
+            flash('GPS position must be "lat,long" in decimal degrees!', 'danger')
+            return redirect(url_for('fleet.manage_assignments'))
         
         new_assignment = Assignment(
             plate_number=plate_number,
@@ -271,22 +1253,42 @@ def manage_assignments():
             work_place=request.form['work_place'],
             start_date=datetime.strptime(request.form['start_date'], '%Y-%m-%d').date(),
             end_date=datetime.strptime(request.form['end_date'], '%Y-%m-%d').date() if request.form['end_date'] else None,
-            gps_position=request.form['gps_position'],
-            geofence_violations=int(request.form['geofence_violations'] or 0)
+            gps_position=request.form['gps_position'].strip(),
+            geofence_violations=0
         )
+        if new_assignment.end_date and new_assignment.end_date < new_assignment.start_date:
+            flash('End date cannot be before the start date!', 'danger')
+            return redirect(url_for('fleet.manage_assignments'))
+        conflicts = assignment_conflicts(plate_number, driver_id, new_assignment.start_date, new_assignment.end_date)
+        if conflicts:
+            flash(conflict_message(conflicts, plate_number), 'danger')
+            return redirect(url_for('fleet.manage_assignments'))
         db.session.add(new_assignment)
         db.session.commit()
         flash('Assignment created successfully!', 'success')
-        return redirect(url_for('manage_assignments'))
+        return redirect(url_for('fleet.manage_assignments'))
     
-    assignments = Assignment.query.all()
-    vehicles = Vehicle.query.all()
-    drivers = Driver.query.all()
-    return render_template('assignments.html', assignments=assignments, vehicles=vehicles, drivers=drivers)
+    query = Assignment.query.options(
+        joinedload(Assignment.vehicle).load_only(Vehicle.plate_number),
+        joinedload(Assignment.driver).load_only(Driver.name)
+    )
+    status = request.args.get('status')
+    if status == 'active':
+        query = query.filter(assignment_is_active())
+    elif status == 'ended':
+        query = query.filter(Assignment.end_date < date.today())
+    plate_number = request.args.get('plate_number', '').upper().strip()
+    if plate_number:
+        query = query.filter(Assignment.plate_number == plate_number)
+    page = keyset_page(query, ASSIGNMENT_SORTS, Assignment.id, 'start_date')
+    return render_template('assignments.html', assignments=page.items, page=page)
 
-@app.route('/assignments/<int:assignment_id>', methods=['GET', 'POST'])
+@bp.route('/assignments/<int:assignment_id>', methods=['GET', 'POST'])
 def edit_assignment(assignment_id):
-    assignment = Assignment.query.get_or_404(assignment_id)
+    assignment = Assignment.query.options(
+        joinedload(Assignment.vehicle),
+        joinedload(Assignment.driver)
+    ).filter_by(id=assignment_id).first_or_404()
     
     if request.method == 'POST':
         plate_number = request.form['plate_number'].upper().strip()
@@ -294,33 +1296,46 @@ def edit_assignment(assignment_id):
         # Check if vehicle exists
         if not Vehicle.query.get(plate_number):
             flash('Vehicle with this plate number does not exist!', 'danger')
-            return redirect(url_for('edit_assignment', assignment_id=assignment_id))
+            return redirect(url_for('fleet.edit_assignment', assignment_id=assignment_id))
+        if not valid_gps_position(request.form['gps_position']):
+            flash('GPS position must be "lat,long" in decimal degrees!', 'danger')
+            return redirect(url_for('fleet.edit_assignment', assignment_id=assignment_id))
             
+        start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date() if request.form['end_date'] else None
+        if end_date and end_date < start_date:
+            flash('End date cannot be before the start date!', 'danger')
+            return redirect(url_for('fleet.edit_assignment', assignment_id=assignment_id))
+        conflicts = assignment_conflicts(plate_number, request.form['driver_id'], start_date, end_date,
+                                         exclude_id=assignment_id)
+        if conflicts:
+            flash(conflict_message(conflicts, plate_number), 'danger')
+            return redirect(url_for('fleet.edit_assignment', assignment_id=assignment_id))
+
         assignment.plate_number = plate_number
         assignment.driver_id = request.form['driver_id']
         assignment.work_place = request.form['work_place']
-        assignment.start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
-        assignment.end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date() if request.form['end_date'] else None
-        assignment.gps_position = request.form['gps_position']
-        assignment.geofence_violations = int(request.form['geofence_violations'] or 0)
+        assignment.start_date = start_date
+        assignment.end_date = end_date
+        assignment.gps_position = request.form['gps_position'].strip()
         db.session.commit()
         flash('Assignment updated successfully!', 'success')
-        return redirect(url_for('manage_assignments'))
+        return redirect(url_for('fleet.manage_assignments'))
     
-    vehicles = Vehicle.query.all()
-    drivers = Driver.query.all()
-    return render_template('edit_assignment.html', assignment=assignment, vehicles=vehicles, drivers=drivers)
+    return render_template('edit_assignment.html', assignment=assignment)
 
-@app.route('/assignments/delete/<int:assignment_id>')
+@bp.route('/assignments/delete/<int:assignment_id>')
 def delete_assignment(assignment_id):
     assignment = Assignment.query.get_or_404(assignment_id)
+    for model in (GeofenceViolation, GeofenceState, Geofence):
+        model.query.filter_by(assignment_id=assignment_id).delete()
     db.session.delete(assignment)
     db.session.commit()
     flash('Assignment deleted successfully!', 'success')
-    return redirect(url_for('manage_assignments'))
+    return redirect(url_for('fleet.manage_assignments'))
 
 # COMPLIANCE MANAGEMENT
-@app.route('/compliance/<plate_number>', methods=['GET', 'POST'])
+@bp.route('/compliance/<plate_number>', methods=['GET', 'POST'])
 def manage_compliance(plate_number):
     vehicle = Vehicle.query.get_or_404(plate_number)
     compliance = Compliance.query.get(plate_number)
@@ -341,12 +1356,107 @@ def manage_compliance(plate_number):
             db.session.add(compliance)
         db.session.commit()
         flash('Compliance data saved!', 'success')
-        return redirect(url_for('manage_compliance', plate_number=plate_number))
+        return redirect(url_for('fleet.manage_compliance', plate_number=plate_number))
     
     return render_template('compliance.html', vehicle=vehicle, compliance=compliance)
 
+# COMPLIANCE STATUS
+# compliance_status is evaluated in one vectorized pass per batch of
+# compliance rows. Edits re-evaluate their vehicles (after_flush hook, bulk
+# import); date-driven changes are caught by re-evaluating the rows whose
+# next_check day has arrived, since every evaluation sets next_check after
+# the day it ran. That happens on a background thread in each worker, once
+# at start and again just after every midnight, or from the
+# refresh-compliance command, so requests only ever read compliance_status.
+COMPLIANCE_STATUSES = ('violation', 'warning', 'ok')
+COMPLIANCE_MODELS = (Compliance, Vehicle)
+COMPLIANCE_SORTS = {
+    'plate_number': ComplianceStatus.plate_number,
+    'issue_count': ComplianceStatus.issue_count,
+}
+
+def refresh_compliance_status(conn, plates=None, today=None):
+    """Re-evaluate `plates`, or every compliance record when None. Returns the rows evaluated."""
+    today = today or date.today()
+    query = db.select(
+        Compliance.plate_number, Compliance.insurance_date, Compliance.yearly_inspection,
+        Compliance.inspection_date, Compliance.safety_audit
+    ).join(Vehicle, Vehicle.plate_number == Compliance.plate_number)
+    delete = db.delete(ComplianceStatus)
+    if plates is not None:
+        plates = list(plates)
+        if not plates:
+            return 0
+        query = query.where(Compliance.plate_number.in_(plates))
+        delete = delete.where(ComplianceStatus.plate_number.in_(plates))
+    rows = conn.execute(query).all()
+    conn.execute(delete)
+    if not rows:
+        return 0
+
+    plate_numbers, insurance, yearly, inspection, safety = zip(*rows)
+    result = evaluate_compliance(insurance, yearly, inspection, safety, today)
+    entries = ({
+        'plate_number': plate,
+        'status': result.status[i],
+        'issue_count': len(result.issues[i]),
+        'summary': ', '.join(issue['issue'] for issue in result.issues[i])[:200] or None,
+        'issues': json.dumps(result.issues[i]),
+        'insurance_expires': to_date(result.insurance_expires[i]),
+        'inspection_expires': to_date(result.inspection_expires[i]),
+        'next_check': to_date(result.next_check[i]),
+        'evaluated_on': today,
+    } for i, plate in enumerate(plate_numbers))
+    for chunk in chunked(entries, IMPORT_CHUNK_SIZE):
+        conn.execute(db.insert(ComplianceStatus), chunk)
+    return len(rows)
+
+_compliance_checked_on = None
+
+def refresh_due_compliance():
+    """Re-evaluate rows whose next_check day has come; cheap after the first call each day."""
+    global _compliance_checked_on
+    today = date.today()
+    if _compliance_checked_on == today:
+        return
+    with write_engine(db.engine).begin() as conn:
+        plates = [p for (p,) in conn.execute(db.select(ComplianceStatus.plate_number).where(
+            ComplianceStatus.next_check <= today))]
+        refresh_compliance_status(conn, plates, today)
+    _compliance_checked_on = today
+
+@bp.before_app_request
+def start_compliance_refresher():
+    run_daily('compliance-refresh', refresh_due_compliance)
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_compliance_for_changes(session, flush_context):
+    plates = changed_plates(session, COMPLIANCE_MODELS)
+    if plates:
+        refresh_compliance_status(session.connection(), plates)
+
+def ensure_compliance_status(conn):
+    """Evaluate every record on first start against a database that already has compliance data."""
+    if (conn.execute(db.select(ComplianceStatus.plate_number).limit(1)).first() is None
+            and conn.execute(db.select(Compliance.plate_number).limit(1)).first() is not None):
+        refresh_compliance_status(conn)
+
+@bp.cli.command('refresh-compliance')
+@click.option('--all', 'everything', is_flag=True, help='Re-evaluate every record, not only those due')
+def refresh_compliance_command(everything):
+    """Re-evaluate compliance status for records whose dates crossed a boundary."""
+    today = date.today()
+    with write_engine(db.engine).begin() as conn:
+        if everything:
+            count = refresh_compliance_status(conn, today=today)
+        else:
+            plates = [p for (p,) in conn.execute(db.select(ComplianceStatus.plate_number).where(
+                ComplianceStatus.next_check <= today))]
+            count = refresh_compliance_status(conn, plates, today)
+    click.echo(f'{count} compliance record(s) evaluated')
+
 # MAINTENANCE MANAGEMENT
-@app.route('/maintenance/<plate_number>', methods=['GET', 'POST'])
+@bp.route('/maintenance/<plate_number>', methods=['GET', 'POST'])
 def manage_maintenance(plate_number):
     vehicle = Vehicle.query.get_or_404(plate_number)
     
@@ -362,247 +1472,2587 @@ def manage_maintenance(plate_number):
         db.session.add(new_maintenance)
         db.session.commit()
         flash('Maintenance record added!', 'success')
-        return redirect(url_for('manage_maintenance', plate_number=plate_number))
+        return redirect(url_for('fleet.manage_maintenance', plate_number=plate_number))
     
     maintenance_records = Maintenance.query.filter_by(plate_number=plate_number).all()
-    return render_template('maintenance.html', vehicle=vehicle, maintenance_records=maintenance_records)
+    schedule = db.session.get(MaintenanceSchedule, plate_number)
+    return render_template('maintenance.html', vehicle=vehicle, maintenance_records=maintenance_records,
+                           schedule=schedule)
 
-@app.route('/maintenance/delete/<int:record_id>')
+@bp.route('/maintenance/<plate_number>/odometer', methods=['POST'])
+def update_odometer(plate_number):
+    Vehicle.query.get_or_404(plate_number)
+    try:
+        km = int(request.form['odometer_km'])
+        if km < 0:
+            raise ValueError
+    except ValueError:
+        flash('Odometer must be a whole number of km', 'danger')
+        return redirect(url_for('fleet.manage_maintenance', plate_number=plate_number))
+    odometer = db.session.get(Odometer, plate_number) or Odometer(plate_number=plate_number)
+    odometer.km = km
+    odometer.recorded_at = datetime.utcnow()
+    db.session.add(odometer)
+    db.session.commit()
+    flash('Odometer updated!', 'success')
+    return redirect(url_for('fleet.manage_maintenance', plate_number=plate_number))
+
+@bp.route('/maintenance/delete/<int:record_id>')
 def delete_maintenance(record_id):
     record = Maintenance.query.get_or_404(record_id)
     plate_number = record.plate_number
     db.session.delete(record)
     db.session.commit()
     flash('Maintenance record deleted!', 'success')
-    return redirect(url_for('manage_maintenance', plate_number=plate_number))
+    return redirect(url_for('fleet.manage_maintenance', plate_number=plate_number))
+
+# MAINTENANCE SCHEDULE
+# maintenance_schedule holds one row per vehicle, built from its latest
+# maintenance record (by service date) and its odometer. Form saves refresh
+# the affected vehicles from the session's after_flush hook; bulk imports
+# and telemetry call refresh_maintenance_schedule() themselves. Due and
+# overdue lists are then plain index range scans on due_date.
+SCHEDULE_LIST_LIMIT = 50
+SCHEDULE_DUE_DAYS = 14
+SCHEDULE_MODELS = (Maintenance, Odometer, Vehicle)
+
+def schedule_entry(row, today=None):
+    """Build a maintenance_schedule row from a latest-maintenance row joined with the odometer."""
+    next_km = row.next_service_km or None  # forms store a blank threshold as 0
+    km_remaining = km_due = None
+    if row.odometer_km is not None and next_km is not None:
+        km_remaining = next_km - row.odometer_km
+        read_on = row.odometer_at.date()
+        if km_remaining <= 0:
+            km_due = read_on
+        elif row.last_service_date and row.last_service_km is not None and read_on > row.last_service_date:
+            # Project the crossing day from the distance driven since the last service
+            daily_km = (row.odometer_km - row.last_service_km) / (read_on - row.last_service_date).days
+            if daily_km > 0:
+                km_due = read_on + timedelta(days=math.ceil(km_remaining / daily_km))
+    due_date, due_by = row.next_service_date, 'date' if row.next_service_date else None
+    if km_due is not None and (due_date is None or km_due < due_date):
+        due_date, due_by = km_due, 'km'
+    return {
+        'plate_number': row.plate_number,
+        'maintenance_id': row.id,
+        'maintenance_center': row.maintenance_center,
+        'last_service_date': row.last_service_date,
+        'last_service_km': row.last_service_km,
+        'next_service_date': row.next_service_date,
+        'next_service_km': next_km,
+        'odometer_km': row.odometer_km,
+        'km_remaining': km_remaining,
+        'due_date': due_date,
+        'due_by': due_by,
+    }
+
+def refresh_maintenance_schedule(conn, plates=None):
+    """Recompute the schedule rows of `plates`, or of every vehicle when None."""
+    if plates is not None:
+        plates = list(plates)
+        if not plates:
+            return
+    ranked = db.select(Maintenance, func.row_number().over(
+        partition_by=Maintenance.plate_number,
+        order_by=(Maintenance.last_service_date.desc(), Maintenance.id.desc())
+    ).label('position'))
+    if plates is not None:
+        ranked = ranked.where(Maintenance.plate_number.in_(plates))
+    ranked = ranked.subquery()
+    rows = conn.execute(db.select(
+        ranked, Odometer.km.label('odometer_km'), Odometer.recorded_at.label('odometer_at')
+    ).join(Vehicle, Vehicle.plate_number == ranked.c.plate_number).outerjoin(
+        Odometer, Odometer.plate_number == ranked.c.plate_number
+    ).where(ranked.c.position == 1))
+
+    delete = db.delete(MaintenanceSchedule)
+    if plates is not None:
+        delete = delete.where(MaintenanceSchedule.plate_number.in_(plates))
+    conn.execute(delete)
+    for chunk in chunked((schedule_entry(row) for row in rows), IMPORT_CHUNK_SIZE):
+        conn.execute(db.insert(MaintenanceSchedule), chunk)
+
+def changed_plates(session, models):
+    """Plate numbers of flushed objects of `models`, old and new."""
+    plates = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models):
+            # Include the old plate when a record was moved to another vehicle
+            history = db.inspect(obj).attrs.plate_number.history
+            plates.update(p for p in history.sum() if p)
+    return plates
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_schedule_for_changes(session, flush_context):
+    plates = changed_plates(session, SCHEDULE_MODELS)
+    if plates:
+        refresh_maintenance_schedule(session.connection(), plates)
+
+def ensure_maintenance_schedule(conn):
+    """Fill the schedule on first start against a database that already has maintenance history."""
+    if (conn.execute(db.select(MaintenanceSchedule.plate_number).limit(1)).first() is None
+            and conn.execute(db.select(Maintenance.id).limit(1)).first() is not None):
+        refresh_maintenance_schedule(conn)
+
+@bp.route('/maintenance/schedule')
+def maintenance_schedule():
+    center = request.args.get('center', '')
+    days = min(max(request.args.get('days', SCHEDULE_DUE_DAYS, type=int), 0), 365)
+    today = date.today()
+
+    def ranked(*conditions):
+        query = db.session.query(MaintenanceSchedule, Vehicle.make, Vehicle.model).join(
+            Vehicle, Vehicle.plate_number == MaintenanceSchedule.plate_number).filter(*conditions)
+        if center:
+            query = query.filter(MaintenanceSchedule.maintenance_center == center)
+        return query.order_by(MaintenanceSchedule.due_date).limit(SCHEDULE_LIST_LIMIT).all()
+
+    overdue = ranked(MaintenanceSchedule.due_date < today)
+    due = ranked(MaintenanceSchedule.due_date >= today, MaintenanceSchedule.due_date <= today + timedelta(days=days))
+    return render_template('maintenance_schedule.html', overdue=overdue, due=due, center=center, days=days,
+                           centers=MAINTENANCE_CENTERS, today=today, limit=SCHEDULE_LIST_LIMIT)
+
+@bp.cli.command('rebuild-maintenance-schedule')
+def rebuild_maintenance_schedule_command():
+    """Recompute every vehicle's next service due from maintenance history."""
+    with write_engine(db.engine).begin() as conn:
+        refresh_maintenance_schedule(conn)
+    click.echo('Maintenance schedule rebuilt')
+
+# UTILIZATION
+# Utilization is the share of vehicle-days spent on assignment. Each vehicle's
+# assignments are merged into spans (utilization_span); closed spans feed a
+# per-category daily count (utilization_day) and per-vehicle monthly totals
+# (utilization_month). A change to a vehicle's assignments recomputes only
+# that vehicle's spans and writes just the day buckets whose count moved.
+# Open-ended spans grow every day without a write, so they are stored as
+# spans only and added to the rollups at read time, up to today.
+UTILIZATION_MODELS = (Assignment, Vehicle)
+UTILIZATION_UNSPECIFIED = 'Unspecified'
+UTILIZATION_DEFAULT_DAYS = 365
+UTILIZATION_LIST_LIMIT = 20
+
+def day_dates(days):
+    return np.asarray(days, dtype='datetime64[D]').astype(object).tolist()
+
+def refresh_utilization(conn, plates=None):
+    """Recompute the spans of `plates`, or of every vehicle when None, and update the rollups."""
+    if plates is not None:
+        plates = list(plates)
+        if not plates:
+            return
+    category = func.coalesce(Vehicle.assigned_for, UTILIZATION_UNSPECIFIED)
+    assignments = db.select(Assignment.plate_number, category, Assignment.start_date, Assignment.end_date).join(
+        Vehicle, Vehicle.plate_number == Assignment.plate_number
+    ).where(Assignment.start_date.isnot(None),
+            or_(Assignment.end_date.is_(None), Assignment.end_date >= Assignment.start_date))
+    old = db.select(UtilizationSpan.assigned_for, UtilizationSpan.start_date, UtilizationSpan.end_date)
+    if plates is not None:
+        assignments = assignments.where(Assignment.plate_number.in_(plates))
+        old = old.where(UtilizationSpan.plate_number.in_(plates))
+        old_rows = conn.execute(old).all()
+        for model in (UtilizationSpan, UtilizationMonth):
+            conn.execute(db.delete(model).where(model.plate_number.in_(plates)))
+    else:
+        old_rows = []
+        for model in (UtilizationSpan, UtilizationMonth, UtilizationDay):
+            conn.execute(db.delete(model))
+
+    rows = conn.execute(assignments).all()
+    categories = {plate: assigned_for for plate, assigned_for, _, _ in rows}
+    owners, starts, ends = merge_spans([r[0] for r in rows], to_days([r[2] for r in rows], 0),
+                                       to_days([r[3] for r in rows], OPEN_END))
+    closed = ends != OPEN_END
+    spans = [{'plate_number': plate, 'assigned_for': categories[plate], 'start_date': start,
+              'end_date': end if is_closed else None}
+             for plate, start, end, is_closed in zip(owners, day_dates(starts),
+                                                     day_dates(np.where(closed, ends, starts)), closed)]
+    for chunk in chunked(spans, IMPORT_CHUNK_SIZE):
+        conn.execute(db.insert(UtilizationSpan), chunk)
+
+    months = monthly_days(owners[closed], starts[closed], ends[closed])
+    month_rows = [{'plate_number': plate, 'month': month, 'days': int(days)}
+                  for plate, month, days in zip(months['owner'], day_dates(months['month']), months['days'])]
+    for chunk in chunked(month_rows, IMPORT_CHUNK_SIZE):
+        conn.execute(db.insert(UtilizationMonth), chunk)
+
+    # Subtract the old closed spans and add the new ones; only days that changed come back
+    old_closed = [r for r in old_rows if r.end_date is not None]
+    span_categories = np.array([r.assigned_for for r in old_closed] +
+                               [categories[plate] for plate in owners[closed]], dtype=object)
+    span_starts = np.concatenate([to_days([r.start_date for r in old_closed], 0), starts[closed]])
+    span_ends = np.concatenate([to_days([r.end_date for r in old_closed], 0), ends[closed]])
+    weights = np.concatenate([-np.ones(len(old_closed), dtype=np.int64), np.ones(closed.sum(), dtype=np.int64)])
+    stmt = sqlite_insert(UtilizationDay)
+    stmt = stmt.on_conflict_do_update(index_elements=['assigned_for', 'day'],
+                                      set_={'vehicles': UtilizationDay.vehicles + stmt.excluded.vehicles})
+    for assigned_for in set(span_categories):
+        mask = span_categories == assigned_for
+        days, counts = daily_counts(span_starts[mask], span_ends[mask], weights[mask])
+        if not len(days):
+            continue
+        changes = [{'assigned_for': assigned_for, 'day': day, 'vehicles': int(count)}
+                   for day, count in zip(day_dates(days), counts)]
+        for chunk in chunked(changes, IMPORT_CHUNK_SIZE):
+            conn.execute(stmt, chunk)
+        conn.execute(db.delete(UtilizationDay).where(
+            UtilizationDay.assigned_for == assigned_for,
+            UtilizationDay.day.between(changes[0]['day'], changes[-1]['day']),
+            UtilizationDay.vehicles == 0))
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_utilization_for_changes(session, flush_context):
+    plates = changed_plates(session, UTILIZATION_MODELS)
+    if plates:
+        refresh_utilization(session.connection(), plates)
+
+def ensure_utilization(conn):
+    """Fill the rollups on first start against a database that already has assignments."""
+    if (conn.execute(db.select(UtilizationSpan.id).limit(1)).first() is None
+            and conn.execute(db.select(Assignment.id).limit(1)).first() is not None):
+        refresh_utilization(conn)
+
+def utilization_range(args):
+    """(first, last, period, assigned_for) from query arguments, defaulting to the last year."""
+    last = date.fromisoformat(args['end']) if args.get('end') else date.today()
+    first = (date.fromisoformat(args['start']) if args.get('start')
+             else last - timedelta(days=UTILIZATION_DEFAULT_DAYS - 1))
+    if first > last:
+        raise ValueError('The start date is after the end date')
+    period = args.get('period', 'month')
+    if period not in UTILIZATION_PERIODS:
+        raise ValueError(f'Unknown period: {period}')
+    return first, last, period, args.get('assigned_for') or None
+
+def fleet_utilization(first, last, period, assigned_for=None):
+    """Utilization per period and vehicle category, plus an 'All' row per period."""
+    first_day, last_day, today = to_days([first, last, date.today()], 0)
+    size = last_day - first_day + 1
+    fleet = dict(db.session.query(
+        func.coalesce(Vehicle.assigned_for, UTILIZATION_UNSPECIFIED), func.count(Vehicle.plate_number)
+    ).group_by(Vehicle.assigned_for).all())
+    stored = db.session.query(UtilizationDay.assigned_for, UtilizationDay.day, UtilizationDay.vehicles).filter(
+        UtilizationDay.day.between(first, last))
+    open_spans = db.session.query(UtilizationSpan.assigned_for, UtilizationSpan.start_date).filter(
+        UtilizationSpan.end_date.is_(None), UtilizationSpan.start_date <= min(last, date.today()))
+    if assigned_for:
+        fleet = {assigned_for: fleet.get(assigned_for, 0)}
+        stored = stored.filter(UtilizationDay.assigned_for == assigned_for)
+        open_spans = open_spans.filter(UtilizationSpan.assigned_for == assigned_for)
+
+    busy = {category: np.zeros(size, dtype=np.int64) for category in fleet}
+    stored = stored.all()
+    if stored:
+        frame = pd.DataFrame(stored, columns=['assigned_for', 'day', 'vehicles'])
+        frame['offset'] = to_days(frame['day'], 0) - first_day
+        for category, group in frame.groupby('assigned_for'):
+            busy.setdefault(category, np.zeros(size, dtype=np.int64))[group['offset'].to_numpy()] += group['vehicles'].to_numpy()
+    open_spans = open_spans.all()
+    if open_spans and first_day <= today:
+        frame = pd.DataFrame(open_spans, columns=['assigned_for', 'start_date'])
+        running_until = min(last_day, today)
+        for category, group in frame.groupby('assigned_for'):
+            counts = open_counts(to_days(group['start_date'], 0), first_day, running_until)
+            busy.setdefault(category, np.zeros(size, dtype=np.int64))[:len(counts)] += counts
+
+    buckets = period_start(np.arange(first_day, last_day + 1), period)
+    rows = []
+    for category, counts in sorted(busy.items()):
+        rows.append(pd.DataFrame({'period': buckets, 'assigned_for': category,
+                                  'busy_days': counts, 'vehicles': fleet.get(category, 0)}))
+    frame = pd.concat(rows) if rows else pd.DataFrame(columns=['period', 'assigned_for', 'busy_days', 'vehicles'])
+    frame['vehicle_days'] = frame['vehicles']
+    frame = frame.groupby(['period', 'assigned_for'], as_index=False).agg(
+        busy_days=('busy_days', 'sum'), vehicle_days=('vehicle_days', 'sum'), vehicles=('vehicles', 'first'))
+    total = frame.groupby('period', as_index=False)[['busy_days', 'vehicle_days', 'vehicles']].sum()
+    total['assigned_for'] = 'All'
+    frame = pd.concat([frame, total]).sort_values(['period', 'assigned_for'], kind='stable')
+    frame['utilization'] = np.where(frame['vehicle_days'] > 0,
+                                    frame['busy_days'] / frame['vehicle_days'].where(frame['vehicle_days'] > 0, 1), 0.0)
+    frame['period'] = day_dates(frame['period'])
+    return frame.reset_index(drop=True)
+
+def vehicle_utilization(first, last, assigned_for=None):
+    """Busy days and utilization per vehicle over the whole months spanning [first, last]."""
+    first_month = day_dates(month_start(to_days([first], 0)))[0]
+    last_month = day_dates(month_start(to_days([last], 0)))[0]
+    month_end = (last_month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    first_day, last_day, today = to_days([first_month, month_end, date.today()], 0)
+
+    vehicles = db.session.query(Vehicle.plate_number, Vehicle.make, Vehicle.model,
+                                func.coalesce(Vehicle.assigned_for, UTILIZATION_UNSPECIFIED))
+    stored = db.session.query(UtilizationMonth.plate_number, func.sum(UtilizationMonth.days)).filter(
+        UtilizationMonth.month.between(first_month, last_month)).group_by(UtilizationMonth.plate_number)
+    open_spans = db.session.query(UtilizationSpan.plate_number, UtilizationSpan.start_date).filter(
+        UtilizationSpan.end_date.is_(None))
+    if assigned_for:
+        vehicles = vehicles.filter(func.coalesce(Vehicle.assigned_for, UTILIZATION_UNSPECIFIED) == assigned_for)
+        open_spans = open_spans.filter(UtilizationSpan.assigned_for == assigned_for)
+    frame = pd.DataFrame(vehicles.all(), columns=['plate_number', 'make', 'model', 'assigned_for'])
+    busy = pd.Series(dict(stored.all()), dtype='int64')
+    open_frame = pd.DataFrame(open_spans.all(), columns=['plate_number', 'start_date'])
+    if len(open_frame):
+        running_until = min(last_day, today)
+        days = np.clip(running_until - np.maximum(to_days(open_frame['start_date'], 0), first_day) + 1, 0, None)
+        busy = busy.add(pd.Series(days, index=open_frame['plate_number']).groupby(level=0).sum(), fill_value=0)
+    frame['busy_days'] = frame['plate_number'].map(busy).fillna(0).astype('int64')
+    frame['days'] = int(last_day - first_day + 1)
+    frame['utilization'] = frame['busy_days'] / frame['days']
+    return frame, first_month, month_end
+
+def vehicle_month_rows(first, last, assigned_for=None):
+    """Yield (plate, month, busy days, days in month) for every vehicle month in range."""
+    first_month = day_dates(month_start(to_days([first], 0)))[0]
+    query = db.session.query(UtilizationMonth.plate_number, UtilizationMonth.month, UtilizationMonth.days).filter(
+        UtilizationMonth.month.between(first_month, last))
+    open_spans = db.session.query(UtilizationSpan.plate_number, UtilizationSpan.start_date).filter(
+        UtilizationSpan.end_date.is_(None))
+    if assigned_for:
+        query = query.join(Vehicle, Vehicle.plate_number == UtilizationMonth.plate_number).filter(
+            func.coalesce(Vehicle.assigned_for, UTILIZATION_UNSPECIFIED) == assigned_for)
+        open_spans = open_spans.filter(UtilizationSpan.assigned_for == assigned_for)
+    first_day, last_day = to_days([first_month, last], 0)
+    months = np.unique(month_start(np.arange(first_day, last_day + 1)))
+    frame = pd.DataFrame(query.all(), columns=['plate_number', 'month', 'days'])
+    frame['month'] = to_days(frame['month'], 0)
+    open_frame = pd.DataFrame(open_spans.all(), columns=['plate_number', 'start_date'])
+    if len(open_frame) and len(months):
+        covered = open_monthly_days(to_days(open_frame['start_date'], 0), months, to_days([date.today()], 0)[0])
+        span, month = np.nonzero(covered)
+        frame = pd.concat([frame, pd.DataFrame({'plate_number': open_frame['plate_number'].to_numpy()[span],
+                                                'month': months[month], 'days': covered[span, month]})])
+        frame = frame.groupby(['plate_number', 'month'], as_index=False)['days'].sum()
+    frame = frame.sort_values(['plate_number', 'month'], kind='stable')
+    month_days = (frame['month'].to_numpy().astype('datetime64[D]').astype('datetime64[M]') + 1).astype(
+        'datetime64[D]').astype(np.int64) - frame['month'].to_numpy()
+    for plate, month, days, length in zip(frame['plate_number'], day_dates(frame['month']), frame['days'], month_days):
+        yield plate, month, int(days), int(length)
+
+@bp.route('/reports/utilization')
+@reads_snapshot
+def utilization_report():
+    try:
+        first, last, period, assigned_for = utilization_range(request.args)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('fleet.utilization_report'))
+
+    def build():
+        series = fleet_utilization(first, last, period, assigned_for)
+        vehicles, first_month, month_end = vehicle_utilization(first, last, assigned_for)
+        ranked = vehicles.sort_values(['utilization', 'plate_number'], kind='stable')
+        return dict(
+            series=series.to_dict('records'),
+            least_used=ranked.head(UTILIZATION_LIST_LIMIT).to_dict('records'),
+            most_used=ranked.iloc[::-1].head(UTILIZATION_LIST_LIMIT).to_dict('records'),
+            first=first, last=last, period=period, assigned_for=assigned_for,
+            first_month=first_month, month_end=month_end,
+            periods=UTILIZATION_PERIODS, categories=ASSIGNMENT_TYPES + (UTILIZATION_UNSPECIFIED,),
+            now=datetime.now()
+        )
+    try:
+        # Open spans make the figures depend on the day, so it is part of the key
+        key = (date.today(), first, last, period, assigned_for)
+        return cached_report('reports/utilization.html', key, build)
+    except Exception as e:
+        flash(f'Error generating utilization report: {str(e)}', 'danger')
+        return redirect(url_for('fleet.generate_report'))
+
+# FUEL
+# Fill-ups are logged per vehicle with the odometer reading at the pump.
+# fuel_stats keeps each vehicle's running totals and fuel_fleet_stats their
+# sums per fuel type and vehicle type, so fleet figures read a handful of
+# rows. Fills past a vehicle's last logged odometer are priced from its
+# stored totals alone; a fill out of order, a deleted fill or an edit to the
+# vehicle recomputes that vehicle from its log. Either way the fleet rows
+# move by the difference between the vehicle's old and new totals.
+FUEL_MODELS = (FuelLog, Vehicle)
+FUEL_UNSPECIFIED = 'Unspecified'
+FUEL_FIELDS = ('plate_number', 'filled_on', 'liters', 'odometer_km', 'station', 'cost')
+FUEL_INTERVAL_FIELDS = ('distance_km', 'km_per_liter', 'anomaly')
+FUEL_FLEET_COLUMNS = ('vehicles',) + FUEL_TOTALS
+FUEL_LOG_LIMIT = 50
+FUEL_LIST_LIMIT = 20
+
+def fuel_vehicles(conn, plates=None):
+    """{plate: (fuel_type, vehicle_type, rated km/l)} for `plates`, or for every vehicle when None."""
+    query = db.select(Vehicle.plate_number, func.coalesce(Vehicle.fuel_type, FUEL_UNSPECIFIED),
+                      func.coalesce(Vehicle.vehicle_type, FUEL_UNSPECIFIED), Vehicle.fuel_consumption)
+    if plates is not None:
+        query = query.where(Vehicle.plate_number.in_(plates))
+    return {plate: tuple(rest) for plate, *rest in conn.execute(query)}
+
+def fuel_frame(rows, columns):
+    frame = pd.DataFrame(rows, columns=list(columns))
+    return frame.astype({'liters': float, 'cost': float})
+
+def fuel_log_rows(frame):
+    """FuelLog insert dicts from a fill frame, with NaN stored as NULL."""
+    frame = frame.reindex(columns=list(FUEL_FIELDS + FUEL_INTERVAL_FIELDS))
+    frame['distance_km'] = frame['distance_km'].astype('Int64')
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).to_dict('records')
+
+def fuel_stats_row(plate, vehicle, totals):
+    fuel_type, vehicle_type, rated = vehicle
+    row = {'plate_number': plate, 'fuel_type': fuel_type, 'vehicle_type': vehicle_type,
+           'rated_km_per_liter': rated, 'first_km': int(totals['first_km']), 'last_km': int(totals['last_km']),
+           'last_filled_on': totals['last_filled_on'], 'recent': json.dumps(totals['recent'])}
+    for column in FUEL_TOTALS:
+        row[column] = float(totals[column]) if column in ('liters', 'cost') else int(totals[column])
+    row.update(fuel_economy(row | {'recent': totals['recent']}))
+    return row
+
+def store_fuel_stats(conn, old, new):
+    """Replace the fuel_stats rows in `old` by those in `new` and move the fleet totals by the difference.
+
+    Both map plate to a fuel_stats row; plates only in `old` lose their row.
+    """
+    if old:
+        conn.execute(db.delete(FuelStats).where(FuelStats.plate_number.in_(list(old))))
+    for chunk in chunked(list(new.values()), IMPORT_CHUNK_SIZE):
+        conn.execute(db.insert(FuelStats), chunk)
+
+    deltas = {}
+    for rows, sign in ((old.values(), -1), (new.values(), 1)):
+        for row in rows:
+            delta = deltas.setdefault((row['fuel_type'], row['vehicle_type']), dict.fromkeys(FUEL_FLEET_COLUMNS, 0))
+            delta['vehicles'] += sign
+            for column in FUEL_TOTALS:
+                delta[column] += sign * row[column]
+    if not deltas:
+        return
+    stmt = sqlite_insert(FuelFleetStats)
+    stmt = stmt.on_conflict_do_update(index_elements=['fuel_type', 'vehicle_type'], set_={
+        column: getattr(FuelFleetStats, column) + stmt.excluded[column] for column in FUEL_FLEET_COLUMNS})
+    conn.execute(stmt, [dict(delta, fuel_type=fuel_type, vehicle_type=vehicle_type)
+                        for (fuel_type, vehicle_type), delta in deltas.items()])
+    conn.execute(db.delete(FuelFleetStats).where(FuelFleetStats.vehicles <= 0))
+
+def refresh_fuel_stats(conn, plates=None):
+    """Recompute the fill intervals and totals of `plates`, or of every vehicle when None."""
+    if plates is not None:
+        plates = list(plates)
+        if not plates:
+            return
+    fills = db.select(FuelLog.id, *(getattr(FuelLog, f) for f in FUEL_FIELDS if f != 'station'),
+                      *(getattr(FuelLog, f).label('stored_' + f) for f in FUEL_INTERVAL_FIELDS))
+    if plates is not None:
+        fills = fills.where(FuelLog.plate_number.in_(plates))
+        old = {row.plate_number: dict(row._mapping) for row in conn.execute(
+            db.select(FuelStats).where(FuelStats.plate_number.in_(plates)))}
+    else:
+        old = {}
+        conn.execute(db.delete(FuelStats))
+        conn.execute(db.delete(FuelFleetStats))
+
+    result = conn.execute(fills)
+    frame = fuel_frame(result.all(), result.keys())
+    vehicles = fuel_vehicles(conn, plates)
+    # Fills left behind by a deleted vehicle drop out of the totals
+    frame = frame[frame['plate_number'].isin(list(vehicles))]
+    frame = fuel_intervals(frame, {plate: vehicle[2] for plate, vehicle in vehicles.items()})
+
+    # Write back only the fills whose interval moved
+    moved = np.zeros(len(frame), dtype=bool)
+    for field in FUEL_INTERVAL_FIELDS:
+        stored = frame['stored_' + field]
+        moved |= ~((frame[field] == stored) | (frame[field].isna() & stored.isna())).to_numpy(dtype=bool)
+    changes = [dict(row, fill_id=fill_id) for fill_id, row in zip(
+        frame['id'][moved], fuel_log_rows(frame[moved]))]
+    stmt = db.update(FuelLog).where(FuelLog.id == bindparam('fill_id')).values(
+        {field: bindparam(field) for field in FUEL_INTERVAL_FIELDS})
+    for chunk in chunked(changes, IMPORT_CHUNK_SIZE):
+        conn.execute(stmt, [{'fill_id': int(row['fill_id']), **{f: row[f] for f in FUEL_INTERVAL_FIELDS}}
+                            for row in chunk])
+
+    new = {row['plate_number']: fuel_stats_row(row['plate_number'], vehicles[row['plate_number']], row)
+           for row in fuel_totals(frame).reset_index().to_dict('records')}
+    store_fuel_stats(conn, old, new)
+
+def record_fuel_fills(conn, fills):
+    """Store fill-up dicts and bring their vehicles' fuel totals and odometers up to date.
+
+    Fills already in the log (same vehicle, odometer and date) are skipped.
+    """
+    fills = fuel_frame([[fill.get(f) for f in FUEL_FIELDS] for fill in fills], FUEL_FIELDS)
+    fills = fills.drop_duplicates(['plate_number', 'odometer_km', 'filled_on'])
+    if fills.empty:
+        return
+    plates = fills['plate_number'].unique().tolist()
+    vehicles = fuel_vehicles(conn, plates)
+    old = {row.plate_number: dict(row._mapping) for row in conn.execute(
+        db.select(FuelStats).where(FuelStats.plate_number.in_(plates)))}
+
+    # A vehicle's fills continue its log when every one is past its last logged odometer
+    last_km = pd.Series({plate: row['last_km'] for plate, row in old.items()}, dtype='float64')
+    continues = fills.groupby('plate_number')['odometer_km'].transform('min') > fills['plate_number'].map(last_km).fillna(-1)
+    insert = sqlite_insert(FuelLog).on_conflict_do_nothing()
+
+    appended = fuel_intervals(fills[continues], {plate: vehicle[2] for plate, vehicle in vehicles.items()}, last_km)
+    if len(appended):
+        for chunk in chunked(fuel_log_rows(appended), IMPORT_CHUNK_SIZE):
+            conn.execute(insert, chunk)
+        new = {}
+        for totals in fuel_totals(appended).reset_index().to_dict('records'):
+            plate = totals['plate_number']
+            if plate in old:
+                totals = merge_fuel_totals(old[plate], totals)
+            new[plate] = fuel_stats_row(plate, vehicles[plate], totals)
+        store_fuel_stats(conn, {plate: old[plate] for plate in new if plate in old}, new)
+
+    others = fills[~continues]
+    if len(others):
+        for chunk in chunked(fuel_log_rows(others), IMPORT_CHUNK_SIZE):
+            conn.execute(insert, chunk)
+        refresh_fuel_stats(conn, set(others['plate_number']))
+
+    # The pump reading is also the vehicle's latest odometer unless a newer one is on record;
+    # fills carry only a date, so a higher reading wins within the same day
+    latest = fills.sort_values(['filled_on', 'odometer_km']).groupby('plate_number').tail(1)
+    stmt = sqlite_insert(Odometer)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['plate_number'],
+        set_={'km': stmt.excluded.km, 'recorded_at': stmt.excluded.recorded_at},
+        where=or_(stmt.excluded.recorded_at > Odometer.recorded_at,
+                  and_(stmt.excluded.recorded_at == Odometer.recorded_at, stmt.excluded.km > Odometer.km))
+    ), [{'plate_number': plate, 'km': int(km), 'recorded_at': datetime.combine(filled_on, datetime.min.time())}
+        for plate, km, filled_on in zip(latest['plate_number'], latest['odometer_km'], latest['filled_on'])])
+    refresh_maintenance_schedule(conn, plates)
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_fuel_for_changes(session, flush_context):
+    plates = changed_plates(session, FUEL_MODELS)
+    if plates:
+        refresh_fuel_stats(session.connection(), plates)
+
+def ensure_fuel_stats(conn):
+    """Fill the totals on first start against a database that already has fill-ups."""
+    if (conn.execute(db.select(FuelStats.plate_number).limit(1)).first() is None
+            and conn.execute(db.select(FuelLog.id).limit(1)).first() is not None):
+        refresh_fuel_stats(conn)
+
+def fleet_fuel_rows():
+    """Fuel totals and economy per fuel type and vehicle type, then an 'All' row."""
+    rows = [{column: getattr(stats, column) for column in ('fuel_type', 'vehicle_type') + FUEL_FLEET_COLUMNS}
+            for stats in FuelFleetStats.query.order_by(FuelFleetStats.fuel_type, FuelFleetStats.vehicle_type)]
+    if rows:
+        total = {column: sum(row[column] for row in rows) for column in FUEL_FLEET_COLUMNS}
+        rows.append(dict(total, fuel_type='All', vehicle_type='All'))
+    for row in rows:
+        row.update(fuel_economy(row))
+    return rows
+
+@bp.route('/fuel/<plate_number>', methods=['GET', 'POST'])
+def manage_fuel(plate_number):
+    vehicle = Vehicle.query.get_or_404(plate_number)
+
+    if request.method == 'POST':
+        try:
+            fill = {
+                'plate_number': plate_number,
+                'filled_on': datetime.strptime(request.form['filled_on'], '%Y-%m-%d').date(),
+                'liters': float(request.form['liters']),
+                'odometer_km': int(request.form['odometer_km']),
+                'station': request.form.get('station') or None,
+                'cost': float(request.form['cost']) if request.form.get('cost') else None,
+            }
+            if fill['liters'] <= 0 or fill['odometer_km'] < 0:
+                raise ValueError
+        except ValueError:
+            flash('Enter the fill-up date, liters and odometer km', 'danger')
+            return redirect(url_for('fleet.manage_fuel', plate_number=plate_number))
+        record_fuel_fills(db.session.connection(), [fill])
+        db.session.commit()
+        flash('Fill-up recorded!', 'success')
+        return redirect(url_for('fleet.manage_fuel', plate_number=plate_number))
+
+    stats = db.session.get(FuelStats, plate_number)
+    fills = FuelLog.query.filter_by(plate_number=plate_number).order_by(
+        FuelLog.odometer_km.desc(), FuelLog.filled_on.desc()).limit(FUEL_LOG_LIMIT).all()
+    return render_template('fuel.html', vehicle=vehicle, stats=stats, fills=fills, limit=FUEL_LOG_LIMIT,
+                           today=date.today())
+
+@bp.route('/fuel/delete/<int:fill_id>')
+def delete_fuel(fill_id):
+    fill = FuelLog.query.get_or_404(fill_id)
+    plate_number = fill.plate_number
+    db.session.delete(fill)
+    db.session.commit()
+    flash('Fill-up deleted!', 'success')
+    return redirect(url_for('fleet.manage_fuel', plate_number=plate_number))
+
+@bp.route('/reports/fuel')
+@reads_snapshot
+def fuel_report():
+    def build():
+        anomalies = db.session.query(FuelStats, Vehicle.make, Vehicle.model).join(
+            Vehicle, Vehicle.plate_number == FuelStats.plate_number
+        ).filter(FuelStats.anomalies > 0).order_by(FuelStats.anomalies.desc()).limit(FUEL_LIST_LIMIT).all()
+        return dict(categories=fleet_fuel_rows(), anomalies=anomalies, limit=FUEL_LIST_LIMIT, now=datetime.now())
+    try:
+        return cached_report('reports/fuel.html', (), build)
+    except Exception as e:
+        flash(f'Error generating fuel report: {str(e)}', 'danger')
+        return redirect(url_for('fleet.generate_report'))
+
+# BULK IMPORT
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_ERROR_LIMIT = 1000
+
+ImportColumn = namedtuple('ImportColumn', ['parse', 'options', 'required'])
+
+# Upload headers must match these column names (case and spaces are ignored)
+IMPORT_SPECS = {
+    'vehicles': (Vehicle, ('plate_number',), {
+        'plate_number': ImportColumn(parse_upper, None, True),
+        'chasis': ImportColumn(parse_text, None, True),
+        'vehicle_type': ImportColumn(parse_text, VEHICLE_TYPES, False),
+        'make': ImportColumn(parse_text, None, False),
+        'model': ImportColumn(parse_text, None, False),
+        'year': ImportColumn(parse_text, None, False),
+        'fuel_type': ImportColumn(parse_text, FUEL_TYPES, False),
+        'fuel_capacity': ImportColumn(parse_float, None, False),
+        'fuel_consumption': ImportColumn(parse_float, None, False),
+        'loading_capacity': ImportColumn(parse_text, None, False),
+        'assigned_for': ImportColumn(parse_text, ASSIGNMENT_TYPES, False),
+    }),
+    'drivers': (Driver, ('id_number',), {
+        'name': ImportColumn(parse_text, None, True),
+        'id_number': ImportColumn(parse_text, None, True),
+        'phone': ImportColumn(parse_text, None, False),
+        'reporting_to': ImportColumn(parse_text, None, False),
+    }),
+    'maintenance': (Maintenance, None, {
+        'plate_number': ImportColumn(parse_upper, None, True),
+        'last_service_km': ImportColumn(parse_int, None, False),
+        'last_service_date': ImportColumn(parse_date, None, False),
+        'next_service_km': ImportColumn(parse_int, None, False),
+        'next_service_date': ImportColumn(parse_date, None, False),
+        'maintenance_center': ImportColumn(parse_text, MAINTENANCE_CENTERS, False),
+    }),
+    'compliance': (Compliance, ('plate_number',), {
+        'plate_number': ImportColumn(parse_upper, None, True),
+        'insurance_type': ImportColumn(parse_text, INSURANCE_TYPES, False),
+        'insurance_date': ImportColumn(parse_date, None, False),
+        'yearly_inspection': ImportColumn(parse_text, YES_NO, False),
+        'inspection_date': ImportColumn(parse_date, None, False),
+        'safety_audit': ImportColumn(parse_text, SAFETY_TYPES, False),
+        'utilization_history': ImportColumn(parse_text, None, False),
+        'accident_history': ImportColumn(parse_text, None, False),
+    }),
+    'fuel': (FuelLog, None, {
+        'plate_number': ImportColumn(parse_upper, None, True),
+        'filled_on': ImportColumn(parse_date, None, True),
+        'liters': ImportColumn(parse_float, None, True),
+        'odometer_km': ImportColumn(parse_int, None, True),
+        'station': ImportColumn(parse_text, None, False),
+        'cost': ImportColumn(parse_float, None, False),
+    }),
+}
+
+class ImportReport:
+    def __init__(self, entity):
+        self.entity = entity
+        self.rows_read = 0
+        self.rows_written = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_ERROR_LIMIT:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def as_dict(self):
+        return {
+            'entity': self.entity,
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+def validate_import_record(columns, fields, record):
+    values = {}
+    for field in fields:
+        column = columns[field]
+        try:
+            value = column.parse(record.get(field))
+        except (TypeError, ValueError):
+            raise ValueError(f'{field}: invalid value {record.get(field)!r}')
+        if value is None and column.required:
+            raise ValueError(f'{field} is required')
+        if value is not None and column.options and value not in column.options:
+            raise ValueError(f'{field} must be one of {", ".join(column.options)}')
+        values[field] = value
+    return values
+
+def resolve_import_chunk(entity, rows, report):
+    """Drop rows whose references or unique columns clash, using one lookup per chunk."""
+    if entity in ('maintenance', 'compliance', 'fuel'):
+        plates = {values['plate_number'] for _, values in rows}
+        known = {p for (p,) in db.session.query(Vehicle.plate_number).filter(Vehicle.plate_number.in_(plates))}
+        kept = []
+        for row_number, values in rows:
+            if values['plate_number'] not in known:
+                report.error(row_number, f"Vehicle {values['plate_number']} does not exist")
+            elif entity == 'fuel' and (values['liters'] <= 0 or values['odometer_km'] < 0):
+                report.error(row_number, 'liters must be above 0 and odometer_km not below 0')
+            else:
+                kept.append((row_number, values))
+        return kept
+
+    if entity == 'vehicles':
+        chasis_owner = dict(db.session.query(Vehicle.chasis, Vehicle.plate_number).filter(
+            Vehicle.chasis.in_({values['chasis'] for _, values in rows})
+        ))
+        kept = []
+        for row_number, values in rows:
+            owner = chasis_owner.setdefault(values['chasis'], values['plate_number'])
+            if owner == values['plate_number']:
+                kept.append((row_number, values))
+            else:
+                report.error(row_number, f"Chasis {values['chasis']} already belongs to {owner}")
+        return kept
+
+    return rows
+
+def write_import_chunk(model, key, fields, rows):
+    if model is FuelLog:
+        # Fill-ups are priced against their vehicle's running totals as they are stored
+        record_fuel_fills(db.session.connection(), [values for _, values in rows])
+        return
+    stmt = sqlite_insert(model)
+    if key:
+        updates = {f: stmt.excluded[f] for f in fields if f not in key}
+        if updates:
+            stmt = stmt.on_conflict_do_update(index_elements=list(key), set_=updates)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(key))
+    db.session.execute(stmt, [values for _, values in rows])
+    if model is Maintenance:
+        refresh_maintenance_schedule(db.session.connection(), {values['plate_number'] for _, values in rows})
+    elif model is Compliance:
+        refresh_compliance_status(db.session.connection(), {values['plate_number'] for _, values in rows})
+    if model in UTILIZATION_MODELS:
+        refresh_utilization(db.session.connection(), {values['plate_number'] for _, values in rows})
+    if model in FUEL_MODELS:
+        refresh_fuel_stats(db.session.connection(), {values['plate_number'] for _, values in rows})
+
+def run_import(entity, header, records):
+    model, key, columns = IMPORT_SPECS[entity]
+    report = ImportReport(entity)
+
+    missing = [f for f, c in columns.items() if c.required and f not in header]
+    if missing:
+        report.error(1, f'Missing required column(s): {", ".join(missing)}')
+        return report
+    fields = [f for f in columns if f in header]
+
+    for chunk in chunked(records, IMPORT_CHUNK_SIZE):
+        report.rows_read += len(chunk)
+        rows = []
+        for row_number, record in chunk:
+            try:
+                rows.append((row_number, validate_import_record(columns, fields, record)))
+            except ValueError as e:
+                report.error(row_number, str(e))
+        rows = resolve_import_chunk(entity, rows, report)
+        if not rows:
+            continue
+
+        try:
+            write_import_chunk(model, key, fields, rows)
+            db.session.info['dashboard_dirty'] = True
+            db.session.commit()
+            report.rows_written += len(rows)
+        except IntegrityError:
+            # Retry the chunk row by row so only the offending rows are rejected
+            db.session.rollback()
+            for row in rows:
+                try:
+                    write_import_chunk(model, key, fields, [row])
+                    db.session.info['dashboard_dirty'] = True
+                    db.session.commit()
+                    report.rows_written += 1
+                except IntegrityError as e:
+                    db.session.rollback()
+                    report.error(row[0], str(e.orig))
+    return report
+
+@bp.route('/import', methods=['GET', 'POST'])
+def bulk_import():
+    report = None
+    if request.method == 'POST':
+        entity = request.form.get('entity')
+        upload = request.files.get('file')
+        try:
+            if entity not in IMPORT_SPECS:
+                raise ValueError('Choose what to import')
+            if not upload or not upload.filename:
+                raise ValueError('Choose a file to upload')
+            header, records = open_upload(upload.filename, upload.stream)
+            report = run_import(entity, header, records)
+        except Exception as e:
+            db.session.rollback()
+            if request.args.get('format') == 'json':
+                return jsonify({'error': str(e)}), 400
+            flash(f'Error importing file: {str(e)}', 'danger')
+            return redirect(url_for('fleet.bulk_import'))
+
+        if request.args.get('format') == 'json':
+            return jsonify(report.as_dict())
+        flash(f'Imported {report.rows_written} of {report.rows_read} {entity} rows',
+              'success' if not report.error_count else 'warning')
+
+    return render_template('import.html', report=report,
+                           specs={name: list(spec[2]) for name, spec in IMPORT_SPECS.items()})
+
+# TELEMETRY
+TELEMETRY_REQUEST_LIMIT = 10000
+TELEMETRY_HISTORY_LIMIT = 1000
+GPS_COLUMNS = ('plate_number', 'recorded_at', 'lat', 'lon', 'speed')
+
+def write_telemetry_batch(engine, readings):
+    """Store one batch of readings and advance each vehicle's latest position.
+
+    Runs on the telemetry writer thread with its own connection, so it uses
+    the engine directly rather than the request-scoped session.
+    """
+    with engine.begin() as conn:
+        plates = {r.plate_number for r in readings}
+        known = {p for (p,) in conn.execute(
+            db.select(Vehicle.plate_number).where(Vehicle.plate_number.in_(plates)))}
+        rows = [r._asdict() for r in readings if r.plate_number in known]
+        if not rows:
+            return 0
+
+        conn.execute(sqlite_insert(GpsReading).on_conflict_do_nothing(),
+                     [{c: row[c] for c in GPS_COLUMNS} for row in rows])
+
+        latest = {}
+        for row in rows:
+            current = latest.get(row['plate_number'])
+            if current is None or row['recorded_at'] > current['recorded_at']:
+                latest[row['plate_number']] = row
+        stmt = sqlite_insert(VehiclePosition)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['plate_number'],
+            set_={c: stmt.excluded[c] for c in ('recorded_at', 'lat', 'lon', 'speed')},
+            where=stmt.excluded.recorded_at > VehiclePosition.recorded_at
+        ), list(latest.values()))
+
+        odometers = {}
+        for row in rows:
+            current = odometers.get(row['plate_number'])
+            if row['odometer_km'] is not None and (current is None or row['recorded_at'] > current['recorded_at']):
+                odometers[row['plate_number']] = {'plate_number': row['plate_number'], 'km': row['odometer_km'],
+                                                  'recorded_at': row['recorded_at']}
+        if odometers:
+            stmt = sqlite_insert(Odometer)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=['plate_number'],
+                set_={'km': stmt.excluded.km, 'recorded_at': stmt.excluded.recorded_at},
+                where=stmt.excluded.recorded_at > Odometer.recorded_at
+            ), list(odometers.values()))
+            refresh_maintenance_schedule(conn, odometers)
+
+        refresh_vehicle_locations(conn, latest)
+        evaluate_geofences(conn, rows)
+    return len(rows)
+
+telemetry_writer = None
+
+def get_telemetry_writer():
+    global telemetry_writer
+    if telemetry_writer is None:
+        app = current_app._get_current_object()
+        engine = write_engine(db.engine)
+
+        def write_batch(batch):
+            # The writer thread has no app context of its own
+            with app.app_context():
+                return retry_on_lock(lambda: write_telemetry_batch(engine, batch))
+        telemetry_writer = TelemetryWriter(
+            write_batch,
+            capacity=app.config['TELEMETRY_QUEUE_SIZE'],
+            batch_size=app.config['TELEMETRY_BATCH_SIZE'],
+            flush_interval=app.config['TELEMETRY_FLUSH_INTERVAL']
+        )
+        # Write out anything still queued when the worker shuts down
+        atexit.register(telemetry_writer.stop)
+    return telemetry_writer
+
+@bp.route('/api/telemetry', methods=['POST'])
+def ingest_telemetry():
+    payload = request.get_json(silent=True)
+    items = payload.get('readings') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON list of readings'}), 400
+    if len(items) > TELEMETRY_REQUEST_LIMIT:
+        return jsonify({'error': f'At most {TELEMETRY_REQUEST_LIMIT} readings per request'}), 413
+
+    readings, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            readings.append(parse_reading(item))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+
+    writer = get_telemetry_writer()
+    if readings and not writer.offer(readings):
+        response = jsonify({'error': 'Telemetry queue is full, retry later', 'queue_depth': writer.depth})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    return jsonify({'accepted': len(readings), 'errors': errors}), 202
+
+@bp.route('/api/telemetry/stats')
+def telemetry_stats():
+    return jsonify(get_telemetry_writer().stats())
+
+@bp.route('/api/telemetry/<plate_number>/latest')
+def latest_position(plate_number):
+    position = VehiclePosition.query.get_or_404(plate_number.upper())
+    return jsonify({
+        'plate': position.plate_number,
+        'timestamp': position.recorded_at.isoformat(),
+        'lat': position.lat,
+        'lon': position.lon,
+        'speed': position.speed,
+    })
+
+@bp.route('/api/telemetry/<plate_number>')
+def position_history(plate_number):
+    query = db.session.query(GpsReading.recorded_at, GpsReading.lat, GpsReading.lon, GpsReading.speed).filter(
+        GpsReading.plate_number == plate_number.upper())
+    try:
+        if request.args.get('since'):
+            query = query.filter(GpsReading.recorded_at >= datetime.fromisoformat(request.args['since']))
+        if request.args.get('until'):
+            query = query.filter(GpsReading.recorded_at < datetime.fromisoformat(request.args['until']))
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO 8601 timestamps'}), 400
+    limit = min(request.args.get('limit', TELEMETRY_HISTORY_LIMIT, type=int), TELEMETRY_HISTORY_LIMIT)
+    rows = query.order_by(GpsReading.recorded_at.desc()).limit(limit).all()
+    return jsonify([{
+        'timestamp': r.recorded_at.isoformat(),
+        'lat': r.lat,
+        'lon': r.lon,
+        'speed': r.speed,
+    } for r in rows])
+
+# NEAREST VEHICLES
+# vehicle_location holds one position per vehicle, bucketed into the grid
+# cells of spatial.py: its latest GPS fix, or for vehicles without telemetry
+# the "lat,long" of its latest assignment that has one. Form saves refresh
+# the affected vehicles from the session's after_flush hook and the
+# telemetry writer refreshes the vehicles in each batch. A nearest-vehicle
+# query reads the blocks of cells around the site, larger blocks at each
+# level, until the k-th match is provably the k-th nearest, so it touches
+# the vehicles near the site rather than the whole fleet.
+LOCATION_MODELS = (Assignment, VehiclePosition, Vehicle)
+NEAREST_DEFAULT = 10
+NEAREST_LIMIT = 100
+REGION_RANGES = 9  # a 3 x 3 neighbourhood of blocks is at most nine key ranges
+
+def location_entry(plate, lat, lon, source, located_at):
+    x, y, z = unit_vector(lat, lon)
+    return {'plate_number': plate, 'lat': lat, 'lon': lon, 'source': source, 'located_at': located_at,
+            'cell': cell_key(*grid_cell(lat, lon)), 'x': x, 'y': y, 'z': z}
+
+def refresh_vehicle_locations(conn, plates=None):
+    """Recompute the locations of `plates`, or of every vehicle when None."""
+    if plates is not None:
+        plates = list(plates)
+        if not plates:
+            return
+    sites = db.select(Assignment.plate_number, Assignment.gps_position, Assignment.start_date).join(
+        Vehicle, Vehicle.plate_number == Assignment.plate_number).where(func.trim(Assignment.gps_position) != '')
+    fixes = db.select(VehiclePosition.plate_number, VehiclePosition.lat, VehiclePosition.lon,
+                      VehiclePosition.recorded_at).join(Vehicle, Vehicle.plate_number == VehiclePosition.plate_number)
+    if plates is not None:
+        sites = sites.where(Assignment.plate_number.in_(plates))
+        fixes = fixes.where(VehiclePosition.plate_number.in_(plates))
+
+    entries = {}
+    for plate, text, start_date in conn.execute(
+            sites.order_by(Assignment.plate_number, Assignment.start_date.desc(), Assignment.id.desc())):
+        if plate in entries:
+            continue
+        try:
+            lat, lon = parse_position(text)
+        except ValueError:
+            continue  # free text from before positions were checked
+        located_at = datetime.combine(start_date, datetime.min.time()) if start_date else None
+        entries[plate] = location_entry(plate, lat, lon, 'assignment', located_at)
+    # A measured fix beats a position typed into an assignment
+    for plate, lat, lon, recorded_at in conn.execute(fixes):
+        entries[plate] = location_entry(plate, lat, lon, 'gps', recorded_at)
+
+    delete = db.delete(VehicleLocation)
+    if plates is not None:
+        delete = delete.where(VehicleLocation.plate_number.in_(plates))
+    conn.execute(delete)
+    for chunk in chunked(list(entries.values()), IMPORT_CHUNK_SIZE):
+        conn.execute(db.insert(VehicleLocation), chunk)
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_locations_for_changes(session, flush_context):
+    plates = changed_plates(session, LOCATION_MODELS)
+    if plates:
+        refresh_vehicle_locations(session.connection(), plates)
+
+def find_nearest_vehicles(lat, lon, k, conditions=(), busy=frozenset()):
+    """Up to `k` located vehicles nearest to (lat, lon) that meet `conditions` and are not in `busy`.
+
+    Returns spatial.nearest()'s ``(hits, reads, reach_km)``.
+    """
+    # One statement for every read of the search: the site, key ranges and
+    # limit are parameters, so it is built and compiled once, not per level
+    dx, dy, dz = (column - bindparam(f'site_{column.key}')
+                  for column in (VehicleLocation.x, VehicleLocation.y, VehicleLocation.z))
+    chord = (dx * dx + dy * dy + dz * dz).label('chord')
+    ranked = db.select(VehicleLocation.plate_number, chord).where(or_(*(
+        VehicleLocation.cell.between(bindparam(f'first_{i}'), bindparam(f'last_{i}'))
+        for i in range(REGION_RANGES)))).order_by(chord).limit(bindparam('limit')).subquery('ranked')
+    # The filters run on the ranked points only, not on every point in range
+    matches = and_(Vehicle.plate_number.is_not(None), *conditions).label('matches')
+    stmt = db.select(
+        ranked.c.chord, matches, VehicleLocation.plate_number, VehicleLocation.lat, VehicleLocation.lon,
+        VehicleLocation.source, VehicleLocation.located_at, Vehicle.make, Vehicle.model,
+        Vehicle.vehicle_type, Vehicle.fuel_type
+    ).join(VehicleLocation, VehicleLocation.plate_number == ranked.c.plate_number).outerjoin(
+        Vehicle, Vehicle.plate_number == ranked.c.plate_number
+    ).order_by(ranked.c.chord)
+    conn = db.session.connection()
+
+    def fetch(ranges, vector, limit):
+        # Unused range slots repeat the last range
+        ranges = ranges + ranges[-1:] * (REGION_RANGES - len(ranges))
+        params = {'site_x': vector[0], 'site_y': vector[1], 'site_z': vector[2], 'limit': limit}
+        for i, (first, last) in enumerate(ranges):
+            params[f'first_{i}'], params[f'last_{i}'] = first, last
+        return [(row.chord, bool(row.matches) and row.plate_number not in busy, row)
+                for row in conn.execute(stmt, params)]
+
+    return nearest_points(lat, lon, k, fetch)
+
+@bp.route('/api/v1/vehicles/nearest')
+def nearest_vehicles():
+    """The ?k= vehicles nearest to ?lat=&lon=, by default only those without an active assignment.
+
+    ?start= (and ?end=) asks for vehicles free over those dates instead,
+    ?available=0 drops the availability filter; ?vehicle_type= and
+    ?fuel_type= narrow the match.
+    """
+    try:
+        lat, lon = parse_position(f"{request.args['lat']},{request.args['lon']}")
+        k = min(max(int(request.args.get('k', NEAREST_DEFAULT)), 1), NEAREST_LIMIT)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lon must be decimal degrees and k a number'}), 400
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else start
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    if start and end < start:
+        return jsonify({'error': 'end is before start'}), 400
+
+    conditions = []
+    for column, options in ((Vehicle.vehicle_type, VEHICLE_TYPES), (Vehicle.fuel_type, FUEL_TYPES)):
+        value = request.args.get(column.key)
+        if value:
+            if value not in options:
+                return jsonify({'error': f'{column.key} must be one of {", ".join(options)}'}), 400
+            conditions.append(column == value)
+    busy = frozenset()
+    available = request.args.get('available', '1') != '0'
+    if available and start:
+        index = availability_cache.get(db.session.connection())
+        first, last = to_days([start, end], 0)
+        busy = index.busy('vehicle', first, last)
+    elif available:
+        conditions.append(~vehicle_is_assigned())
+
+    hits, reads, reach = find_nearest_vehicles(lat, lon, k, conditions, busy)
+    return jsonify({
+        'site': {'lat': lat, 'lon': lon},
+        'available': (start.isoformat(), end.isoformat()) if available and start else
+                     date.today().isoformat() if available else None,
+        'searched_km': round(reach, 3) if reach is not None else None,
+        'reads': reads,
+        'vehicles': [{
+            'plate_number': row.plate_number,
+            'distance_km': round(distance, 3),
+            'lat': row.lat,
+            'lon': row.lon,
+            'source': row.source,
+            'located_at': api_value(row.located_at),
+            'make': row.make,
+            'model': row.model,
+            'vehicle_type': row.vehicle_type,
+            'fuel_type': row.fuel_type,
+        } for distance, row in hits],
+    })
+
+@bp.cli.command('rebuild-vehicle-locations')
+def rebuild_vehicle_locations_command():
+    """Recompute every vehicle's location from telemetry and assignment positions."""
+    with write_engine(db.engine).begin() as conn:
+        refresh_vehicle_locations(conn)
+    click.echo(f'{db.session.query(func.count(VehicleLocation.plate_number)).scalar()} vehicle locations')
+
+@bp.cli.command('benchmark-nearest')
+@click.option('--queries', default=200, help='Sites to search from, per kind of site')
+@click.option('-k', 'k', default=NEAREST_DEFAULT)
+@click.option('--seed', 'random_seed', default=0)
+def benchmark_nearest_command(queries, k, random_seed):
+    """Time nearest-available-vehicle searches and check them against a scan of every location.
+
+    Sites are taken near located vehicles, where dispatch usually asks
+    from, and anywhere in the fleet's extent, which includes empty country
+    far from every vehicle.
+    """
+    located = db.session.query(VehicleLocation.lat, VehicleLocation.lon).all()
+    if not located:
+        raise SystemExit('No vehicle locations; seed a fleet or post telemetry first')
+    conditions = [~vehicle_is_assigned()]
+    available = db.session.query(VehicleLocation.lat, VehicleLocation.lon).join(
+        Vehicle, Vehicle.plate_number == VehicleLocation.plate_number).filter(*conditions).all()
+    lats, lons = np.array(located).T
+    rng = np.random.default_rng(random_seed)
+    picked = rng.integers(0, len(located), queries)
+    kinds = {
+        'near vehicles': np.column_stack([lats[picked] + rng.uniform(-0.05, 0.05, queries),
+                                          lons[picked] + rng.uniform(-0.05, 0.05, queries)]),
+        'anywhere': np.column_stack([rng.uniform(lats.min(), lats.max(), queries),
+                                     rng.uniform(lons.min(), lons.max(), queries)]),
+    }
+
+    click.echo(f'{len(located)} located vehicles, {len(available)} available today, k={k}')
+    click.echo(f"{'sites':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'reads':>6}")
+    mismatches = 0
+    for kind, sites in kinds.items():
+        timings, reads = [], []
+        for lat, lon in sites.tolist():
+            started = time.perf_counter()
+            hits, count, _ = find_nearest_vehicles(lat, lon, k, conditions)
+            timings.append((time.perf_counter() - started) * 1000)
+            reads.append(count)
+            expected = np.sort(distances_km(lat, lon, [r.lat for r in available], [r.lon for r in available]))[:k]
+            mismatches += not np.allclose([distance for distance, _ in hits], expected)
+        click.echo(f'{kind:<14} {percentile(timings, 50):>8.2f} {percentile(timings, 95):>8.2f} '
+                   f'{percentile(timings, 99):>8.2f} {sum(reads) / len(reads):>6.1f}')
+    if mismatches:
+        raise SystemExit(f'{mismatches} search(es) differ from a scan of every available vehicle')
+    click.echo('Every search matches a scan of every available vehicle')
+
+# DELETED VEHICLES
+# Nothing cascades on plate_number, so a deleted vehicle's rows in the
+# per-vehicle tables are removed here. This hook is registered after the
+# refresh hooks above, which still read the vehicle's old rows to take it
+# out of the fleet-wide totals.
+PER_VEHICLE_MODELS = (MaintenanceSchedule, ComplianceStatus, UtilizationSpan, UtilizationMonth, FuelStats,
+                      VehicleLocation, VehiclePosition, Odometer)
+
+@event.listens_for(db.session, 'after_flush')
+def _remove_deleted_vehicles(session, flush_context):
+    plates = [obj.plate_number for obj in session.deleted if isinstance(obj, Vehicle)]
+    if plates:
+        conn = session.connection()
+        for model in PER_VEHICLE_MODELS:
+            conn.execute(db.delete(model).where(model.plate_number.in_(plates)))
+
+# GEOFENCES
+# Each reading is matched to the assignment its vehicle was on that day and
+# tested against that assignment's fences plus those of its work place. An
+# exit from all of them is logged once and counted on the assignment; the
+# per-assignment state carries "inside or not" from one batch to the next.
+NO_END_DATE = 2 ** 63 - 1  # np.iinfo(np.int64).max
+
+def load_geofences(conn):
+    """Return fences keyed by assignment id and by work place."""
+    by_assignment, by_work_place = {}, {}
+    for fence_id, work_place, assignment_id, polygon in conn.execute(db.select(
+            Geofence.id, Geofence.work_place, Geofence.assignment_id, Geofence.polygon)):
+        fence = make_fence(fence_id, json.loads(polygon))
+        if assignment_id is not None:
+            by_assignment.setdefault(assignment_id, []).append(fence)
+        elif work_place:
+            by_work_place.setdefault(work_place, []).append(fence)
+    return by_assignment, by_work_place
+
+def evaluate_geofences(conn, rows):
+    """Check stored readings against geofences and log new violations.
+
+    `rows` are reading dicts with plate_number, recorded_at, lat and lon.
+    Returns the number of violations logged.
+    """
+    by_assignment, by_work_place = load_geofences(conn)
+    if not rows or not (by_assignment or by_work_place):
+        return 0
+
+    plates = sorted({r['plate_number'] for r in rows})
+    first_day = min(r['recorded_at'] for r in rows).date()
+    last_day = max(r['recorded_at'] for r in rows).date()
+    assignments = conn.execute(db.select(
+        Assignment.id, Assignment.plate_number, Assignment.work_place,
+        Assignment.start_date, Assignment.end_date
+    ).where(
+        Assignment.plate_number.in_(plates),
+        or_(Assignment.end_date.is_(None), Assignment.end_date >= first_day),
+        or_(Assignment.start_date.is_(None), Assignment.start_date <= last_day)
+    )).all()
+    group_fences = {}
+    for index, a in enumerate(assignments):
+        fences = by_assignment.get(a.id, []) + by_work_place.get(a.work_place, [])
+        if fences:
+            group_fences[index] = fences
+    if not group_fences:
+        return 0
+
+    plate_codes = {plate: code for code, plate in enumerate(plates)}
+    point_owners = np.array([plate_codes[r['plate_number']] for r in rows])
+    point_days = np.array([r['recorded_at'].toordinal() for r in rows])
+    times = np.array([r['recorded_at'] for r in rows], dtype='datetime64[us]').astype(np.int64)
+    lats = np.array([r['lat'] for r in rows], dtype=float)
+    lons = np.array([r['lon'] for r in rows], dtype=float)
+    groups = match_intervals(
+        point_owners, point_days,
+        np.array([plate_codes[a.plate_number] for a in assignments]),
+        np.array([a.start_date.toordinal() if a.start_date else 0 for a in assignments]),
+        np.array([a.end_date.toordinal() if a.end_date else NO_END_DATE for a in assignments])
+    )
+    checked, inside = inside_assigned_fences(lats, lons, groups, group_fences)
+
+    # Readings at or before an assignment's last evaluated fix were seen in
+    # an earlier batch (or are late duplicates) and must not count again
+    assignment_ids = np.array([a.id for a in assignments])
+    ids = [int(assignment_ids[g]) for g in np.unique(groups[checked])]
+    states = {assignment_id: (np.datetime64(recorded_at, 'us').astype(np.int64), was_inside)
+              for assignment_id, recorded_at, was_inside in conn.execute(db.select(
+                  GeofenceState.assignment_id, GeofenceState.recorded_at, GeofenceState.inside
+              ).where(GeofenceState.assignment_id.in_(ids)))}
+    last_seen = np.full(len(assignments), np.iinfo(np.int64).min)
+    previous_inside = {}
+    for index, assignment_id in enumerate(assignment_ids):
+        if assignment_id in states:
+            last_seen[index], previous_inside[index] = states[assignment_id]
+    fresh = np.flatnonzero(checked & (times > last_seen[np.maximum(groups, 0)]))
+    if not len(fresh):
+        return 0
+
+    exits = fresh[find_exits(groups[fresh], times[fresh], inside[fresh], previous_inside)]
+    if len(exits):
+        conn.execute(db.insert(GeofenceViolation), [{
+            'assignment_id': int(assignment_ids[groups[i]]),
+            'plate_number': rows[i]['plate_number'],
+            'recorded_at': rows[i]['recorded_at'],
+            'lat': rows[i]['lat'],
+            'lon': rows[i]['lon'],
+        } for i in exits])
+        counted, counts = np.unique(groups[exits], return_counts=True)
+        conn.execute(text(
+            'UPDATE assignment SET geofence_violations = coalesce(geofence_violations, 0) + :n WHERE id = :id'
+        ), [{'id': int(assignment_ids[g]), 'n': int(n)} for g, n in zip(counted, counts)])
+
+    # Remember the state at each assignment's newest fix in this batch
+    order = np.lexsort((times[fresh], groups[fresh]))
+    last = fresh[order][np.append(groups[fresh][order][1:] != groups[fresh][order][:-1], True)]
+    stmt = sqlite_insert(GeofenceState)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['assignment_id'],
+        set_={'recorded_at': stmt.excluded.recorded_at, 'inside': stmt.excluded.inside}
+    ), [{
+        'assignment_id': int(assignment_ids[groups[i]]),
+        'recorded_at': rows[i]['recorded_at'],
+        'inside': bool(inside[i]),
+    } for i in last])
+    return len(exits)
+
+def geofence_json(fence):
+    return {
+        'id': fence.id,
+        'name': fence.name,
+        'work_place': fence.work_place,
+        'assignment_id': fence.assignment_id,
+        'polygon': json.loads(fence.polygon),
+    }
+
+@bp.route('/api/geofences', methods=['GET', 'POST'])
+def geofences():
+    if request.method == 'POST':
+        payload = request.get_json(silent=True) or {}
+        name = str(payload.get('name') or '').strip()
+        work_place = str(payload.get('work_place') or '').strip() or None
+        assignment_id = payload.get('assignment_id')
+        if not name:
+            return jsonify({'error': 'name is required'}), 400
+        if (work_place is None) == (assignment_id is None):
+            return jsonify({'error': 'Give either work_place or assignment_id'}), 400
+        if assignment_id is not None and not db.session.get(Assignment, assignment_id):
+            return jsonify({'error': 'Assignment does not exist'}), 400
+        try:
+            fence = make_fence(None, payload.get('polygon') or [])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'polygon must be a list of at least three [lat, lon] points'}), 400
+
+        geofence = Geofence(name=name, work_place=work_place, assignment_id=assignment_id,
+                            polygon=json.dumps(fence.polygon.tolist()))
+        db.session.add(geofence)
+        db.session.commit()
+        return jsonify(geofence_json(geofence)), 201
+
+    query = Geofence.query
+    if request.args.get('work_place'):
+        query = query.filter(Geofence.work_place == request.args['work_place'])
+    if request.args.get('assignment_id', type=int):
+        query = query.filter(Geofence.assignment_id == request.args.get('assignment_id', type=int))
+    return jsonify([geofence_json(f) for f in query.order_by(Geofence.id)])
+
+@bp.route('/api/geofences/<int:geofence_id>', methods=['DELETE'])
+def delete_geofence(geofence_id):
+    geofence = Geofence.query.get_or_404(geofence_id)
+    db.session.delete(geofence)
+    db.session.commit()
+    return '', 204
+
+@bp.route('/api/assignments/<int:assignment_id>/violations')
+def assignment_violations(assignment_id):
+    assignment = Assignment.query.get_or_404(assignment_id)
+    limit = min(request.args.get('limit', TELEMETRY_HISTORY_LIMIT, type=int), TELEMETRY_HISTORY_LIMIT)
+    violations = GeofenceViolation.query.filter_by(assignment_id=assignment_id).order_by(
+        GeofenceViolation.recorded_at.desc()).limit(limit)
+    return jsonify({
+        'assignment_id': assignment.id,
+        'geofence_violations': assignment.geofence_violations or 0,
+        'events': [{
+            'timestamp': v.recorded_at.isoformat(),
+            'plate': v.plate_number,
+            'lat': v.lat,
+            'lon': v.lon,
+        } for v in violations],
+    })
+
+@bp.cli.command('benchmark-geofences')
+@click.option('--points', default=1440000, help='GPS fixes to check (default: a day of one-minute fixes for 1000 vehicles)')
+@click.option('--fences', default=50)
+@click.option('--vertices', default=12)
+def benchmark_geofences_command(points, fences, vertices):
+    """Compare the vectorized geofence engine with a per-point loop."""
+    result = benchmark_geofences(points=points, fences=fences, vertices=vertices)
+    click.echo(f"{result['points']} points, {result['fences']} fences of {result['vertices']} vertices")
+    click.echo(f"vectorized: {result['vectorized_seconds']:.2f}s ({result['exits']} exits)")
+    click.echo(f"naive loop: {result['naive_seconds_estimated']:.2f}s (extrapolated)")
+    click.echo(f"speedup:    {result['speedup']:.0f}x")
+
+# REPORT CACHE
+# Report pages are cached as the HTML of their content block, keyed by the
+# report, the entity or query it shows and the table_version of every table
+# it reads. Any commit to one of those tables (ORM, import or raw SQL) bumps
+# the version through the triggers in versions.py, so a repeat view costs a
+# single version lookup and a stale page is never served. The layout is
+# rendered per request so flashed messages are never cached.
+REPORT_TABLES = {
+    'vehicle_report.html': ('vehicle', 'compliance', 'maintenance', 'assignment', 'driver'),
+    'driver_report.html': ('driver', 'assignment', 'vehicle'),
+    'reports/assignment_summary.html': ('vehicle', 'assignment'),
+    'reports/unassigned_vehicles.html': ('vehicle', 'assignment'),
+    'reports/driver_assignments.html': ('driver', 'assignment', 'vehicle'),
+    'reports/compliance.html': ('compliance_status', 'vehicle'),
+    'reports/utilization.html': ('utilization_span', 'utilization_day', 'utilization_month', 'vehicle'),
+    'reports/fuel.html': ('fuel_fleet_stats', 'fuel_stats', 'vehicle'),
+}
+
+report_cache = None
+
+def init_report_cache(app):
+    global report_cache
+    report_cache = RenderCache(
+        MemoryBackend(app.config['REPORT_CACHE_SIZE']),
+        DiskBackend(app.config['REPORT_CACHE_DIR'], app.config['REPORT_CACHE_DISK_ENTRIES'])
+        if app.config['REPORT_CACHE_DIR'] else None)
+
+def render_report_block(template_name, context):
+    """Render only the content block of a report template."""
+    template = current_app.jinja_env.get_template(template_name)
+    current_app.update_template_context(context)
+    return ''.join(template.blocks['content'](template.new_context(context)))
+
+def cached_report(template_name, key, build):
+    """Serve a report from report_cache while the tables it reads are unchanged.
+
+    `build` runs only on a miss and returns the template context, or None
+    when there is nothing to report, in which case None is returned.
+    """
+    versions = table_versions(db.session.connection(), REPORT_TABLES[template_name])
+    cache_key = (template_name, key, version_key(versions))
+    html = report_cache.get(cache_key)
+    if html is None:
+        context = build()
+        if context is None:
+            return None
+        html = render_report_block(template_name, context)
+        report_cache.set(cache_key, html)
+    return render_template('report_page.html', content=Markup(html))
+
+@bp.route('/reports/cache/stats')
+def report_cache_stats():
+    return jsonify(report_cache.stats())
+
+@bp.cli.command('clear-report-cache')
+def clear_report_cache_command():
+    """Drop cached report pages, including the shared disk cache."""
+    report_cache.clear()
+    click.echo('Report cache cleared')
 
 # Reporting Routes with proper imports and error handling
 
-@app.route('/reports/assignment-summary')
+@bp.route('/reports/assignment-summary')
+@reads_snapshot
 def assignment_summary_report():
-    try:
+    def build():
         assignment_counts = db.session.query(
             Vehicle.assigned_for,
             func.count(Vehicle.plate_number)
         ).group_by(Vehicle.assigned_for).all()
         
-        ongoing_assignments = Assignment.query.filter(
-            or_(
-                Assignment.end_date.is_(None),
-                Assignment.end_date >= date.today()
-            )
-        ).count()
+        ongoing_assignments, unassigned_vehicles = active_assignment_counts()
         
-        active_assignments = db.session.query(Assignment.plate_number).filter(
-            or_(
-                Assignment.end_date.is_(None),
-                Assignment.end_date >= date.today()
-            )
-        )
-        unassigned_vehicles = db.session.query(Vehicle).filter(
-            ~Vehicle.plate_number.in_(active_assignments)
-        ).count()
-        
-        return render_template(
-            'reports/assignment_summary.html',
+        return dict(
             assignment_counts=assignment_counts,
             ongoing_assignments=ongoing_assignments,
             unassigned_vehicles=unassigned_vehicles,
             now=datetime.now()
         )
+    try:
+        # Which assignments are active depends on the day, so it is part of the key
+        return cached_report('reports/assignment_summary.html', date.today(), build)
     except Exception as e:
         flash(f'Error generating assignment summary: {str(e)}', 'danger')
-        return redirect(url_for('generate_report'))
+        return redirect(url_for('fleet.generate_report'))
 
-@app.route('/reports/unassigned-vehicles')
+@bp.route('/reports/unassigned-vehicles')
+@reads_snapshot
 def unassigned_vehicles_report():
-    try:
-        active_assignments = db.session.query(Assignment.plate_number).filter(
-            or_(
-                Assignment.end_date.is_(None),
-                Assignment.end_date >= date.today()
-            )
-        )
-        vehicles = db.session.query(Vehicle).filter(
-            ~Vehicle.plate_number.in_(active_assignments)
-        ).all()
+    def build():
+        vehicles = db.session.query(Vehicle).options(
+            load_only(Vehicle.plate_number, Vehicle.make, Vehicle.model,
+                      Vehicle.vehicle_type, Vehicle.assigned_for)
+        ).filter(~vehicle_is_assigned()).all()
         
-        return render_template(
-            'reports/unassigned_vehicles.html',
-            vehicles=vehicles,
+        return dict(vehicles=vehicles, now=datetime.now())
+    try:
+        # Which assignments are active depends on the day, so it is part of the key
+        return cached_report('reports/unassigned_vehicles.html', date.today(), build)
+    except Exception as e:
+        flash(f'Error generating unassigned vehicles report: {str(e)}', 'danger')
+        return redirect(url_for('fleet.generate_report'))
+
+@bp.route('/reports/compliance')
+@reads_snapshot
+def compliance_report():
+    def build():
+        query = ComplianceStatus.query.options(
+            joinedload(ComplianceStatus.vehicle).load_only(Vehicle.make, Vehicle.model))
+        status = request.args.get('status')
+        if status in COMPLIANCE_STATUSES:
+            query = query.filter(ComplianceStatus.status == status)
+        page = keyset_page(query, COMPLIANCE_SORTS, ComplianceStatus.plate_number, 'plate_number')
+        return dict(
+            entries=page.items,
+            page=page,
+            status=status,
+            statuses=COMPLIANCE_STATUSES,
             now=datetime.now()
         )
+    try:
+        return cached_report('reports/compliance.html', tuple(sorted(request.args.items())), build)
     except Exception as e:
-        flash(f'Error generating unassigned vehicles report: {str(e)}', 'danger')
-        return redirect(url_for('generate_report'))
+        flash(f'Error generating compliance report: {str(e)}', 'danger')
+        return redirect(url_for('fleet.generate_report'))
 
-@app.route('/reports/driver-assignments')
+@bp.route('/reports/driver-assignments')
+@reads_snapshot
 def driver_assignments_report():
-    try:
+    def build():
         drivers = db.session.query(Driver, Assignment).outerjoin(
             Assignment,
-            and_(
-                Assignment.driver_id == Driver.id,
-                or_(
-                    Assignment.end_date.is_(None),
-                    Assignment.end_date >= date.today()
-                )
-            )
+            and_(Assignment.driver_id == Driver.id, assignment_is_active())
+        ).options(
+            joinedload(Assignment.vehicle).load_only(Vehicle.plate_number, Vehicle.make)
         ).all()
         
-        return render_template(
-            'reports/driver_assignments.html',
-            drivers=drivers,
-            now=datetime.now()
-        )
+        return dict(drivers=drivers, now=datetime.now())
+    try:
+        # Which assignments are active depends on the day, so it is part of the key
+        return cached_report('reports/driver_assignments.html', date.today(), build)
     except Exception as e:
         flash(f'Error generating driver assignments report: {str(e)}', 'danger')
-        return redirect(url_for('generate_report'))
+        return redirect(url_for('fleet.generate_report'))
 
 # Update the existing generate_report route to handle both basic and advanced
-@app.route('/report', methods=['GET', 'POST'])
+@bp.route('/report', methods=['GET', 'POST'])
 def generate_report():
     if request.method == 'POST' and request.form.get('report_type') == 'basic':
         report_type = request.form['search_type']
         identifier = request.form['identifier'].strip()
         
         if report_type == 'plate':
-            vehicle = Vehicle.query.get(identifier.upper())
-            if vehicle:
-                return render_template('vehicle_report.html', vehicle=vehicle)
+            def build():
+                vehicle = Vehicle.query.options(
+                    joinedload(Vehicle.compliance),
+                    selectinload(Vehicle.maintenance),
+                    selectinload(Vehicle.assignments).joinedload(Assignment.driver)
+                ).filter_by(plate_number=identifier.upper()).first()
+                if not vehicle:
+                    # Fall back to the best partial match, e.g. a plate typed without dashes
+                    hits = search(db.session, identifier, kinds=('vehicle',), limit=1)
+                    if hits:
+                        vehicle = Vehicle.query.options(
+                            joinedload(Vehicle.compliance),
+                            selectinload(Vehicle.maintenance),
+                            selectinload(Vehicle.assignments).joinedload(Assignment.driver)
+                        ).filter_by(plate_number=hits[0].key).first()
+                return dict(vehicle=vehicle) if vehicle else None
+            page = cached_report('vehicle_report.html', identifier.upper(), build)
+            if page:
+                return page
             flash(f'No vehicle found with plate number: {identifier}', 'danger')
         
         elif report_type == 'driver_name':
-            driver = Driver.query.filter(Driver.name.ilike(f'%{identifier}%')).first()
-            if driver:
-                return render_template('driver_report.html', driver=driver)
+            def build():
+                hits = search(db.session, identifier, kinds=('driver',), limit=1)
+                driver = Driver.query.options(
+                    selectinload(Driver.assignments).joinedload(Assignment.vehicle)
+                ).filter_by(id=hits[0].key).first() if hits else None
+                return dict(driver=driver) if driver else None
+            page = cached_report('driver_report.html', ('name', identifier.lower()), build)
+            if page:
+                return page
             flash(f'No driver found with name: {identifier}', 'danger')
         
         elif report_type == 'driver_id':
-            driver = Driver.query.filter_by(id_number=identifier).first()
-            if driver:
-                return render_template('driver_report.html', driver=driver)
+            def build():
+                driver = Driver.query.options(
+                    selectinload(Driver.assignments).joinedload(Assignment.vehicle)
+                ).filter_by(id_number=identifier).first()
+                return dict(driver=driver) if driver else None
+            page = cached_report('driver_report.html', ('id_number', identifier), build)
+            if page:
+                return page
             flash(f'No driver found with ID: {identifier}', 'danger')
     
     return render_template('report.html')
 
-@app.route('/reports/export/assignment-summary')
-def export_assignment_summary():
+# REST API
+# /api/v1 serves the core tables as JSON with field selection, equality
+# filters and keyset pagination on the primary key. ETag and Last-Modified
+# come from the table_version row of the table read, which is checked
+# before anything else, so a client polling with If-None-Match costs one
+# primary-key lookup until the table changes.
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+API_RESERVED_ARGS = ('fields', 'limit', 'after')
+API_RESOURCES = {
+    'vehicles': (Vehicle, 'plate_number'),
+    'drivers': (Driver, 'id'),
+    'assignments': (Assignment, 'id'),
+    'maintenance': (Maintenance, 'id'),
+    'compliance': (Compliance, 'plate_number'),
+}
+
+def api_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def api_parse(column, value):
+    """Convert a query-string value to the column's Python type; 'null' matches NULL."""
+    if value == 'null':
+        return None
+    python_type = column.type.python_type
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type in (int, float):
+        return python_type(value)
+    return value
+
+def api_fields(model):
+    columns = model.__table__.columns
+    if not request.args.get('fields'):
+        return list(columns.keys())
+    fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise ValueError(f'Unknown field(s): {", ".join(unknown)}')
+    return fields
+
+def api_filters(model):
+    columns = model.__table__.columns
+    filters = []
+    for name, value in request.args.items():
+        if name in API_RESERVED_ARGS:
+            continue
+        if name not in columns:
+            raise ValueError(f'Cannot filter on {name}')
+        column = columns[name]
+        parsed = api_parse(column, value)
+        filters.append(column.is_(None) if parsed is None else column == parsed)
+    return filters
+
+def api_conditional(model):
+    """Return (etag, last_modified, not_modified) for the current request."""
+    table = model.__tablename__
+    versions = table_versions(db.session.connection(), [table])
+    etag = etag_for(request.full_path, version_key(versions))
+    last_modified = versions[table][1] if table in versions else None
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = (last_modified is not None and request.if_modified_since is not None and
+                        last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+    return etag, last_modified, not_modified
+
+def api_response(body, etag, last_modified, status=200):
+    response = Response(status=304) if body is None else jsonify(body)
+    if body is not None:
+        response.status_code = status
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients may keep the response but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route('/api/v1/<resource>')
+def api_list(resource):
+    if resource not in API_RESOURCES:
+        return jsonify({'error': f'Unknown resource {resource}'}), 404
+    model, key = API_RESOURCES[resource]
+    key_column = model.__table__.columns[key]
     try:
-        # Get the same data as the HTML report
-        assignment_counts = db.session.query(
-            Vehicle.assigned_for,
-            func.count(Vehicle.plate_number)
-        ).group_by(Vehicle.assigned_for).all()
-        
-        # Create a DataFrame
-        df = pd.DataFrame(assignment_counts, columns=['Assignment Type', 'Vehicle Count'])
-        
-        # Create Excel file in memory
-        output = BytesIO()
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-        df.to_excel(writer, sheet_name='Assignment Summary', index=False)
-        
-        # Add summary stats
-        stats = pd.DataFrame({
-            'Metric': ['Ongoing Assignments', 'Unassigned Vehicles'],
-            'Count': [
-                Assignment.query.filter(or_(Assignment.end_date.is_(None), Assignment.end_date >= date.today())).count(),
-                db.session.query(Vehicle).filter(~Vehicle.plate_number.in_(
-                    db.session.query(Assignment.plate_number).filter(
-                        or_(Assignment.end_date.is_(None), Assignment.end_date >= date.today()))
-                )).count()
-            ]
+        fields = api_fields(model)
+        filters = api_filters(model)
+        limit = min(max(int(request.args.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+        after = api_parse(key_column, request.args['after']) if request.args.get('after') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag, last_modified, not_modified = api_conditional(model)
+    if not_modified:
+        return api_response(None, etag, last_modified)
+
+    query = db.select(*[model.__table__.columns[f] for f in fields], key_column).where(*filters)
+    if after is not None:
+        query = query.where(key_column > after)
+    rows = db.session.execute(query.order_by(key_column).limit(limit + 1)).all()
+    next_url = None
+    if len(rows) > limit:
+        args = request.args.to_dict()
+        args['after'] = rows[limit - 1][-1]
+        next_url = url_for('fleet.api_list', resource=resource, **args)
+    return api_response({
+        'data': [{f: api_value(v) for f, v in zip(fields, row)} for row in rows[:limit]],
+        'next': next_url,
+    }, etag, last_modified)
+
+@bp.route('/api/v1/<resource>/<key_value>')
+def api_item(resource, key_value):
+    if resource not in API_RESOURCES:
+        return jsonify({'error': f'Unknown resource {resource}'}), 404
+    model, key = API_RESOURCES[resource]
+    key_column = model.__table__.columns[key]
+    try:
+        fields = api_fields(model)
+        key_value = api_parse(key_column, key_value.upper() if key == 'plate_number' else key_value)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag, last_modified, not_modified = api_conditional(model)
+    if not_modified:
+        return api_response(None, etag, last_modified)
+
+    row = db.session.execute(db.select(*[model.__table__.columns[f] for f in fields]).where(
+        key_column == key_value)).first()
+    if row is None:
+        return api_response({'error': f'{resource} {key_value} not found'}, etag, last_modified, 404)
+    return api_response({'data': {f: api_value(v) for f, v in zip(fields, row)}}, etag, last_modified)
+
+# CHANGE LOG
+# Triggers from changes.py append every insert, update and delete of the
+# API_RESOURCES tables to change_log, whichever code path made it. A new
+# consumer asks /api/v1/changes for a cursor (no `since`), reads the
+# resources through /api/v1 once, then keeps asking for what came after
+# the last cursor it applied, so a sync costs time in proportion to what
+# changed. Compaction runs on a daily background thread in each worker (or
+# from the compact-change-log command), never inside a request; a cursor it
+# has made unusable gets 410 Gone with the `latest` cursor to start over from.
+CHANGE_PAGE_SIZE = 500
+CHANGE_MAX_PAGE_SIZE = 5000
+_changes_compacted_on = None
+
+def captured_tables():
+    """{table: (key, columns)} for every table served by the API."""
+    return {model.__tablename__: (key, list(model.__table__.columns.keys()))
+            for model, key in API_RESOURCES.values()}
+
+def compact_change_log(conn):
+    return compact_changes(conn, current_app.config['CHANGE_LOG_RETENTION_DAYS'],
+                           current_app.config['CHANGE_LOG_TOMBSTONE_DAYS'])
+
+def compact_change_log_if_due():
+    global _changes_compacted_on
+    today = date.today()
+    if _changes_compacted_on == today:
+        return
+    with write_engine(db.engine).begin() as conn:
+        compact_change_log(conn)
+    _changes_compacted_on = today
+
+@bp.before_app_request
+def start_change_log_compaction():
+    run_daily('change-log-compaction', compact_change_log_if_due)
+
+@bp.route('/api/v1/changes')
+def api_changes():
+    resource_of = {model.__tablename__: resource for resource, (model, _) in API_RESOURCES.items()}
+    try:
+        since = int(request.args['since']) if 'since' in request.args else None
+        limit = min(max(int(request.args.get('limit', CHANGE_PAGE_SIZE)), 1), CHANGE_MAX_PAGE_SIZE)
+        resources = [r.strip() for r in request.args.get('resources', '').split(',') if r.strip()]
+        unknown = [r for r in resources if r not in API_RESOURCES]
+        if unknown:
+            raise ValueError(f'Unknown resource(s): {", ".join(unknown)}')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = db.session.connection()
+    if since is None:
+        return jsonify({'changes': [], 'cursor': latest_seq(conn), 'next': None})
+    try:
+        rows = changes_since(conn, since, limit + 1, [API_RESOURCES[r][0].__tablename__ for r in resources])
+    except CursorExpired as e:
+        return jsonify({'error': str(e), 'floor': e.floor, 'latest': latest_seq(conn)}), 410
+    more = len(rows) > limit
+    rows = rows[:limit]
+    cursor = rows[-1].seq if rows else since
+    return jsonify({
+        'changes': [{
+            'seq': row.seq,
+            'resource': resource_of[row.table_name],
+            'op': row.op,
+            'key': row.row_key,
+            'data': json.loads(row.data) if row.data is not None else None,
+            'changed_at': row.changed_at,
+        } for row in rows],
+        'cursor': cursor,
+        'next': url_for('fleet.api_changes', **dict(request.args.to_dict(), since=cursor)) if more else None,
+    })
+
+@bp.cli.command('compact-change-log')
+def compact_change_log_command():
+    """Drop superseded change log entries and expired deletes."""
+    with write_engine(db.engine).begin() as conn:
+        superseded, tombstones = compact_change_log(conn)
+        remaining = conn.exec_driver_sql('SELECT count(*) FROM change_log').scalar()
+    click.echo(f'Dropped {superseded} superseded entries and {tombstones} deletes; {remaining} entries left')
+
+# SEARCH
+SEARCH_PAGE_SIZE = 25
+SEARCH_KINDS = ('vehicle', 'driver', 'assignment')
+
+@bp.route('/search')
+def search_fleet():
+    phrase = request.args.get('q', '').strip()
+    kinds = [k for k in request.args.getlist('kind') if k in SEARCH_KINDS] or SEARCH_KINDS
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    # Fetch one extra row to know whether there is a next page
+    hits = search(db.session, phrase, kinds=kinds, limit=SEARCH_PAGE_SIZE + 1,
+                  offset=(page - 1) * SEARCH_PAGE_SIZE)
+    has_next = len(hits) > SEARCH_PAGE_SIZE
+    hits = hits[:SEARCH_PAGE_SIZE]
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'query': phrase,
+            'page': page,
+            'has_next': has_next,
+            'results': [{'kind': h.kind, 'key': h.key, 'label': h.label, 'detail': h.detail} for h in hits],
         })
-        stats.to_excel(writer, sheet_name='Summary Stats', index=False)
-        
-        writer.close()
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            download_name=f'assignment_summary_{datetime.now().strftime("%Y%m%d")}.xlsx',
-            as_attachment=True
-        )
+    return render_template('search.html', phrase=phrase, hits=hits, page=page,
+                           has_next=has_next, kinds=kinds)
+
+@bp.route('/search/typeahead')
+def search_typeahead():
+    hits = search(db.session, request.args.get('q', ''), limit=TYPEAHEAD_LIMIT)
+    return jsonify([{'kind': h.kind, 'key': h.key, 'label': h.label, 'detail': h.detail} for h in hits])
+
+@bp.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Refill the full-text search tables from the vehicle, driver and assignment tables."""
+    with db.engine.begin() as conn:
+        rebuild_search_index(conn)
+    click.echo('Search index rebuilt')
+
+# Export rows are read with yield_per so only one chunk of ORM rows is
+# buffered at a time, and written straight into the response or a temp file.
+def export_response(basename, sheets):
+    """Stream `sheets` in the format named by the `format` query parameter."""
+    fmt = request.args.get('format', 'xlsx')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {fmt}')
+    if fmt in SINGLE_SHEET_FORMATS and len(sheets) > 1:
+        return jsonify({'error': f'{fmt} holds one table but this report has {len(sheets)} sheets; '
+                                 'export it as xlsx or csv'}), 400
+
+    filename = f'{basename}_{datetime.now().strftime("%Y%m%d")}.{fmt}'
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    if fmt == 'csv':
+        return Response(stream_with_context(iter_csv(sheets)), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+    path = build_file(fmt, sheets)
+    try:
+        response = Response(iter_file(path), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+    except BaseException:
+        discard(path)
+        raise
+    # Removed when the response closes, whether or not the body was ever read
+    response.call_on_close(lambda: discard(path))
+    return response
+
+def assignment_summary_rows():
+    yield from db.session.query(
+        Vehicle.assigned_for,
+        func.count(Vehicle.plate_number)
+    ).group_by(Vehicle.assigned_for)
+
+def assignment_summary_stats_rows():
+    ongoing, unassigned = active_assignment_counts()
+    yield 'Ongoing Assignments', ongoing
+    yield 'Unassigned Vehicles', unassigned
+
+def assignment_summary_sheets(params):
+    return [
+        ('Assignment Summary', ['Assignment Type', 'Vehicle Count'], assignment_summary_rows()),
+        ('Summary Stats', ['Metric', 'Count'], assignment_summary_stats_rows()),
+    ]
+
+@bp.route('/reports/export/assignment-summary')
+@reads_snapshot
+def export_assignment_summary():
+    try:
+        return export_response('assignment_summary', assignment_summary_sheets(request.args))
     except Exception as e:
         flash(f'Error exporting report: {str(e)}', 'danger')
-        return redirect(url_for('generate_report'))
-        
-@app.route('/reports/export/unassigned-vehicles')
+        return redirect(url_for('fleet.generate_report'))
+
+def unassigned_vehicle_rows():
+    yield from db.session.query(
+        Vehicle.plate_number,
+        Vehicle.make,
+        Vehicle.model,
+        Vehicle.vehicle_type,
+        Vehicle.assigned_for
+    ).filter(~vehicle_is_assigned()).yield_per(EXPORT_CHUNK_SIZE)
+
+def unassigned_vehicle_sheets(params):
+    return [(
+        'Unassigned Vehicles',
+        ['Plate Number', 'Make', 'Model', 'Type', 'Assigned For'],
+        unassigned_vehicle_rows()
+    )]
+
+@bp.route('/reports/export/unassigned-vehicles')
+@reads_snapshot
 def export_unassigned_vehicles():
     try:
-        vehicles = db.session.query(Vehicle).filter(
-            ~Vehicle.plate_number.in_(
-                db.session.query(Assignment.plate_number).filter(
-                    or_(Assignment.end_date.is_(None), Assignment.end_date >= date.today())
-            ))
-        ).all()
-        
-        # Convert to list of dicts
-        data = [{
-            'Plate Number': v.plate_number,
-            'Make': v.make,
-            'Model': v.model,
-            'Type': v.vehicle_type,
-            'Assigned For': v.assigned_for
-        } for v in vehicles]
-        
-        df = pd.DataFrame(data)
-        
-        output = BytesIO()
-        df.to_excel(output, sheet_name='Unassigned Vehicles', index=False)
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            download_name=f'unassigned_vehicles_{datetime.now().strftime("%Y%m%d")}.xlsx',
-            as_attachment=True
-        )
+        return export_response('unassigned_vehicles', unassigned_vehicle_sheets(request.args))
     except Exception as e:
         flash(f'Error exporting report: {str(e)}', 'danger')
-        return redirect(url_for('generate_report'))
+        return redirect(url_for('fleet.generate_report'))
 
-@app.route('/reports/export/driver-assignments')
-def export_driver_assignments():
+def compliance_rows(status=None):
+    query = db.session.query(
+        ComplianceStatus.plate_number,
+        Vehicle.make,
+        Vehicle.model,
+        ComplianceStatus.status,
+        ComplianceStatus.summary,
+        ComplianceStatus.insurance_expires,
+        ComplianceStatus.inspection_expires
+    ).join(Vehicle, Vehicle.plate_number == ComplianceStatus.plate_number)
+    if status in COMPLIANCE_STATUSES:
+        query = query.filter(ComplianceStatus.status == status)
+    yield from query.order_by(ComplianceStatus.plate_number).yield_per(EXPORT_CHUNK_SIZE)
+
+def compliance_sheets(params):
+    return [(
+        'Compliance',
+        ['Plate Number', 'Make', 'Model', 'Status', 'Issues', 'Insurance Expires', 'Inspection Expires'],
+        compliance_rows(params.get('status'))
+    )]
+
+@bp.route('/reports/export/compliance')
+@reads_snapshot
+def export_compliance():
     try:
-        drivers = db.session.query(Driver, Assignment).outerjoin(
-            Assignment,
-            and_(
-                Assignment.driver_id == Driver.id,
-                or_(
-                    Assignment.end_date.is_(None),
-                    Assignment.end_date >= date.today()
-                )
-            )
-        ).all()
-        
-        data = [{
-            'Driver Name': d.name,
-            'ID Number': d.id_number,
-            'Phone': d.phone,
-            'Assigned Vehicle': f"{a.vehicle.plate_number} ({a.vehicle.make})" if a else 'Not assigned',
-            'Work Place': a.work_place if a else '-',
-            'Start Date': a.start_date.strftime('%Y-%m-%d') if a and a.start_date else '-',
-            'End Date': a.end_date.strftime('%Y-%m-%d') if a and a.end_date else '-'
-        } for d, a in drivers]
-        
-        df = pd.DataFrame(data)
-        
-        output = BytesIO()
-        df.to_excel(output, sheet_name='Driver Assignments', index=False)
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            download_name=f'driver_assignments_{datetime.now().strftime("%Y%m%d")}.xlsx',
-            as_attachment=True
+        return export_response('compliance', compliance_sheets(request.args))
+    except Exception as e:
+        flash(f'Error exporting report: {str(e)}', 'danger')
+        return redirect(url_for('fleet.generate_report'))
+
+def driver_assignment_rows():
+    rows = db.session.query(
+        Driver.name,
+        Driver.id_number,
+        Driver.phone,
+        Assignment.id,
+        Vehicle.plate_number,
+        Vehicle.make,
+        Assignment.work_place,
+        Assignment.start_date,
+        Assignment.end_date
+    ).outerjoin(
+        Assignment,
+        and_(Assignment.driver_id == Driver.id, assignment_is_active())
+    ).outerjoin(Vehicle, Assignment.plate_number == Vehicle.plate_number).yield_per(EXPORT_CHUNK_SIZE)
+    
+    for r in rows:
+        yield (
+            r.name,
+            r.id_number,
+            r.phone,
+            f"{r.plate_number} ({r.make})" if r.id else 'Not assigned',
+            r.work_place if r.id else '-',
+            r.start_date.strftime('%Y-%m-%d') if r.start_date else '-',
+            r.end_date.strftime('%Y-%m-%d') if r.end_date else '-'
         )
+
+def driver_assignment_sheets(params):
+    return [(
+        'Driver Assignments',
+        ['Driver Name', 'ID Number', 'Phone', 'Assigned Vehicle', 'Work Place', 'Start Date', 'End Date'],
+        driver_assignment_rows()
+    )]
+
+@bp.route('/reports/export/driver-assignments')
+@reads_snapshot
+def export_driver_assignments():
+    try:
+        return export_response('driver_assignments', driver_assignment_sheets(request.args))
+    except Exception as e:
+        flash(f'Error exporting report: {str(e)}', 'danger')
+        return redirect(url_for('fleet.generate_report'))
+
+def utilization_sheets(params):
+    first, last, period, assigned_for = utilization_range(params)
+    series = fleet_utilization(first, last, period, assigned_for)
+    vehicles, _, _ = vehicle_utilization(first, last, assigned_for)
+    return [
+        ('Utilization by Category', ['Period', 'Assigned For', 'Vehicles', 'Busy Vehicle Days', 'Vehicle Days', 'Utilization %'],
+         ((r.period, r.assigned_for, int(r.vehicles), int(r.busy_days), int(r.vehicle_days), round(r.utilization * 100, 1))
+          for r in series.itertuples())),
+        ('Utilization by Vehicle', ['Plate Number', 'Make', 'Model', 'Assigned For', 'Busy Days', 'Days', 'Utilization %'],
+         ((r.plate_number, r.make, r.model, r.assigned_for, int(r.busy_days), int(r.days), round(r.utilization * 100, 1))
+          for r in vehicles.itertuples())),
+        ('Vehicle Months', ['Plate Number', 'Month', 'Busy Days', 'Days', 'Utilization %'],
+         ((plate, month, days, length, round(days / length * 100, 1))
+          for plate, month, days, length in vehicle_month_rows(first, last, assigned_for))),
+    ]
+
+@bp.route('/reports/export/utilization')
+@reads_snapshot
+def export_utilization():
+    try:
+        return export_response('utilization', utilization_sheets(request.args))
+    except Exception as e:
+        flash(f'Error exporting report: {str(e)}', 'danger')
+        return redirect(url_for('fleet.generate_report'))
+
+def fuel_vehicle_rows():
+    yield from db.session.query(
+        FuelStats.plate_number,
+        Vehicle.make,
+        Vehicle.model,
+        FuelStats.fuel_type,
+        FuelStats.vehicle_type,
+        FuelStats.fills,
+        FuelStats.distance_km,
+        FuelStats.liters,
+        FuelStats.km_per_liter,
+        FuelStats.recent_km_per_liter,
+        FuelStats.rated_km_per_liter,
+        FuelStats.cost_per_km,
+        FuelStats.anomalies
+    ).join(Vehicle, Vehicle.plate_number == FuelStats.plate_number).order_by(
+        FuelStats.plate_number).yield_per(EXPORT_CHUNK_SIZE)
+
+def fuel_sheets(params):
+    return [
+        ('Fuel by Category', ['Fuel Type', 'Vehicle Type', 'Vehicles', 'Fills', 'Distance km', 'Liters',
+                              'Km/Ltr', 'Cost per km', 'Anomalies'],
+         ((r['fuel_type'], r['vehicle_type'], r['vehicles'], r['fills'], r['distance_km'], round(r['liters'], 1),
+           r['km_per_liter'] and round(r['km_per_liter'], 2), r['cost_per_km'] and round(r['cost_per_km'], 2),
+           r['anomalies']) for r in fleet_fuel_rows())),
+        ('Fuel by Vehicle', ['Plate Number', 'Make', 'Model', 'Fuel Type', 'Vehicle Type', 'Fills', 'Distance km',
+                             'Liters', 'Km/Ltr', 'Recent Km/Ltr', 'Rated Km/Ltr', 'Cost per km', 'Anomalies'],
+         fuel_vehicle_rows()),
+    ]
+
+@bp.route('/reports/export/fuel')
+@reads_snapshot
+def export_fuel():
+    try:
+        return export_response('fuel', fuel_sheets(request.args))
     except Exception as e:
         flash(f'Error exporting report: {str(e)}', 'danger')
-        return redirect(url_for('generate_report'))        
+        return redirect(url_for('fleet.generate_report'))
+
+# REPORT JOBS
+# The export routes above build the file inside the request. Jobs build the
+# same sheets on a background thread pool instead: POST /reports/jobs
+# returns a job id at once and the client polls it until the file is ready.
+# The id hashes the report, format, parameters and table versions, so
+# identical requests share one build, in flight or finished, until the
+# data changes.
+ExportReport = namedtuple('ExportReport', ['basename', 'sheets', 'tables', 'params', 'sheet_count'])
+
+EXPORT_REPORTS = {
+    'assignment-summary': ExportReport('assignment_summary', assignment_summary_sheets,
+                                       ('vehicle', 'assignment'), (), 2),
+    'unassigned-vehicles': ExportReport('unassigned_vehicles', unassigned_vehicle_sheets,
+                                        ('vehicle', 'assignment'), (), 1),
+    'compliance': ExportReport('compliance', compliance_sheets, ('compliance_status', 'vehicle'), ('status',), 1),
+    'driver-assignments': ExportReport('driver_assignments', driver_assignment_sheets,
+                                       ('driver', 'assignment', 'vehicle'), (), 1),
+    'utilization': ExportReport('utilization', utilization_sheets,
+                                ('utilization_span', 'utilization_day', 'utilization_month', 'vehicle'),
+                                ('start', 'end', 'period', 'assigned_for'), 3),
+    'fuel': ExportReport('fuel', fuel_sheets, ('fuel_fleet_stats', 'fuel_stats', 'vehicle'), (), 2),
+}
+
+report_jobs = None
+
+def init_report_jobs(app):
+    global report_jobs
+    report_jobs = JobQueue(app.config['REPORT_JOB_DIR'], app.config['REPORT_JOB_WORKERS'],
+                           keep_for=app.config['REPORT_JOB_TTL'])
+
+def report_job_json(status):
+    body = dict(status, progress_url=url_for('fleet.report_job_status', job_id=status['id']))
+    if status['status'] == 'done':
+        body['download_url'] = url_for('fleet.download_report_job', job_id=status['id'])
+    return body
+
+def valid_job_id(value):
+    return len(value) == 40 and all(c in '0123456789abcdef' for c in value)
+
+@bp.route('/reports/jobs', methods=['POST'])
+@reads_snapshot
+def submit_report_job():
+    args = request.get_json(silent=True) or request.form
+    report = EXPORT_REPORTS.get(args.get('report'))
+    fmt = args.get('format', 'xlsx')
+    if report is None:
+        return jsonify({'error': f"Unknown report: {args.get('report')}"}), 400
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {fmt}'}), 400
+    if fmt in SINGLE_SHEET_FORMATS and report.sheet_count > 1:
+        return jsonify({'error': f'{fmt} holds one table but this report has {report.sheet_count} sheets; '
+                                 'export it as xlsx or csv'}), 400
+    params = {name: args[name] for name in report.params if args.get(name)}
+
+    versions = table_versions(db.session.connection(), report.tables)
+    # Today's date is part of the id: utilization counts open assignments up to today
+    job = report_job_id(report.basename, fmt, sorted(params.items()), version_key(versions), date.today())
+    filename = f'{report.basename}_{datetime.now().strftime("%Y%m%d")}.{fmt}'
+
+    snapshot = (g.snapshot_engine, g.snapshot_taken_at.timestamp()) if g.get('snapshot_engine') else None
+    app = current_app._get_current_object()
+
+    def build(path, progress):
+        with app.app_context():
+            if snapshot:
+                use_snapshot(*snapshot)
+            write_file(path, fmt, counted(report.sheets(params), progress))
+
+    status = report_jobs.submit(job, fmt, filename, build) or {'id': job, 'status': 'queued', 'rows': 0}
+    return jsonify(report_job_json(status)), 200 if status['status'] == 'done' else 202
+
+@bp.route('/reports/jobs/<job_id>')
+def report_job_status(job_id):
+    status = report_jobs.status(job_id) if valid_job_id(job_id) else None
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(report_job_json(status))
+
+@bp.route('/reports/jobs/<job_id>/download')
+def download_report_job(job_id):
+    status = report_jobs.status(job_id) if valid_job_id(job_id) else None
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if status['status'] != 'done':
+        return jsonify(report_job_json(status)), 409
+    return send_file(report_jobs.artifact_path(job_id, status['fmt']), mimetype=EXPORT_FORMATS[status['fmt']],
+                     as_attachment=True, download_name=status['filename'])
+
+# QUERY BUDGETS
+# Upper bound on SQL statements issued by each list, report and export route.
+# The bound must hold however many rows are in the database; the query-counts
+# command prints what each route issues, and tests/test_query_counts.py
+# compares that across two fleet sizes, so a lazy load inside a loop fails
+# even while it stays under its budget.
+QUERY_BUDGETS = {
+    'index': 5,
+    'manage_vehicles': 2,
+    'manage_drivers': 2,
+    'manage_assignments': 2,
+    'vehicle_typeahead': 1,
+    'driver_typeahead': 1,
+    'edit_assignment': 2,
+    'manage_maintenance': 3,
+    'maintenance_schedule': 2,
+    'manage_compliance': 2,
+    'manage_fuel': 3,
+    'vehicle_report': 4,
+    'driver_report': 3,
+    'search_fleet': 1,
+    'search_typeahead': 1,
+    'assignment_summary_report': 4,
+    'unassigned_vehicles_report': 2,
+    'driver_assignments_report': 2,
+    'compliance_report': 2,
+    'utilization_report': 7,
+    'fuel_report': 3,
+    'export_assignment_summary': 3,
+    'export_unassigned_vehicles': 1,
+    'export_driver_assignments': 1,
+    'export_driver_assignments_csv': 1,
+    'export_compliance': 1,
+    'export_utilization': 8,
+    'export_fuel': 2,
+    'api_list': 2,
+    'api_item': 2,
+    'api_changes': 2,
+    # A read per level of the grid (17 cover all of it) plus one per time
+    # the filters reject most of a read and it is repeated with a wider limit
+    'nearest_vehicles': 24,
+}
+
+class QueryCounter:
+    """Counts SQL statements sent through any engine (app or report snapshot) while active."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Connection setup pragmas and transaction control are not part of
+        # the route's work
+        if statement.lstrip().upper().startswith(('PRAGMA', 'BEGIN')):
+            return
+        self.count += 1
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, 'before_cursor_execute', self._on_execute)
+
+def _route_requests():
+    """Yield (name, method, path, form) for a sample request to each measured route."""
+    vehicle = db.session.query(Vehicle.plate_number).first()
+    driver = db.session.query(Driver.name, Driver.id_number).first()
+    assignment = db.session.query(Assignment.id).first()
+    plate = vehicle.plate_number if vehicle else 'NONE'
+
+    yield 'index', 'GET', '/', None
+    yield 'manage_vehicles', 'GET', '/vehicles', None
+    yield 'manage_drivers', 'GET', '/drivers', None
+    yield 'manage_assignments', 'GET', '/assignments', None
+    yield 'vehicle_typeahead', 'GET', '/vehicles/typeahead?q=' + plate[:2], None
+    yield 'driver_typeahead', 'GET', '/drivers/typeahead?q=' + (driver.name[:2] if driver else ''), None
+    if assignment:
+        yield 'edit_assignment', 'GET', f'/assignments/{assignment.id}', None
+    if vehicle:
+        yield 'manage_maintenance', 'GET', f'/maintenance/{plate}', None
+        yield 'manage_compliance', 'GET', f'/compliance/{plate}', None
+        yield 'manage_fuel', 'GET', f'/fuel/{plate}', None
+    yield 'maintenance_schedule', 'GET', '/maintenance/schedule', None
+    yield 'vehicle_report', 'POST', '/report', {
+        'report_type': 'basic', 'search_type': 'plate', 'identifier': plate}
+    if driver:
+        yield 'driver_report', 'POST', '/report', {
+            'report_type': 'basic', 'search_type': 'driver_id', 'identifier': driver.id_number or ''}
+    yield 'search_fleet', 'GET', '/search?q=' + plate[:2], None
+    yield 'search_typeahead', 'GET', '/search/typeahead?q=' + (driver.name[:3] if driver else ''), None
+    yield 'assignment_summary_report', 'GET', '/reports/assignment-summary', None
+    yield 'unassigned_vehicles_report', 'GET', '/reports/unassigned-vehicles', None
+    yield 'driver_assignments_report', 'GET', '/reports/driver-assignments', None
+    yield 'compliance_report', 'GET', '/reports/compliance', None
+    yield 'utilization_report', 'GET', '/reports/utilization', None
+    yield 'fuel_report', 'GET', '/reports/fuel', None
+    yield 'export_assignment_summary', 'GET', '/reports/export/assignment-summary', None
+    yield 'export_unassigned_vehicles', 'GET', '/reports/export/unassigned-vehicles', None
+    yield 'export_driver_assignments', 'GET', '/reports/export/driver-assignments', None
+    yield 'export_driver_assignments_csv', 'GET', '/reports/export/driver-assignments?format=csv', None
+    yield 'export_compliance', 'GET', '/reports/export/compliance', None
+    yield 'export_utilization', 'GET', '/reports/export/utilization?format=csv', None
+    yield 'export_fuel', 'GET', '/reports/export/fuel?format=csv', None
+    yield 'api_list', 'GET', '/api/v1/assignments?fields=id,plate_number,start_date&limit=100', None
+    yield 'api_item', 'GET', f'/api/v1/vehicles/{plate}', None
+    floor = db.session.execute(text('SELECT seq FROM change_log_floor')).scalar()
+    yield 'api_changes', 'GET', f'/api/v1/changes?since={floor}&limit=100', None
+    yield 'nearest_vehicles', 'GET', '/api/v1/vehicles/nearest?lat=9.03&lon=38.74&k=10&vehicle_type=Pickup', None
+
+def route_query_counts():
+    """Request each measured route once; yield (name, SQL statements, HTTP status)."""
+    refresh_due_compliance()
+    compact_change_log_if_due()
+    requests = list(_route_requests())
+    db.session.remove()
+
+    client = current_app.test_client()
+    for name, method, path, form in requests:
+        with QueryCounter() as counter:
+            response = client.open(path, method=method, data=form)
+            response.get_data()
+        yield name, counter.count, response.status_code
+
+@bp.cli.command('check-query-budget')
+def check_query_budget():
+    """Fail if any route issues more SQL statements than QUERY_BUDGETS allows."""
+    failures = 0
+    for name, count, status in route_query_counts():
+        budget = QUERY_BUDGETS[name]
+        ok = status < 400 and count <= budget
+        failures += not ok
+        click.echo(f"{'ok  ' if ok else 'FAIL'} {name:<30} {count:>4} / {budget:<4} HTTP {status}")
+    if failures:
+        raise SystemExit(f'{failures} route(s) over their query budget')
+
+@bp.cli.command('query-counts')
+def query_counts_command():
+    """Print each route's SQL statement count, budget and HTTP status as JSON."""
+    click.echo(json.dumps({name: {'statements': count, 'budget': QUERY_BUDGETS[name], 'status': status}
+                           for name, count, status in route_query_counts()}, indent=2))
+
+# QUERY PLANS
+# Tables each route may read in full because the page lists every row of
+# them. Any other "SCAN <table>" without an index in EXPLAIN QUERY PLAN fails
+# the check.
+FULL_SCAN_ALLOWED = {
+    'unassigned_vehicles_report': {'vehicle'},
+    'export_unassigned_vehicles': {'vehicle'},
+    'driver_assignments_report': {'driver'},
+    'export_driver_assignments': {'driver'},
+    'export_driver_assignments_csv': {'driver'},
+    # Pages walk the table in rowid order and stop at LIMIT
+    'api_list': {'assignment'},
+    # Per-vehicle utilization lists every vehicle
+    'utilization_report': {'vehicle'},
+    'export_utilization': {'vehicle'},
+    # The per-vehicle sheet lists every vehicle with fill-ups
+    'export_fuel': {'fuel_stats'},
+    # The nearest points of a read, already cut down to its LIMIT
+    'nearest_vehicles': {'ranked'},
+}
+
+def full_scans(plan):
+    """Return tables read by a full scan in EXPLAIN QUERY PLAN output rows.
+
+    Virtual tables (FTS5, json_each) pick their own access path and subquery
+    scans read already-filtered rows, so neither counts.
+    """
+    scanned = set()
+    for row in plan:
+        detail = row[-1]
+        if not detail.startswith('SCAN ') or ' USING ' in detail or 'VIRTUAL TABLE' in detail:
+            continue
+        table = detail.split()[1]
+        if not table.startswith('('):
+            scanned.add(table)
+    return scanned
+
+@bp.cli.command('check-query-plans')
+@click.option('--verbose', is_flag=True, help='Print the plan of every statement.')
+def check_query_plans(verbose):
+    """Fail if a report, export or dashboard query falls back to a full table scan."""
+    refresh_due_compliance()
+    compact_change_log_if_due()
+    requests = list(_route_requests())
+    db.session.remove()
+
+    client = current_app.test_client()
+    failures = 0
+    for name, method, path, form in requests:
+        with QueryCounter() as counter:
+            client.open(path, method=method, data=form).get_data()
+        allowed = FULL_SCAN_ALLOWED.get(name, set())
+        with db.engine.connect() as conn:
+            for statement, parameters in counter.statements:
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                unexpected = full_scans(plan) - allowed
+                if unexpected or verbose:
+                    click.echo(f"{'FAIL' if unexpected else 'ok  '} {name}: {' '.join(statement.split())[:120]}")
+                    for row in plan:
+                        click.echo(f'       {row[-1]}')
+                failures += bool(unexpected)
+    if failures:
+        raise SystemExit(f'{failures} statement(s) scan a table without an index')
+    click.echo('No unexpected full table scans')
+
+# BENCHMARKS
+SEED_MODELS = {'vehicle': Vehicle, 'driver': Driver, 'compliance': Compliance,
+               'maintenance': Maintenance, 'assignment': Assignment, 'fuel_log': FuelLog}
+SEED_CHUNK_SIZE = 10000
+
+@bp.cli.command('seed')
+@click.option('--vehicles', 'vehicle_count', default=1000, help='Fleet size, e.g. 1000, 10000 or 100000')
+@click.option('--drivers', 'driver_count', type=int, help='Defaults to one driver per vehicle')
+@click.option('--assignments-per-vehicle', default=10)
+@click.option('--maintenance-per-vehicle', default=10)
+@click.option('--fuel-per-vehicle', default=20)
+@click.option('--seed', 'random_seed', default=0, help='Same seed, same fleet')
+@click.option('--reset', is_flag=True, help='Delete all fleet data first')
+def seed_command(vehicle_count, driver_count, assignments_per_vehicle, maintenance_per_vehicle, fuel_per_vehicle,
+                 random_seed, reset):
+    """Fill the database with a synthetic fleet for load testing.
+
+    Point DATABASE_URL at a scratch database; --reset wipes every fleet table.
+    """
+    engine = write_engine(db.engine)
+    if reset:
+        with engine.begin() as conn:
+            for model in (GeofenceViolation, GeofenceState, Geofence, VehicleLocation, VehiclePosition,
+                          GpsReading, MaintenanceSchedule, ComplianceStatus, Odometer, UtilizationSpan,
+                          UtilizationDay, UtilizationMonth, FuelFleetStats, FuelStats, FuelLog, Assignment,
+                          Maintenance, Compliance, Driver, Vehicle):
+                conn.execute(db.delete(model))
+            reset_change_log(conn)
+    elif any(db.session.query(model).first() is not None for model in SEED_MODELS.values()):
+        raise SystemExit('The database already holds fleet data; pass --reset to replace it')
+    db.session.remove()
+
+    options = {
+        'vehicle_type': VEHICLE_TYPES,
+        'fuel_type': FUEL_TYPES,
+        'assigned_for': ASSIGNMENT_TYPES,
+        'insurance_type': INSURANCE_TYPES,
+        'yearly_inspection': YES_NO,
+        'safety_audit': SAFETY_TYPES,
+        'maintenance_center': MAINTENANCE_CENTERS,
+    }
+    tables = fleet(vehicle_count, driver_count or vehicle_count, assignments_per_vehicle,
+                   maintenance_per_vehicle, options, seed=random_seed, fuel_per_vehicle=fuel_per_vehicle)
+    for table, rows in tables:
+        started = time.perf_counter()
+        written = 0
+        for chunk in chunked(rows, SEED_CHUNK_SIZE):
+            with engine.begin() as conn:
+                conn.execute(db.insert(SEED_MODELS[table]), chunk)
+            written += len(chunk)
+        click.echo(f'{table:<12} {written:>10} rows  {time.perf_counter() - started:6.1f}s')
+    with engine.begin() as conn:
+        refresh_maintenance_schedule(conn)
+        refresh_compliance_status(conn)
+        refresh_utilization(conn)
+        refresh_fuel_stats(conn)
+        refresh_vehicle_locations(conn)
+    dashboard_snapshot.invalidate()
+
+@bp.cli.command('benchmark-routes')
+@click.option('--repeat', default=20, help='Timed requests per route')
+@click.option('--baseline', 'baseline_path', default=os.path.join(basedir, 'benchmark_baseline.json'),
+              help='Baseline file to compare against or write')
+@click.option('--save', is_flag=True, help='Store this run as the new baseline')
+def benchmark_routes(repeat, baseline_path, save):
+    """Measure latency, SQL statements and peak memory for every route.
+
+    Each route is requested once to warm up, `repeat` times for latency,
+    once under QueryCounter and once under tracemalloc, so the counters
+    do not skew the timings. Fails on a regression against the baseline.
+    """
+    refresh_due_compliance()
+    compact_change_log_if_due()
+    requests = list(_route_requests())
+    meta = {
+        'vehicles': db.session.query(func.count(Vehicle.plate_number)).scalar(),
+        'assignments': db.session.query(func.count(Assignment.id)).scalar(),
+        'repeat': repeat,
+        'python': platform.python_version(),
+    }
+    db.session.remove()
+
+    client = current_app.test_client()
+    results = {}
+    click.echo(f"{meta['vehicles']} vehicles, {meta['assignments']} assignments, {repeat} runs per route")
+    click.echo(f"{'route':<30} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'peak KiB':>10}")
+    for name, method, path, form in requests:
+        client.open(path, method=method, data=form).get_data()
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.open(path, method=method, data=form)
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        with QueryCounter() as counter:
+            client.open(path, method=method, data=form).get_data()
+
+        tracemalloc.start()
+        try:
+            client.open(path, method=method, data=form).get_data()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = results[name] = summarize(timings, counter.count, peak, response.status_code)
+        click.echo(f"{name:<30} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                   f"{result['queries']:>8} {result['peak_kib']:>10.0f}")
+
+    if save:
+        save_baseline(baseline_path, results, meta)
+        click.echo(f'Baseline written to {baseline_path}')
+        return
+    if not os.path.exists(baseline_path):
+        click.echo('No baseline to compare against; run with --save to store one')
+        return
+    baseline = load_baseline(baseline_path)
+    if baseline.get('meta', {}).get('vehicles') != meta['vehicles']:
+        click.echo(f"Warning: baseline was taken with {baseline.get('meta', {}).get('vehicles')} vehicles")
+    found = list(regressions(results, baseline))
+    for route, metric, before, after in found:
+        click.echo(f'REGRESSION {route}: {metric} {before} -> {after}')
+    if found:
+        raise SystemExit(f'{len(found)} regression(s) against {baseline_path}')
+    click.echo('No regressions against the baseline')
+
+# A fresh interpreter timing what a new gunicorn worker does before it can
+# answer: import this module, create the app and serve one request
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app as fleet
+imported = time.perf_counter()
+heavy = [name for name in ('numpy', 'pandas') if name in sys.modules]
+application = fleet.create_app()
+created = time.perf_counter()
+with application.app_context(), fleet.QueryCounter() as counter:
+    response = application.test_client().get(sys.argv[1])
+    response.get_data()
+done = time.perf_counter()
+json.dump({'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000,
+           'first_request_ms': (done - created) * 1000, 'queries': counter.count,
+           'status': response.status_code, 'heavy_imports': heavy}, sys.stdout)
+"""
+STARTUP_PHASES = ('import', 'create_app', 'first_request')
+
+@bp.cli.command('benchmark-startup')
+@click.option('--repeat', default=5, help='Fresh interpreters to start')
+@click.option('--path', default='/', help='First request each interpreter serves')
+@click.option('--baseline', 'baseline_path', default=os.path.join(basedir, 'startup_baseline.json'),
+              help='Baseline file to compare against or write')
+@click.option('--save', is_flag=True, help='Store this run as the new baseline')
+def benchmark_startup(repeat, path, baseline_path, save):
+    """Measure worker cold start: module import, create_app() and the first request.
+
+    Every run starts a new interpreter, so nothing is warm. Fails when NumPy
+    or pandas are imported at startup, or on a regression against the
+    baseline. Also times the db.create_all() schema check that used to run
+    before every request.
+    """
+    runs = []
+    for _ in range(repeat):
+        probe = subprocess.run([sys.executable, '-c', STARTUP_PROBE, path], cwd=basedir,
+                               capture_output=True, text=True)
+        if probe.returncode:
+            raise SystemExit(f'Startup probe failed:\n{probe.stderr}')
+        runs.append(json.loads(probe.stdout))
+
+    results = {}
+    click.echo(f"{repeat} cold starts, first request GET {path}")
+    click.echo(f"{'phase':<30} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'queries':>8}")
+    for phase in STARTUP_PHASES:
+        queries = runs[-1]['queries'] if phase == 'first_request' else 0
+        status = runs[-1]['status'] if phase == 'first_request' else 200
+        result = results[f'startup_{phase}'] = summarize([r[f'{phase}_ms'] for r in runs], queries, 0, status)
+        click.echo(f"{phase:<30} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['max_ms']:>8.1f} "
+                   f"{result['queries']:>8}")
+
+    statements = []
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+    timings = []
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        for _ in range(repeat * 10):
+            started = time.perf_counter()
+            db.create_all()
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    click.echo(f'Removed per-request db.create_all(): {percentile(timings, 50):.2f} ms p50, '
+               f'{len(statements) // len(timings)} statements')
+
+    heavy = sorted({name for r in runs for name in r['heavy_imports']})
+    if heavy:
+        raise SystemExit(f"Imported at startup: {', '.join(heavy)}")
+    meta = {'repeat': repeat, 'path': path, 'python': platform.python_version()}
+    if save:
+        save_baseline(baseline_path, results, meta)
+        click.echo(f'Baseline written to {baseline_path}')
+        return
+    if not os.path.exists(baseline_path):
+        click.echo('No baseline to compare against; run with --save to store one')
+        return
+    baseline = load_baseline(baseline_path)
+    if baseline.get('meta', {}).get('path') != path:
+        click.echo(f"Warning: baseline first request was GET {baseline.get('meta', {}).get('path')}")
+    found = list(regressions(results, baseline))
+    for phase, metric, before, after in found:
+        click.echo(f'REGRESSION {phase}: {metric} {before} -> {after}')
+    if found:
+        raise SystemExit(f'{len(found)} regression(s) against {baseline_path}')
+    click.echo('No regressions against the baseline')
+
+# APP FACTORY
+# Importing this module defines the models, routes and commands but opens
+# nothing. create_app() builds a configured app around them: gunicorn calls
+# it in each worker ("app:create_app()") and the flask CLI finds it by name.
+# The report cache, job queue and snapshot depend on the app's settings, so
+# they are set up here as well, for the one app a process serves.
+def create_app(config=None):
+    """Create the app; `config` overrides the settings read from the environment."""
+    app = Flask(__name__)
+    load_config(app)
+    if config:
+        app.config.from_mapping(config)
+    db.init_app(app)
+    app.register_blueprint(bp)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', configure_sqlite)
+            event.listen(db.engine, 'begin', begin_sqlite)
+        instrument(db.engine)
+        bootstrap_schema(app)
+        init_report_cache(app)
+        init_report_jobs(app)
+        init_report_snapshot(app)
+    return app
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=1000, debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    create_app().run(host='0.0.0.0', port=1000, debug=os.environ.get('FLASK_DEBUG', '1') == '1')
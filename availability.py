@@ -0,0 +1,96 @@
+"""Sorted-interval index over assignment date ranges.
+
+Intervals are held in NumPy arrays sorted by start day and cut into fixed
+blocks, each remembering the latest end day inside it. An overlap query
+takes the prefix of intervals starting on or before the query end with a
+binary search, skips every block of that prefix that ended before the query
+start, and only compares the intervals of the remaining blocks. Assignments
+mostly end before later ones start, so old history falls into skipped
+blocks and a query touches little beyond the intervals it returns.
+
+Days are integers (days since 1970-01-01); an open end (a NULL end_date)
+is stored as OPEN_END and a missing start as 0.
+"""
+from lazy import lazy_module
+
+np = lazy_module('numpy')
+
+OPEN_END = 10 ** 7 - 1
+BLOCK_SIZE = 64
+
+
+def to_days(values, missing):
+    """ISO date strings, dates or None to int64 day numbers."""
+    days = np.array([np.datetime64(v, 'D') if v is not None else np.datetime64('NaT') for v in values],
+                    dtype='datetime64[D]')
+    result = days.astype(np.int64)
+    result[np.isnat(days)] = missing
+    return result
+
+
+class IntervalIndex:
+    """Overlap queries over ``[start, end]`` day ranges, both ends inclusive.
+
+    `owners` maps each label (e.g. 'vehicle', 'driver') to an array giving
+    the owner of every interval, so one index answers availability for each.
+    """
+
+    def __init__(self, ids, starts, ends, owners, block_size=BLOCK_SIZE):
+        order = np.argsort(starts, kind='stable')
+        self.ids = np.asarray(ids)[order]
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.ends = np.asarray(ends, dtype=np.int64)[order]
+        self.owners = {label: np.asarray(values, dtype=object)[order] for label, values in owners.items()}
+        self.block_size = block_size
+        padded = -(-len(self.ends) // block_size) * block_size
+        ends = np.full(padded, -1, dtype=np.int64)
+        ends[:len(self.ends)] = self.ends
+        self.block_max_end = ends.reshape(-1, block_size).max(axis=1) if padded else ends
+
+    def __len__(self):
+        return len(self.ids)
+
+    def overlapping(self, start, end):
+        """Positions of the intervals that share at least one day with [start, end]."""
+        prefix = int(np.searchsorted(self.starts, end, side='right'))
+        blocks = np.flatnonzero(self.block_max_end[:-(-prefix // self.block_size)] >= start)
+        if not len(blocks):
+            return np.empty(0, dtype=np.int64)
+        positions = (blocks[:, None] * self.block_size + np.arange(self.block_size)).ravel()
+        positions = positions[positions < prefix]
+        return positions[self.ends[positions] >= start]
+
+    def busy(self, label, start, end):
+        """Set of owners under `label` with an interval overlapping [start, end]."""
+        owners = self.owners[label][self.overlapping(start, end)]
+        return {owner for owner in owners if owner is not None}
+
+
+def find_overlaps(ids, owners, starts, ends):
+    """Yield ``(owner, earlier id, later id)`` for intervals of one owner that overlap.
+
+    Intervals are ordered by (owner, start); one overlaps an earlier interval
+    of its owner when it starts on or before the latest end seen so far for
+    that owner. The running maximum is taken over one array for all owners
+    by offsetting each owner's ends past the previous owner's.
+    """
+    owners = np.asarray(owners, dtype=object)
+    known = np.array([owner is not None for owner in owners], dtype=bool)
+    ids, owners = np.asarray(ids)[known], owners[known]
+    starts, ends = np.asarray(starts, dtype=np.int64)[known], np.asarray(ends, dtype=np.int64)[known]
+    if not len(ids):
+        return
+    labels, rank = np.unique(owners.astype(str), return_inverse=True)
+    order = np.lexsort((starts, rank))
+    ids, rank, starts, ends = ids[order], rank[order], starts[order], ends[order]
+    owners = owners[order]
+
+    span = OPEN_END + 1
+    keyed = rank.astype(np.int64) * span + ends
+    running = np.maximum.accumulate(keyed)
+    # Position of the interval holding the running maximum at each point
+    holder = np.maximum.accumulate(np.where(keyed == running, np.arange(len(keyed)), 0))
+    previous = np.concatenate(([-1], running[:-1]))
+    clash = (previous >= rank * span + starts) & (np.concatenate(([-1], rank[:-1])) == rank)
+    for i in np.flatnonzero(clash):
+        yield owners[i], ids[holder[i - 1]], ids[i]
@@ -0,0 +1,60 @@
+"""Summaries and baseline comparison for the route benchmark suite.
+
+A run is a dict mapping route name to its measurements: latency
+percentiles in milliseconds, the SQL statement count and peak traced
+memory in KiB. Baselines are stored as JSON in the same shape.
+"""
+import json
+import math
+
+# A route regresses when a metric grows by more than its ratio and, for
+# latency and memory, by more than a small absolute floor that keeps
+# sub-millisecond noise from failing the run
+TOLERANCES = {
+    'p95_ms': (1.25, 2.0),
+    'queries': (1.0, 0),
+    'peak_kib': (1.25, 256),
+}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(timings_ms, queries, peak_bytes, status):
+    return {
+        'p50_ms': round(percentile(timings_ms, 50), 2),
+        'p95_ms': round(percentile(timings_ms, 95), 2),
+        'p99_ms': round(percentile(timings_ms, 99), 2),
+        'max_ms': round(max(timings_ms), 2),
+        'queries': queries,
+        'peak_kib': round(peak_bytes / 1024, 1),
+        'status': status,
+    }
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, meta):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'routes': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def regressions(results, baseline):
+    """Yield ``(route, metric, baseline value, current value)`` for each regression."""
+    for route, current in results.items():
+        before = baseline.get('routes', {}).get(route)
+        if before is None:
+            continue
+        for metric, (ratio, floor) in TOLERANCES.items():
+            if metric not in before:
+                continue
+            if current[metric] > before[metric] * ratio and current[metric] - before[metric] > floor:
+                yield route, metric, before[metric], current[metric]
@@ -0,0 +1,102 @@
+"""Streaming readers and field parsers for bulk imports.
+
+Readers return the header row and a generator of ``(row_number, record)``
+pairs, where ``record`` maps the normalized header names to raw cell values,
+so an upload is never held in memory as a whole.
+"""
+import csv
+import io
+from datetime import date, datetime
+
+
+def normalize_header(name):
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def open_csv(stream):
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = [normalize_header(h) for h in next(reader, [])]
+
+    def records():
+        for row_number, row in enumerate(reader, start=2):
+            if any(cell.strip() for cell in row):
+                yield row_number, dict(zip(header, row))
+
+    return header, records()
+
+
+def open_xlsx(stream):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = [normalize_header(h) for h in next(rows, ())]
+
+    def records():
+        try:
+            for row_number, row in enumerate(rows, start=2):
+                if any(cell not in (None, '') for cell in row):
+                    yield row_number, dict(zip(header, row))
+        finally:
+            workbook.close()
+
+    return header, records()
+
+
+def open_upload(filename, stream):
+    """Return the normalized header and a lazy record iterator for an upload."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        return open_csv(stream)
+    if extension == 'xlsx':
+        return open_xlsx(stream)
+    raise ValueError('Upload a .csv or .xlsx file')
+
+
+def chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Parsers turn a raw cell into a column value and raise ValueError when
+# the cell cannot be converted. Empty cells become None.
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_text(value):
+    return None if _blank(value) else str(value).strip()
+
+
+def parse_upper(value):
+    return None if _blank(value) else str(value).strip().upper()
+
+
+def parse_float(value):
+    return None if _blank(value) else float(value)
+
+
+def parse_int(value):
+    if _blank(value):
+        return None
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f'{value!r} is not a whole number')
+    return int(number)
+
+
+def parse_date(value):
+    if _blank(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
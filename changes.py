@@ -0,0 +1,137 @@
+"""Change log of the core tables, written by SQLite triggers.
+
+Every insert, update and delete on a captured table appends an entry to
+``change_log`` holding the table, the row's key and, except for deletes,
+the full new row as JSON. Triggers see ORM flushes, bulk imports and raw
+SQL alike. ``seq`` is an AUTOINCREMENT key, so it only ever grows, even
+after compaction. SQLite has one writer at a time, so a reader that has
+seen entry N has seen everything committed before it.
+
+Compaction keeps the log bounded. Entries older than the retention window
+are dropped once a later entry for the same row exists, and deletes
+(tombstones) are dropped after a longer window. Every entry holds a whole
+row, so the latest entry per key still rebuilds each table. A consumer
+whose cursor is below the newest dropped tombstone could miss a delete,
+so its cursor is refused and it has to resync.
+"""
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_ENTRY = 'INSERT INTO change_log (table_name, op, row_key, data, changed_at) '
+
+
+class CursorExpired(Exception):
+    """The cursor predates entries removed by compaction."""
+
+    def __init__(self, floor):
+        super().__init__(f'Cursor is older than {floor}, the oldest position the change log can resume from')
+        self.floor = floor
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _trigger_statements(table, key, columns):
+    """Yield (name, CREATE TRIGGER statement) for the three triggers of `table`."""
+    key = _quote(key)
+    image = 'json_object(' + ', '.join(f"'{c}', NEW.{_quote(c)}" for c in columns) + ')'
+    changed = ' OR '.join(f'OLD.{_quote(c)} IS NOT NEW.{_quote(c)}' for c in columns)
+    yield f'{table}_change_ai', (
+        f'CREATE TRIGGER {table}_change_ai AFTER INSERT ON {table} BEGIN '
+        f"{_ENTRY}VALUES ('{table}', 'insert', NEW.{key}, {image}, {_NOW}); END")
+    # Updates that write the same values are not changes; a new key reads as the old row going away
+    yield f'{table}_change_au', (
+        f'CREATE TRIGGER {table}_change_au AFTER UPDATE ON {table} WHEN {changed} BEGIN '
+        f"{_ENTRY}SELECT '{table}', 'delete', OLD.{key}, NULL, {_NOW} WHERE OLD.{key} IS NOT NEW.{key}; "
+        f"{_ENTRY}VALUES ('{table}', 'update', NEW.{key}, {image}, {_NOW}); END")
+    yield f'{table}_change_ad', (
+        f'CREATE TRIGGER {table}_change_ad AFTER DELETE ON {table} BEGIN '
+        f"{_ENTRY}VALUES ('{table}', 'delete', OLD.{key}, NULL, {_NOW}); END")
+
+
+def ensure_change_log(conn, tables):
+    """Create the log and (re)create the triggers of `tables`, ``{table: (key, columns)}``.
+
+    Triggers are replaced only when their SQL differs, e.g. after a column
+    was added to a model.
+    """
+    # row_key has no declared type so integer keys stay integers
+    conn.exec_driver_sql(
+        'CREATE TABLE IF NOT EXISTS change_log ('
+        'seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name VARCHAR(50) NOT NULL, op VARCHAR(6) NOT NULL, '
+        'row_key NOT NULL, data TEXT, changed_at VARCHAR(26) NOT NULL)')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_change_log_table_name_row_key_seq '
+                         'ON change_log (table_name, row_key, seq)')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_change_log_changed_at ON change_log (changed_at)')
+    conn.exec_driver_sql(
+        'CREATE TABLE IF NOT EXISTS change_log_floor ('
+        'id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL, compacted_at VARCHAR(26))')
+    conn.exec_driver_sql('INSERT OR IGNORE INTO change_log_floor (id, seq) VALUES (1, 0)')
+
+    existing = dict(conn.exec_driver_sql("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").all())
+    for table, (key, columns) in tables.items():
+        for name, statement in _trigger_statements(table, key, columns):
+            if existing.get(name) != statement:
+                conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+                conn.exec_driver_sql(statement)
+
+
+def latest_seq(conn):
+    """Highest seq ever written, even when compaction has since removed that entry."""
+    return conn.exec_driver_sql(
+        "SELECT coalesce((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)").scalar()
+
+
+def changes_since(conn, since, limit, tables=None):
+    """Entries after `since` in seq order, at most `limit`, optionally only of `tables`.
+
+    Raises CursorExpired when compaction may have removed entries the
+    caller has not seen.
+    """
+    floor = conn.exec_driver_sql('SELECT seq FROM change_log_floor WHERE id = 1').scalar() or 0
+    if since < floor:
+        raise CursorExpired(floor)
+    sql = 'SELECT seq, table_name, op, row_key, data, changed_at FROM change_log WHERE seq > ?'
+    params = [since]
+    if tables:
+        sql += f' AND table_name IN ({", ".join("?" for _ in tables)})'
+        params.extend(tables)
+    return conn.exec_driver_sql(sql + ' ORDER BY seq LIMIT ?', (*params, limit)).all()
+
+
+def _first_seq_since(conn, days):
+    """Lowest seq written in the last `days` days, or one past the end when none was."""
+    seq = conn.exec_driver_sql(
+        f"SELECT min(seq) FROM change_log WHERE changed_at >= strftime('%Y-%m-%d %H:%M:%f', 'now', ?)",
+        (f'-{days} days',)).scalar()
+    return seq if seq is not None else latest_seq(conn) + 1
+
+
+def compact(conn, retain_days, tombstone_days):
+    """Drop superseded entries older than `retain_days` and deletes older than `tombstone_days`.
+
+    Returns ``(superseded, tombstones)`` counts. The tombstone window is at
+    least the retention window, so a dropped delete never leaves older
+    entries of its row behind.
+    """
+    horizon = _first_seq_since(conn, retain_days)
+    superseded = conn.exec_driver_sql(
+        'DELETE FROM change_log WHERE seq < ? AND EXISTS (SELECT 1 FROM change_log AS later '
+        'WHERE later.table_name = change_log.table_name AND later.row_key = change_log.row_key '
+        'AND later.seq > change_log.seq)', (horizon,)).rowcount
+
+    horizon = _first_seq_since(conn, max(tombstone_days, retain_days))
+    newest = conn.exec_driver_sql(
+        "SELECT max(seq) FROM change_log WHERE seq < ? AND op = 'delete'", (horizon,)).scalar()
+    tombstones = 0
+    if newest is not None:
+        tombstones = conn.exec_driver_sql(
+            "DELETE FROM change_log WHERE seq <= ? AND op = 'delete'", (newest,)).rowcount
+        conn.exec_driver_sql('UPDATE change_log_floor SET seq = max(seq, ?) WHERE id = 1', (newest,))
+    conn.exec_driver_sql(f'UPDATE change_log_floor SET compacted_at = {_NOW} WHERE id = 1')
+    return superseded, tombstones
+
+
+def reset(conn):
+    """Empty the log after the captured tables were wiped; every consumer has to resync."""
+    conn.exec_driver_sql('UPDATE change_log_floor SET seq = max(seq, ?) WHERE id = 1', (latest_seq(conn),))
+    conn.exec_driver_sql('DELETE FROM change_log')
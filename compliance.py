@@ -0,0 +1,85 @@
+"""Vectorized compliance rules.
+
+`evaluate` checks a whole batch of compliance rows at once with NumPy date
+arithmetic and returns, per vehicle, every active issue, the overall status
+and the next day on which that status could change without the row being
+edited, so callers only need to re-check rows whose day has come.
+"""
+from collections import namedtuple
+
+from lazy import lazy_module
+
+np = lazy_module('numpy')
+
+WARN_DAYS = 30
+SEVERITY = {'ok': 0, 'warning': 1, 'violation': 2}
+
+Evaluation = namedtuple('Evaluation', ['status', 'issues', 'insurance_expires', 'inspection_expires', 'next_check'])
+
+
+def _dates(values):
+    return np.array([np.datetime64(v, 'D') if v is not None else np.datetime64('NaT') for v in values],
+                    dtype='datetime64[D]')
+
+
+def add_year(days):
+    """Same calendar day a year later (29 February rolls over to 1 March)."""
+    months = days.astype('datetime64[M]')
+    return (months + 12).astype('datetime64[D]') + (days - months.astype('datetime64[D]'))
+
+
+def _expiry_rule(issues, expires, today, warn_until, label, required=True):
+    """Flag missing, expired and soon-to-expire dates; return the next boundary per row."""
+    missing = np.isnat(expires)
+    expired = ~missing & (expires < today)
+    expiring = ~missing & ~expired & (expires <= warn_until)
+    issues.append((missing & required, 'violation', f'{label} Date Missing', None))
+    issues.append((expired, 'violation', f'{label} Expired', expires))
+    issues.append((expiring, 'warning', f'{label} Expiring', expires))
+    # The row changes status when the warning window opens or the date passes
+    warn_from = expires - np.timedelta64(WARN_DAYS, 'D')
+    boundary = np.where(warn_from > today, warn_from, expires + np.timedelta64(1, 'D'))
+    return np.where(missing | expired, np.datetime64('NaT'), boundary)
+
+
+def evaluate(insurance_dates, yearly_inspection, inspection_dates, safety_audit, today):
+    """Evaluate aligned columns of compliance rows as of `today`."""
+    today = np.datetime64(today, 'D')
+    warn_until = today + np.timedelta64(WARN_DAYS, 'D')
+    yearly_inspection = np.array(yearly_inspection, dtype=object)
+    safety_audit = np.array(safety_audit, dtype=object)
+
+    insurance_expires = add_year(_dates(insurance_dates))
+    inspection_expires = add_year(_dates(inspection_dates))
+
+    issues = []
+    insurance_next = _expiry_rule(issues, insurance_expires, today, warn_until, 'Insurance')
+    # A vehicle without a yearly inspection is flagged once, not also for its missing date
+    no_inspection = yearly_inspection == 'No'
+    inspection_next = _expiry_rule(issues, inspection_expires, today, warn_until, 'Inspection', ~no_inspection)
+    issues.append((no_inspection, 'violation', 'Inspection Missing', None))
+    issues.append((safety_audit == 'Not Safe', 'violation', 'Safety Audit Failed', None))
+    issues.append((safety_audit == 'Fair', 'warning', 'Safety Audit Fair', None))
+
+    severity = np.zeros(len(insurance_expires), dtype=np.int8)
+    for mask, level, _, _ in issues:
+        severity = np.where(mask, np.maximum(severity, SEVERITY[level]), severity)
+    names = {value: key for key, value in SEVERITY.items()}
+    status = [names[int(s)] for s in severity]
+
+    # Only rows with at least one issue need a Python-level issue list
+    per_row = [[] for _ in range(len(status))]
+    for mask, level, label, expires in issues:
+        for i in np.flatnonzero(mask):
+            entry = {'issue': label, 'severity': level}
+            if expires is not None:
+                entry['expires'] = str(expires[i])
+            per_row[i].append(entry)
+
+    next_check = np.fmin(insurance_next, inspection_next)
+    return Evaluation(status, per_row, insurance_expires, inspection_expires, next_check)
+
+
+def to_date(value):
+    """numpy datetime64 to datetime.date, NaT to None."""
+    return None if np.isnat(value) else value.astype(object)
@@ -0,0 +1,186 @@
+"""Streaming writers for report exports.
+
+A report is a list of sheets, each a ``(name, columns, rows)`` tuple where
+``rows`` is any iterable of tuples. Rows are consumed one at a time so the
+writers never hold more than one chunk of a sheet in memory.
+"""
+import csv
+import os
+import tempfile
+from datetime import date, datetime
+from io import StringIO
+
+EXPORT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# Formats that hold a single table, so only reports with one sheet export to them
+SINGLE_SHEET_FORMATS = ('parquet',)
+
+CHUNK_SIZE = 1000
+READ_SIZE = 64 * 1024
+
+
+def _cell(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(sheets, chunk_size=CHUNK_SIZE):
+    """Yield CSV text for each sheet, separated by a blank line."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for index, (name, columns, rows) in enumerate(sheets):
+        if index:
+            writer.writerow([])
+        writer.writerow(columns)
+        for chunk in _chunks(rows, chunk_size):
+            writer.writerows([_cell(v) for v in row] for row in chunk)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(path, sheets):
+    """Write all sheets to an XLSX file using xlsxwriter's constant-memory mode."""
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        for name, columns, rows in sheets:
+            worksheet = workbook.add_worksheet(name[:31])
+            worksheet.write_row(0, 0, columns)
+            for row_number, row in enumerate(rows, start=1):
+                worksheet.write_row(row_number, 0, [_cell(v) for v in row])
+    finally:
+        workbook.close()
+
+
+def write_parquet(path, sheets, chunk_size=CHUNK_SIZE):
+    """Write a one-sheet report to a Parquet file, one row group per chunk.
+
+    Parquet holds a single table; a report with more sheets is a ValueError
+    rather than an export missing all but the first.
+    """
+    if len(sheets) != 1:
+        raise ValueError(f'Parquet holds one table but the report has {len(sheets)} sheets')
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet export requires the pyarrow package')
+
+    name, columns, rows = sheets[0]
+    chunks = _chunks(rows, chunk_size)
+    first = next(chunks, [])
+    samples = list(zip(*first)) if first else [()] * len(columns)
+    schema = pa.schema([(column, _arrow_type(pa, values))
+                        for column, values in zip(columns, samples)])
+    with pq.ParquetWriter(path, schema) as writer:
+        if first:
+            writer.write_table(_arrow_table(pa, schema, first))
+        for chunk in chunks:
+            writer.write_table(_arrow_table(pa, schema, chunk))
+
+
+def _arrow_type(pa, values):
+    """Pick a column type from the first non-null value in the first chunk."""
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            return pa.bool_()
+        if isinstance(value, int):
+            return pa.int64()
+        if isinstance(value, float):
+            return pa.float64()
+        if isinstance(value, (date, datetime)):
+            return pa.date32()
+        break
+    return pa.string()
+
+
+def _arrow_table(pa, schema, chunk):
+    arrays = []
+    for field, values in zip(schema, zip(*chunk)):
+        if pa.types.is_string(field.type):
+            values = [None if v is None else str(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_csv(path, sheets):
+    with open(path, 'wb') as f:
+        for data in iter_csv(sheets):
+            f.write(data)
+
+
+def write_file(path, fmt, sheets):
+    """Write an export in any of EXPORT_FORMATS to `path`."""
+    writers = {'xlsx': write_xlsx, 'csv': write_csv, 'parquet': write_parquet}
+    writers[fmt](path, sheets)
+
+
+def build_file(fmt, sheets):
+    """Build an XLSX or Parquet export in a temporary file and return its path."""
+    fd, path = tempfile.mkstemp(suffix='.' + fmt)
+    os.close(fd)
+    try:
+        write_file(path, fmt, sheets)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def counted(sheets, progress, every=CHUNK_SIZE):
+    """Wrap each sheet's rows so ``progress(total rows so far)`` is called as they are read."""
+    total = 0
+
+    def rows(sheet_rows):
+        nonlocal total
+        for row in sheet_rows:
+            yield row
+            total += 1
+            if total % every == 0:
+                progress(total)
+        progress(total)
+
+    return [(name, columns, rows(sheet_rows)) for name, columns, sheet_rows in sheets]
+
+
+def iter_file(path, read_size=READ_SIZE):
+    """Yield a file in fixed-size pieces.
+
+    The caller removes the file (see `discard`) once the response is
+    closed, which also happens when the client goes away before the first
+    piece is read and this generator never starts.
+    """
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(read_size)
+            if not data:
+                break
+            yield data
+
+
+def discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
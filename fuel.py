@@ -0,0 +1,98 @@
+"""Fuel economy from fill-up records.
+
+Economy uses the full-tank method: the liters of each fill are what the
+vehicle burned since the previous fill, so a fill's interval is the
+distance from the previous odometer reading and its km/l is that distance
+over its liters. A vehicle's first fill only sets the starting odometer.
+
+Totals are kept as sums (distance, liters, cost) so new fills can be added
+to them without rereading a vehicle's history; `add_intervals` and
+`totals` work on pandas frames holding many vehicles at once.
+"""
+import json
+
+from lazy import lazy_module
+
+np = lazy_module('numpy')
+pd = lazy_module('pandas')
+
+# An interval is an anomaly when its km/l is below LOW or above HIGH times
+# the rated figure: a leak, theft or wrong entry, or a missed fill-up
+ANOMALY_LOW = 0.75
+ANOMALY_HIGH = 1.5
+RECENT_INTERVALS = 5
+
+FILL_COLUMNS = ['plate_number', 'filled_on', 'odometer_km', 'liters', 'cost']
+TOTAL_COLUMNS = ('fills', 'distance_km', 'liters', 'cost', 'costed_km', 'anomalies')
+
+
+def add_intervals(fills, rated, previous_km=None):
+    """Add distance_km, km_per_liter and anomaly columns to `fills`.
+
+    `fills` holds FILL_COLUMNS for any number of vehicles. `rated` maps
+    plate to rated km/l. `previous_km` optionally maps plate to the last
+    odometer already on record, which then starts each vehicle's first
+    interval. Returns the frame sorted by plate and odometer.
+    """
+    fills = fills.sort_values(['plate_number', 'odometer_km', 'filled_on'], kind='stable').reset_index(drop=True)
+    previous = fills.groupby('plate_number')['odometer_km'].shift()
+    if previous_km is not None:
+        previous = previous.fillna(fills['plate_number'].map(previous_km))
+    distance = fills['odometer_km'] - previous
+    valid = distance.notna() & (fills['liters'] > 0)
+    fills['distance_km'] = distance.where(distance.notna())
+    fills['km_per_liter'] = (distance / fills['liters']).where(valid)
+
+    expected = fills['plate_number'].map(rated).astype(float)
+    ratio = fills['km_per_liter'] / expected.where(expected > 0)
+    fills['anomaly'] = np.select([ratio < ANOMALY_LOW, ratio > ANOMALY_HIGH], ['low', 'high'], None)
+    return fills
+
+
+def totals(fills):
+    """Per-plate sums over fills that went through `add_intervals`, plus the recent intervals."""
+    interval = fills['distance_km'].notna()
+    costed = interval & fills['cost'].notna()
+    frame = pd.DataFrame({
+        'plate_number': fills['plate_number'],
+        'fills': 1,
+        'distance_km': fills['distance_km'].where(interval, 0),
+        'liters': fills['liters'].where(interval, 0),
+        'cost': fills['cost'].where(costed, 0),
+        'costed_km': fills['distance_km'].where(costed, 0),
+        'anomalies': fills['anomaly'].notna().astype(int),
+    })
+    result = frame.groupby('plate_number')[list(TOTAL_COLUMNS)].sum()
+    grouped = fills.groupby('plate_number')
+    result['first_km'] = grouped['odometer_km'].min()
+    result['last_km'] = grouped['odometer_km'].max()
+    result['last_filled_on'] = grouped['filled_on'].max()
+
+    recent = fills.loc[interval, ['plate_number', 'distance_km', 'liters']].groupby('plate_number').tail(RECENT_INTERVALS)
+    pairs = {}
+    for plate, distance, liters in zip(recent['plate_number'], recent['distance_km'], recent['liters']):
+        pairs.setdefault(plate, []).append([float(distance), float(liters)])
+    result['recent'] = [pairs.get(plate, []) for plate in result.index]
+    return result
+
+
+def merge_totals(old, new):
+    """Combine a stored totals dict with the totals of fills appended after it."""
+    merged = {column: (old.get(column) or 0) + new[column] for column in TOTAL_COLUMNS}
+    merged['first_km'] = old['first_km']
+    merged['last_km'] = new['last_km']
+    merged['last_filled_on'] = max(old['last_filled_on'], new['last_filled_on'])
+    merged['recent'] = (json.loads(old['recent'] or '[]') + new['recent'])[-RECENT_INTERVALS:]
+    return merged
+
+
+def economy(totals_row):
+    """km/l overall and over the recent intervals, and cost per km; None where undefined."""
+    recent = totals_row.get('recent') or []
+    recent_km = sum(d for d, _ in recent)
+    recent_liters = sum(l for _, l in recent)
+    return {
+        'km_per_liter': totals_row['distance_km'] / totals_row['liters'] if totals_row['liters'] else None,
+        'recent_km_per_liter': recent_km / recent_liters if recent_liters else None,
+        'cost_per_km': totals_row['cost'] / totals_row['costed_km'] if totals_row['costed_km'] else None,
+    }
@@ -0,0 +1,33 @@
+"""Gunicorn settings for production.
+
+Start with ``gunicorn -c gunicorn.conf.py 'app:create_app()'``. Every setting can be
+overridden from the environment, e.g. WEB_CONCURRENCY for the worker count.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+# Requests are mostly SQLite reads, which WAL lets run in parallel across
+# processes, so scale workers with cores and add threads for I/O waits
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Each worker creates its own app, with its own database connections and
+# telemetry writer thread, which must not be inherited across fork. The
+# first worker to start applies any pending schema migrations.
+preload_app = False
+
+# Report exports stream for a while on large fleets
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
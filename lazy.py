@@ -0,0 +1,28 @@
+"""Modules imported on first use rather than at startup.
+
+NumPy and pandas take most of a worker's import time but are only needed
+by the derived-table refreshes, utilization, fuel, geofence and export
+code. ``np = lazy_module('numpy')`` reads like a normal import; the real
+import runs on the first attribute lookup, after which the module's names
+are copied onto the proxy so later lookups cost the same as on the module.
+"""
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, attr):
+        # Only called for names not yet on the proxy, i.e. before the import
+        # and for names the module does not have
+        module = importlib.import_module(self.__name)
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f'<lazy module {self.__name!r}>'
+
+
+def lazy_module(name):
+    return LazyModule(name)
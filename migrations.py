@@ -0,0 +1,40 @@
+"""Versioned schema migrations tracked in SQLite's ``user_version``.
+
+A migration is a numbered step that takes a connection. Each one runs in
+its own write transaction together with the bump of ``user_version``, so
+it is applied completely or not at all. Worker processes starting at the
+same time queue on the write lock, and the ones that get it after the first
+find the version already current and do nothing. Finding out whether
+anything is pending is a single PRAGMA read, cheap enough for every start.
+"""
+from collections import namedtuple
+
+Migration = namedtuple('Migration', ['version', 'description', 'apply'])
+
+
+def schema_version(conn):
+    return conn.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def pending(conn, migrations):
+    version = schema_version(conn)
+    return [m for m in migrations if m.version > version]
+
+
+def migrate(engine, migrations, target=None):
+    """Apply the pending `migrations` up to `target` (all by default); return those applied.
+
+    `engine` must begin its transactions with the write lock, or two
+    processes could both read an old version and apply the same step.
+    """
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if target is not None and migration.version > target:
+            break
+        with engine.begin() as conn:
+            if schema_version(conn) >= migration.version:
+                continue
+            migration.apply(conn)
+            conn.exec_driver_sql(f'PRAGMA user_version = {int(migration.version)}')
+        applied.append(migration)
+    return applied
@@ -0,0 +1,158 @@
+"""Cache for rendered report HTML.
+
+Keys are tuples that already name the data they were rendered from (the
+report, the entity and the table versions), so entries never need to be
+invalidated: a change produces a new key and the old entry ages out of the
+LRU. An optional directory backend shares rendered pages between worker
+processes; the in-memory LRU sits in front of it.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """Least-recently-used dict bounded by entry count."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskBackend:
+    """One file per entry in `directory`, oldest files pruned past `max_entries`.
+
+    Writes go to a temporary file renamed into place, so a reader in another
+    process sees either the whole page or no file at all.
+    """
+
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.html')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = f.read()
+            # Reads refresh the mtime so pruning drops the least recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def set(self, key, value):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(tmp, self._path(key))
+        self._prune()
+
+    def _files(self):
+        with os.scandir(self.directory) as entries:
+            return [e for e in entries if e.name.endswith('.html')]
+
+    def _prune(self):
+        files = self._files()
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+        for entry in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for entry in self._files():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        return len(self._files())
+
+
+class RenderCache:
+    """Memory LRU in front of an optional shared disk backend, with hit statistics."""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.memory_hits += 1
+                return value
+        value = self.disk.get(key) if self.disk is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            stats = {
+                'entries': len(self.memory),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.memory.evictions,
+                'hit_rate': round(hits / lookups, 3) if lookups else None,
+            }
+        if self.disk is not None:
+            stats['disk_entries'] = len(self.disk)
+            stats['disk_evictions'] = self.disk.evictions
+        return stats
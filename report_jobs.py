@@ -0,0 +1,162 @@
+"""Background report builds shared through a job directory.
+
+A job's id is a hash of what it builds (report, format, parameters and data
+version), and its state lives in ``<id>.json`` next to the finished
+artifact. Any worker process can therefore report progress or serve the
+file, identical submissions land on the same job, and a finished artifact
+doubles as the cache for the next identical request. Claiming a job
+creates its status file with O_EXCL, so only one submitter starts a build.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 0.5
+
+
+def job_id(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class JobQueue:
+    """Runs report builds on a thread pool and tracks them in `directory`.
+
+    `stale_after` seconds without a status update marks a running job as
+    abandoned (its worker process died), so the next submit starts it again.
+    Artifacts and status files older than `keep_for` seconds are removed.
+    """
+
+    def __init__(self, directory, workers=2, stale_after=600, keep_for=86400):
+        self.directory = directory
+        self.workers = workers
+        self.stale_after = stale_after
+        self.keep_for = keep_for
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _status_path(self, job):
+        return os.path.join(self.directory, job + '.json')
+
+    def artifact_path(self, job, fmt):
+        return os.path.join(self.directory, f'{job}.{fmt}')
+
+    def status(self, job):
+        """Return the job's status dict, or None if it is unknown here."""
+        try:
+            with open(self._status_path(job)) as f:
+                status = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Claimed, but the first status has not been written yet
+            status = {'id': job, 'status': 'queued', 'rows': 0}
+        if status['status'] in ('queued', 'running') and self._age(job) > self.stale_after:
+            status['status'] = 'stale'
+        elif status['status'] == 'done' and not os.path.exists(self.artifact_path(job, status['fmt'])):
+            status['status'] = 'expired'
+        return status
+
+    def _age(self, job):
+        try:
+            return time.time() - os.stat(self._status_path(job)).st_mtime
+        except FileNotFoundError:
+            return 0
+
+    def _write_status(self, job, **status):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(status, id=job, updated_at=time.time()), f)
+        os.replace(tmp, self._status_path(job))
+
+    def _claim(self, job):
+        try:
+            os.close(os.open(self._status_path(job), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def submit(self, job, fmt, filename, build):
+        """Start `build(path, progress)` unless the job already exists; return its status.
+
+        `build` writes the artifact to `path` and calls ``progress(rows)``
+        as it goes. Finished, queued and running jobs are returned as they
+        are; failed, stale and expired ones are started again.
+        """
+        self.prune()
+        for _ in range(2):
+            if self._claim(job):
+                break
+            status = self.status(job)
+            if status is not None and status['status'] not in ('failed', 'stale', 'expired'):
+                return status
+            try:
+                os.remove(self._status_path(job))
+            except FileNotFoundError:
+                pass
+        else:
+            return self.status(job)
+
+        self._write_status(job, status='queued', fmt=fmt, filename=filename, rows=0,
+                           submitted_at=time.time())
+        self._pool().submit(self._run, job, fmt, filename, build)
+        return self.status(job)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='report-job')
+            return self._executor
+
+    def _run(self, job, fmt, filename, build):
+        started = time.time()
+        state = {'rows': 0, 'written_at': 0}
+
+        def progress(rows):
+            state['rows'] = rows
+            now = time.monotonic()
+            if now - state['written_at'] >= PROGRESS_INTERVAL:
+                state['written_at'] = now
+                self._write_status(job, status='running', fmt=fmt, filename=filename, rows=rows,
+                                   started_at=started)
+
+        path = self.artifact_path(job, fmt)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        os.close(fd)
+        try:
+            progress(0)
+            build(tmp, progress)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.exception('Report job %s failed', job)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            self._write_status(job, status='failed', fmt=fmt, filename=filename, rows=state['rows'],
+                               error=str(e), started_at=started, finished_at=time.time())
+            return
+        self._write_status(job, status='done', fmt=fmt, filename=filename, rows=state['rows'],
+                           size=os.path.getsize(path), started_at=started, finished_at=time.time())
+
+    def prune(self):
+        """Delete artifacts and finished status files older than keep_for."""
+        cutoff = time.time() - self.keep_for
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,145 @@
+"""SQLite FTS5 search index over vehicles, drivers and assignments.
+
+Each entity has its own FTS5 table whose rowid is the id of the source
+row. Vehicles are keyed by plate and their implicit rowid may change on
+VACUUM, so they get an id from a ``<table>_key`` table instead, whose
+INTEGER PRIMARY KEY does not. Triggers on the source tables keep the index
+in sync, so form saves, bulk imports and raw SQL writes are all indexed
+without help from the ORM.
+"""
+import json
+import re
+
+from sqlalchemy import text
+
+# name: (indexed columns, source table, their values, source key or None when
+# the source's rowid is its INTEGER PRIMARY KEY)
+SEARCH_TABLES = {
+    'vehicle_fts': (
+        'plate_number, plate_compact, chasis, make, model',
+        'vehicle',
+        "new.plate_number, replace(new.plate_number, '-', ''), new.chasis, new.make, new.model",
+        'plate_number',
+    ),
+    'driver_fts': (
+        'name, id_number, phone',
+        'driver',
+        'new.name, new.id_number, new.phone',
+        None,
+    ),
+    'assignment_fts': (
+        'work_place',
+        'assignment',
+        'new.work_place',
+        None,
+    ),
+}
+
+SEARCH_SQL = text('''
+    SELECT kind, key, label, detail, rank FROM (
+        SELECT 'vehicle' AS kind, v.plate_number AS key, v.plate_number AS label,
+               trim(coalesce(v.make, '') || ' ' || coalesce(v.model, '')) AS detail,
+               bm25(vehicle_fts) AS rank
+        FROM vehicle_fts JOIN vehicle_fts_key k ON k.id = vehicle_fts.rowid
+        JOIN vehicle v ON v.plate_number = k.plate_number
+        WHERE vehicle_fts MATCH :query
+        UNION ALL
+        SELECT 'driver', d.id, d.name,
+               trim(coalesce(d.id_number, '') || ' ' || coalesce(d.phone, '')),
+               bm25(driver_fts)
+        FROM driver_fts JOIN driver d ON d.id = driver_fts.rowid
+        WHERE driver_fts MATCH :query
+        UNION ALL
+        SELECT 'assignment', a.id, a.work_place, coalesce(a.plate_number, ''),
+               bm25(assignment_fts)
+        FROM assignment_fts JOIN assignment a ON a.id = assignment_fts.rowid
+        WHERE assignment_fts MATCH :query
+    )
+    WHERE kind IN (SELECT value FROM json_each(:kinds))
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+''')
+
+
+def _schema_statements(name, columns, source, values, key):
+    yield (f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+           f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+    if key is None:
+        add = f"INSERT INTO {name}(rowid, {columns}) VALUES (new.rowid, {values});"
+        remove = f"DELETE FROM {name} WHERE rowid = old.rowid;"
+    else:
+        yield f"CREATE TABLE IF NOT EXISTS {name}_key (id INTEGER PRIMARY KEY, {key} TEXT NOT NULL UNIQUE)"
+        add = (f"INSERT INTO {name}_key({key}) VALUES (new.{key}); "
+               f"INSERT INTO {name}(rowid, {columns}) VALUES (last_insert_rowid(), {values});")
+        remove = (f"DELETE FROM {name} WHERE rowid = (SELECT id FROM {name}_key WHERE {key} = old.{key}); "
+                  f"DELETE FROM {name}_key WHERE {key} = old.{key};")
+    yield f"CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {source} BEGIN {add} END"
+    yield f"CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON {source} BEGIN {remove} END"
+    yield f"CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE ON {source} BEGIN {remove} {add} END"
+
+
+def _backfill_statements(name, columns, source, values, key):
+    if key is None:
+        yield (f"INSERT INTO {name}(rowid, {columns}) "
+               f"SELECT rowid, {values.replace('new.', '')} FROM {source}")
+    else:
+        yield f"INSERT INTO {name}_key({key}) SELECT {key} FROM {source}"
+        yield (f"INSERT INTO {name}(rowid, {columns}) "
+               f"SELECT k.id, {values.replace('new.', source + '.')} "
+               f"FROM {source} JOIN {name}_key k ON k.{key} = {source}.{key}")
+
+
+def ensure_search_index(conn):
+    """Create the FTS tables and triggers, filling any table that is new."""
+    existing = {row[0] for row in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for name, spec in SEARCH_TABLES.items():
+        for statement in _schema_statements(name, *spec):
+            conn.exec_driver_sql(statement)
+        if name not in existing:
+            for statement in _backfill_statements(name, *spec):
+                conn.exec_driver_sql(statement)
+
+
+def drop_search_table(conn, name):
+    """Drop one FTS table with its triggers and key table, for ensure_search_index to rebuild."""
+    for trigger in ('ai', 'ad', 'au'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}_{trigger}')
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {name}')
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {name}_key')
+
+
+def rebuild_search_index(conn):
+    """Refill every FTS table from its source table."""
+    for name, spec in SEARCH_TABLES.items():
+        conn.exec_driver_sql(f'DELETE FROM {name}')
+        if spec[3] is not None:
+            conn.exec_driver_sql(f'DELETE FROM {name}_key')
+        for statement in _backfill_statements(name, *spec):
+            conn.exec_driver_sql(statement)
+
+
+def match_query(phrase, prefix=True):
+    """Turn user input into an FTS5 MATCH expression.
+
+    Every word must match, as a prefix when `prefix` is set so partial input
+    works for typeahead. Quoting each word keeps FTS5 operators in the input
+    from being interpreted.
+    """
+    words = re.findall(r'\w+', phrase or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' if prefix else f'"{word}"' for word in words)
+
+
+def search(conn, phrase, kinds=('vehicle', 'driver', 'assignment'), limit=20, offset=0, prefix=True):
+    """Return ranked (kind, key, label, detail, rank) rows matching `phrase`."""
+    query = match_query(phrase, prefix)
+    if query is None:
+        return []
+    return conn.execute(SEARCH_SQL, {
+        'query': query,
+        'kinds': json.dumps(list(kinds)),
+        'limit': limit,
+        'offset': offset,
+    }).all()
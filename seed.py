@@ -0,0 +1,174 @@
+"""Synthetic fleet data for load testing.
+
+Generators yield plain row dicts for the vehicle, driver, compliance,
+maintenance, assignment and fuel log tables, so callers can insert them in chunks
+with executemany. Enum values are passed in by the caller to keep this
+module free of the models. The same seed always produces the same fleet.
+"""
+import random
+from datetime import date, timedelta
+
+MAKES = {
+    'Toyota': ('Land Cruiser', 'Hilux', 'Prado', 'Corolla'),
+    'Nissan': ('Patrol', 'Navara', 'Hardbody'),
+    'Mitsubishi': ('L200', 'Pajero'),
+    'Isuzu': ('D-Max', 'NPR'),
+    'Ford': ('Ranger', 'Everest'),
+}
+# (lat, lon) of each work place; assignment positions are scattered around them
+SITES = {
+    'Addis Ababa': (9.03, 38.74), 'Bahirdar': (11.59, 37.39), 'Hawassa': (7.06, 38.48),
+    'Mekelle': (13.50, 39.47), 'Adama': (8.54, 39.27), 'Dire Dawa': (9.59, 41.87),
+    'Gondar': (12.61, 37.47), 'Jimma': (7.67, 36.83), 'Dessie': (11.13, 39.63),
+    'Gambela': (8.25, 34.59), 'Semera': (11.79, 41.01), 'Jijiga': (9.35, 42.80),
+}
+SITE_SPREAD = 0.3  # degrees either way, about 33 km
+WORK_PLACES = tuple(SITES)
+FIRST_NAMES = ('Abebe', 'Almaz', 'Biniam', 'Chaltu', 'Dawit', 'Eden', 'Fikru', 'Genet',
+               'Hailu', 'Hana', 'Kebede', 'Lemlem', 'Meron', 'Mulugeta', 'Selam', 'Tesfaye',
+               'Tigist', 'Yonas', 'Zewdu', 'Abrham')
+LAST_NAMES = ('Alemu', 'Bekele', 'Desta', 'Gebre', 'Haile', 'Kassa', 'Mengistu', 'Negash',
+              'Tadesse', 'Tesfaye', 'Wolde', 'Worku', 'Yohannes', 'Zeleke')
+DAY_ZERO = date(2015, 1, 1)
+
+
+def plate_number(index):
+    return f'ET-{index % 5 + 1:02d}-{index:06d}'
+
+
+def vehicles(count, options, rng, consumption):
+    """Yield vehicle rows; `options` holds the enum tuples by column name."""
+    for index in range(count):
+        make = rng.choice(list(MAKES))
+        yield {
+            'plate_number': plate_number(index),
+            'chasis': f'CH{index:010d}',
+            'vehicle_type': rng.choice(options['vehicle_type']),
+            'make': make,
+            'model': rng.choice(MAKES[make]),
+            'year': str(rng.randint(2005, 2025)),
+            'fuel_type': rng.choice(options['fuel_type']),
+            'fuel_capacity': float(rng.choice((60, 80, 90, 130))),
+            'fuel_consumption': consumption[index],
+            'loading_capacity': f'{rng.choice((500, 1000, 1500, 3000))} kg',
+            'assigned_for': rng.choice(options['assigned_for']),
+        }
+
+
+def drivers(count, rng):
+    for index in range(count):
+        yield {
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'id_number': f'EMP{index:07d}',
+            'phone': f'09{rng.randint(10000000, 99999999)}',
+            'reporting_to': rng.choice(WORK_PLACES),
+        }
+
+
+def compliance(count, options, rng, today):
+    for index in range(count):
+        yield {
+            'plate_number': plate_number(index),
+            'insurance_type': rng.choice(options['insurance_type']),
+            'insurance_date': today - timedelta(days=rng.randint(-60, 400)),
+            'yearly_inspection': rng.choice(options['yearly_inspection']),
+            'inspection_date': today - timedelta(days=rng.randint(-60, 400)),
+            'safety_audit': rng.choice(options['safety_audit']),
+            'utilization_history': None,
+            'accident_history': None,
+        }
+
+
+def maintenance(count, per_vehicle, options, rng, today):
+    """Yield a service history per vehicle, oldest first, the last one due next."""
+    span = (today - DAY_ZERO).days
+    for index in range(count):
+        km = rng.randint(0, 20000)
+        day = rng.randint(0, 180)
+        interval = max(span // max(per_vehicle, 1), 30)
+        for _ in range(per_vehicle):
+            km += rng.randint(3000, 12000)
+            served = DAY_ZERO + timedelta(days=min(day, span))
+            yield {
+                'plate_number': plate_number(index),
+                'last_service_km': km,
+                'last_service_date': served,
+                'next_service_km': km + 5000,
+                'next_service_date': served + timedelta(days=90),
+                'maintenance_center': rng.choice(options['maintenance_center']),
+            }
+            day += rng.randint(interval // 2, interval)
+
+
+def assignments(count, per_vehicle, driver_count, rng, today, active_share=0.7):
+    """Yield back-to-back assignments per vehicle, each placed near its work place.
+
+    Most vehicles end on an open assignment so active-assignment lookups
+    have realistic selectivity. Each vehicle keeps one driver, so no driver
+    is double-booked as long as there are at least as many drivers as vehicles.
+    """
+    span = (today - DAY_ZERO).days
+    for index in range(count):
+        start = rng.randint(0, 90)
+        length = max(span // max(per_vehicle, 1), 2)
+        active = rng.random() < active_share
+        for number in range(per_vehicle):
+            start = min(start, span - 1)
+            end = min(start + rng.randint(length // 2, length), span - 1)
+            last = number == per_vehicle - 1
+            work_place = rng.choice(WORK_PLACES)
+            lat, lon = SITES[work_place]
+            yield {
+                'plate_number': plate_number(index),
+                'driver_id': index % driver_count + 1,
+                'work_place': work_place,
+                'start_date': DAY_ZERO + timedelta(days=start),
+                'end_date': None if last and active else DAY_ZERO + timedelta(days=end),
+                'gps_position': f'{lat + rng.uniform(-SITE_SPREAD, SITE_SPREAD):.5f},'
+                                f'{lon + rng.uniform(-SITE_SPREAD, SITE_SPREAD):.5f}',
+                'geofence_violations': 0,
+            }
+            start = end + 1
+
+
+def fuel_logs(count, per_vehicle, consumption, rng, today, anomaly_share=0.02):
+    """Yield roughly weekly fill-ups per vehicle up to today, close to its rated km/l.
+
+    A small share of fills is a third off either way so anomaly lists are
+    not empty.
+    """
+    for index in range(count):
+        km = rng.randint(20000, 200000)
+        day = today - timedelta(days=per_vehicle * 7)
+        for _ in range(per_vehicle):
+            liters = round(rng.uniform(30, 80), 1)
+            economy = consumption[index] * rng.uniform(0.9, 1.1)
+            if rng.random() < anomaly_share:
+                economy *= rng.choice((0.6, 1.7))
+            km += round(liters * economy)
+            day = min(day + timedelta(days=rng.randint(4, 10)), today)
+            yield {
+                'plate_number': plate_number(index),
+                'filled_on': day,
+                'liters': liters,
+                'odometer_km': km,
+                'station': rng.choice(WORK_PLACES),
+                'cost': round(liters * rng.uniform(70, 80), 2),
+            }
+
+
+def fleet(vehicle_count, driver_count, assignments_per_vehicle, maintenance_per_vehicle,
+          options, seed=0, today=None, fuel_per_vehicle=20):
+    """Return ``(table, rows)`` pairs in foreign-key order."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    # Rated km/l is drawn up front so fill-ups can follow each vehicle's rating
+    consumption = [round(rng.uniform(6, 18), 1) for _ in range(vehicle_count)]
+    return [
+        ('vehicle', vehicles(vehicle_count, options, rng, consumption)),
+        ('driver', drivers(driver_count, rng)),
+        ('compliance', compliance(vehicle_count, options, rng, today)),
+        ('maintenance', maintenance(vehicle_count, maintenance_per_vehicle, options, rng, today)),
+        ('assignment', assignments(vehicle_count, assignments_per_vehicle, driver_count, rng, today)),
+        ('fuel_log', fuel_logs(vehicle_count, fuel_per_vehicle, consumption, rng, today)),
+    ]
@@ -0,0 +1,154 @@
+"""Read-only copies of the database for reporting.
+
+A snapshot is taken with SQLite's online backup API in a single step, so
+the whole copy is read inside one read transaction of the source: it holds
+exactly one committed state, and in WAL mode writers carry on while it is
+made. The copy is written to a temporary file, switched out of WAL and
+renamed over the previous snapshot, so readers that already opened the old
+file finish on it. Its mtime is set to the moment the copy began, which is
+what `taken_at` reports.
+
+Refreshes are claimed with an O_EXCL lock file next to the snapshot, so
+when several worker processes find it stale only one of them copies.
+"""
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FIRST_SNAPSHOT_WAIT = 120
+
+
+class Snapshot:
+    """Snapshot of the database file `source` kept at `path`.
+
+    `max_age` seconds after it was taken a snapshot counts as stale and the
+    next `ensure` refreshes it in the background, serving the old copy
+    meanwhile. A lock file untouched for `stale_lock_after` seconds belonged
+    to a process that died while copying and is taken over.
+    """
+
+    def __init__(self, source, path, max_age=300, stale_lock_after=600, busy_timeout=30):
+        self.source = source
+        self.path = path
+        self.max_age = max_age
+        self.stale_lock_after = stale_lock_after
+        self.busy_timeout = busy_timeout
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def _lock_path(self):
+        return self.path + '.lock'
+
+    def identity(self):
+        """(inode, mtime_ns) of the current snapshot file, or None before the first one.
+
+        Changes whenever a refresh replaces the file.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def taken_at(self):
+        identity = self.identity()
+        return identity[1] / 1e9 if identity else None
+
+    @property
+    def refreshing(self):
+        return self._thread is not None and self._thread.is_alive() or os.path.exists(self._lock_path)
+
+    def status(self):
+        taken_at = self.taken_at()
+        return {
+            'taken_at': taken_at,
+            'age_seconds': round(time.time() - taken_at, 1) if taken_at else None,
+            'max_age_seconds': self.max_age,
+            'size_bytes': os.path.getsize(self.path) if taken_at else None,
+            'refreshing': self.refreshing,
+        }
+
+    def ensure(self):
+        """Make sure a snapshot exists; refresh it in the background once it is stale.
+
+        Only the very first snapshot is taken (or waited for) in the caller's
+        thread.
+        """
+        taken_at = self.taken_at()
+        if taken_at is None:
+            self._take_first()
+        elif time.time() - taken_at > self.max_age:
+            self.refresh_in_background()
+
+    def _take_first(self):
+        deadline = time.time() + FIRST_SNAPSHOT_WAIT
+        while not self.take() and self.taken_at() is None:
+            # Another process is taking it
+            if time.time() > deadline:
+                raise TimeoutError(f'No report snapshot at {self.path} after {FIRST_SNAPSHOT_WAIT}s')
+            time.sleep(0.1)
+
+    def refresh_in_background(self):
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refresh, name='report-snapshot', daemon=True)
+            self._thread.start()
+
+    def _refresh(self):
+        try:
+            self.take()
+        except Exception:
+            logger.exception('Report snapshot refresh failed')
+
+    def take(self):
+        """Copy the database now. Returns False when another process holds the refresh lock."""
+        if not self._claim():
+            return False
+        try:
+            self._copy()
+        finally:
+            os.remove(self._lock_path)
+        return True
+
+    def _claim(self):
+        for _ in range(2):
+            try:
+                os.close(os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(self._lock_path).st_mtime < self.stale_lock_after:
+                        return False
+                    os.remove(self._lock_path)
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def _copy(self):
+        started = time.time()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        os.close(fd)
+        try:
+            source = sqlite3.connect(self.source, timeout=self.busy_timeout)
+            target = sqlite3.connect(tmp)
+            try:
+                # pages=-1: one step, one read transaction, one consistent state
+                source.backup(target, pages=-1)
+                # Readers open the copy immutable, without a -wal or -shm file
+                target.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                target.close()
+                source.close()
+            os.utime(tmp, (started, started))
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        logger.info('Report snapshot taken in %.1fs: %s', time.time() - started, self.path)
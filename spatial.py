@@ -0,0 +1,161 @@
+"""Nearest-point search over a grid stored in SQLite.
+
+Positions are bucketed into cells of ``CELL_DEGREES`` on a side, and each
+cell gets a Z-order key that interleaves the bits of its row and column.
+The cells of any aligned block of 2^level x 2^level cells then have
+consecutive keys, so the 3 x 3 blocks around a site are at most nine
+ranges of one integer index. A search reads that neighbourhood at the
+smallest level and moves up a level (doubling the block size) until the
+k-th match is nearer than anything outside the neighbourhood can be. It
+never misses a point, however unevenly the fleet is spread; a sparse area
+only costs a few more levels, and level ``LEVELS`` covers the whole grid.
+
+Each position is also stored as a unit vector. The straight-line (chord)
+distance between two unit vectors orders points exactly as the
+great-circle distance does, and it needs only arithmetic, so SQLite ranks
+the candidates of a neighbourhood itself and hands back the nearest few.
+"""
+import math
+from collections import namedtuple
+
+from lazy import lazy_module
+
+np = lazy_module('numpy')
+
+CELL_DEGREES = 0.01  # about 1.1 km north-south
+ROWS = round(180 / CELL_DEGREES)
+COLUMNS = round(360 / CELL_DEGREES)
+LEVELS = max(ROWS, COLUMNS).bit_length()
+EARTH_RADIUS_KM = 6371.0088
+
+Region = namedtuple('Region', ['box', 'ranges'])
+
+
+def parse_position(text):
+    """Return (lat, lon) from a "lat,long" string in decimal degrees; ValueError otherwise."""
+    parts = text.split(',')
+    if len(parts) != 2:
+        raise ValueError(f'Expected "lat,long", got {text!r}')
+    lat, lon = float(parts[0]), float(parts[1])
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f'{text!r} is outside -90..90, -180..180')
+    return lat, lon
+
+
+def grid_cell(lat, lon):
+    """(row, column) of the cell holding a point."""
+    return (min(int((lat + 90) / CELL_DEGREES), ROWS - 1),
+            min(int((lon + 180) / CELL_DEGREES), COLUMNS - 1))
+
+
+def _spread(value):
+    """Move bit i of `value` to bit 2i."""
+    spread = 0
+    for bit in range(LEVELS):
+        spread |= (value >> bit & 1) << 2 * bit
+    return spread
+
+
+def cell_key(row, column):
+    return _spread(column) | _spread(row) << 1
+
+
+def unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def chord_to_km(squared_chord):
+    """Great-circle distance for a squared chord between unit vectors."""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(max(squared_chord, 0)) / 2, 1))
+
+
+def distances_km(lat, lon, lats, lons):
+    """Great-circle distances from one point to arrays of points (haversine)."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def region(row, column, level):
+    """The 3 x 3 blocks of 2^level cells around a cell, clipped to the grid.
+
+    `box` holds the inclusive ``(first_row, last_row, first_column,
+    last_column)`` cells they cover and `ranges` the merged inclusive
+    ``[first_key, last_key]`` ranges of their cells.
+    """
+    block_row, block_column = row >> level, column >> level
+    rows = range(max(block_row - 1, 0), min(block_row + 1, (ROWS - 1) >> level) + 1)
+    columns = range(max(block_column - 1, 0), min(block_column + 1, (COLUMNS - 1) >> level) + 1)
+    size = 4 ** level
+    ranges = []
+    for first in sorted(cell_key(r << level, c << level) for r in rows for c in columns):
+        if ranges and first == ranges[-1][1] + 1:
+            ranges[-1][1] += size
+        else:
+            ranges.append([first, first + size - 1])
+    box = (rows[0] << level, min((rows[-1] + 1 << level) - 1, ROWS - 1),
+           columns[0] << level, min((columns[-1] + 1 << level) - 1, COLUMNS - 1))
+    return Region(box, ranges)
+
+
+def clearance_km(lat, lon, box):
+    """Lower bound on the distance from a point inside `box` to any point outside it.
+
+    Infinite once the box covers the whole grid. The grid does not wrap at
+    the antimeridian, so a box clipped there only counts the distance to
+    that meridian and the search goes on to the far side.
+    """
+    first_row, last_row, first_column, last_column = box
+    bounds = []
+    if first_row > 0:
+        bounds.append(math.radians(lat - (first_row * CELL_DEGREES - 90)) * EARTH_RADIUS_KM)
+    if last_row < ROWS - 1:
+        bounds.append(math.radians((last_row + 1) * CELL_DEGREES - 90 - lat) * EARTH_RADIUS_KM)
+    if first_column > 0 or last_column < COLUMNS - 1:
+        west = lon - (first_column * CELL_DEGREES - 180) if first_column > 0 else lon + 180
+        east = (last_column + 1) * CELL_DEGREES - 180 - lon if last_column < COLUMNS - 1 else 180 - lon
+        for gap in (west, east):
+            # Distance to the meridian `gap` degrees away; past 90 degrees the pole is nearer
+            bounds.append(EARTH_RADIUS_KM * math.asin(
+                math.cos(math.radians(lat)) * math.sin(math.radians(min(gap, 90)))))
+    return min(bounds) if bounds else math.inf
+
+
+def nearest(lat, lon, k, fetch):
+    """The `k` matching points nearest to (lat, lon) as ``(distance_km, row)`` pairs, nearest first.
+
+    ``fetch(ranges, vector, limit)`` returns the `limit` points with a cell
+    key in `ranges` nearest to the unit `vector`, nearest first, as
+    ``(squared_chord, matches, row)`` where `matches` tells whether the row
+    passes the caller's filters. When fewer than `k` of them match, the same
+    neighbourhood is read again with four times the limit. Also returns the
+    number of fetches and the radius in km known to hold no other match,
+    None when the whole grid was read.
+    """
+    row, column = grid_cell(lat, lon)
+    vector = unit_vector(lat, lon)
+    level, limit, fetches = 0, 4 * k, 0
+    while True:
+        box, ranges = region(row, column, level)
+        points = fetch(ranges, vector, limit)
+        fetches += 1
+        matches = [(squared_chord, point) for squared_chord, ok, point in points if ok]
+        reach = clearance_km(lat, lon, box)
+        if len(matches) >= k:
+            farthest = chord_to_km(matches[k - 1][0])
+            if farthest <= reach:
+                return ([(chord_to_km(c), point) for c, point in matches[:k]], fetches,
+                        None if reach == math.inf else reach)
+            # Go straight to the first level whose neighbourhood settles the k-th match
+            level += 1
+            while clearance_km(lat, lon, region(row, column, level).box) < farthest:
+                level += 1
+        elif len(points) == limit:
+            # The filters rejected most of the nearest points; rank more of them
+            limit *= 4
+        elif reach == math.inf:
+            return [(chord_to_km(c), point) for c, point in matches], fetches, None
+        else:
+            level += 1
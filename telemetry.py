@@ -0,0 +1,148 @@
+"""In-process queue and background writer for GPS telemetry.
+
+Web requests only validate readings and offer them to a bounded queue; a
+single writer thread drains the queue and hands large batches to a write
+function, so SQLite sees a few big transactions instead of one per request.
+"""
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+Reading = namedtuple('Reading', ['plate_number', 'recorded_at', 'lat', 'lon', 'speed', 'odometer_km'])
+
+
+def parse_reading(item):
+    """Build a Reading from one JSON object, raising ValueError when invalid."""
+    if not isinstance(item, dict):
+        raise ValueError('each reading must be an object')
+    plate = str(item.get('plate') or '').upper().strip()
+    if not plate:
+        raise ValueError('plate is required')
+
+    stamp = item.get('timestamp')
+    if isinstance(stamp, (int, float)):
+        recorded_at = datetime.fromtimestamp(stamp, timezone.utc)
+    elif isinstance(stamp, str) and stamp:
+        recorded_at = datetime.fromisoformat(stamp)
+    else:
+        raise ValueError('timestamp is required')
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    try:
+        lat = float(item['lat'])
+        lon = float(item['lon'])
+        speed = float(item['speed']) if item.get('speed') is not None else None
+        odometer = int(item['odometer']) if item.get('odometer') is not None else None
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('lat, lon, speed and odometer must be numbers')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('lat/lon out of range')
+    if odometer is not None and odometer < 0:
+        raise ValueError('odometer must not be negative')
+    return Reading(plate, recorded_at, lat, lon, speed, odometer)
+
+
+class TelemetryWriter:
+    """Bounded reading queue drained by a background thread.
+
+    `write_batch` is called from the writer thread with a list of readings,
+    must commit them itself and returns how many it stored. `offer` never
+    blocks: it refuses a whole batch when the queue lacks room, which
+    callers turn into backpressure.
+    """
+
+    def __init__(self, write_batch, capacity=100000, batch_size=5000, flush_interval=0.5):
+        self._write_batch = write_batch
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_batch_seconds = None
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def offer(self, readings):
+        """Queue all readings and return True, or none of them and return False."""
+        with self._cond:
+            if len(self._queue) + len(readings) > self.capacity:
+                self.rejected += len(readings)
+                return False
+            self._queue.extend(readings)
+            self.accepted += len(readings)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+                self._thread.start()
+
+    def _take(self):
+        with self._cond:
+            if len(self._queue) < self.batch_size and not self._stopping:
+                self._cond.wait(self.flush_interval)
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch:
+                self._flush(batch)
+            elif self._stopping:
+                return
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        try:
+            stored = self._write_batch(batch)
+            self.written += stored
+            self.dropped += len(batch) - stored
+            self.batches += 1
+        except Exception:
+            self.failures += 1
+            logger.exception('Failed to write %d telemetry readings', len(batch))
+        self.last_batch_seconds = time.perf_counter() - started
+
+    def stop(self, timeout=10):
+        """Write whatever is queued and stop the writer thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queue_depth': self.depth,
+            'capacity': self.capacity,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'failures': self.failures,
+            'last_batch_seconds': self.last_batch_seconds,
+        }
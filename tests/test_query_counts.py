@@ -0,0 +1,55 @@
+"""SQL statements per route must not grow with the size of the fleet.
+
+Each route is requested against a small and a larger seeded fleet, each in
+its own process so no cache or module state carries over, and must issue
+the same number of statements on both. A lazy load inside a loop shows up
+as a difference here even while the route is still under its budget.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = (50, 2000)
+# The nearest-vehicle search reads the grid a level at a time until it has
+# enough vehicles, so its count follows how dense the fleet is around the
+# site, not how many rows there are; it only has to stay within budget
+LAYOUT_DEPENDENT = {'nearest_vehicles'}
+
+
+def flask(database, *args):
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + database)
+    result = subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', *args],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+@pytest.fixture(scope='module')
+def counts(tmp_path_factory):
+    measured = {}
+    for size in SIZES:
+        database = str(tmp_path_factory.mktemp(f'fleet{size}') / 'fleet.db')
+        flask(database, 'seed', '--vehicles', str(size))
+        measured[size] = json.loads(flask(database, 'query-counts'))
+    return measured
+
+
+def test_every_route_succeeds_within_budget(counts):
+    for size, routes in counts.items():
+        for name, route in routes.items():
+            assert route['status'] < 400, f'{name} returned HTTP {route["status"]} with {size} vehicles'
+            assert route['statements'] <= route['budget'], (
+                f'{name} issued {route["statements"]} statements with {size} vehicles, budget {route["budget"]}')
+
+
+def test_statement_counts_do_not_grow_with_the_fleet(counts):
+    small, large = (counts[size] for size in SIZES)
+    assert small.keys() == large.keys()
+    grown = {name: (small[name]['statements'], large[name]['statements'])
+             for name in small if name not in LAYOUT_DEPENDENT
+             and small[name]['statements'] != large[name]['statements']}
+    assert not grown, f'statements with {SIZES[0]} vs {SIZES[1]} vehicles: {grown}'
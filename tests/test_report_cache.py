@@ -0,0 +1,50 @@
+"""Cached report pages that depend on the day must not outlive it.
+
+Which assignments are active is decided against today's date, which no
+table version tracks, so these pages are cached per day. Moving the date
+forward past an assignment's end must give a freshly built page.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+import app as fleet_app
+from app import create_app, db, Vehicle, Driver, Assignment
+
+TODAY = date.today()
+
+
+class Tomorrow(date):
+    @classmethod
+    def today(cls):
+        return TODAY + timedelta(days=1)
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "fleet.db"}'})
+    with app.app_context():
+        driver = Driver(name='Abebe Kebede', id_number='D-1')
+        db.session.add_all([
+            Vehicle(plate_number='AA-1', chasis='CH-1', vehicle_type='Pickup', make='Toyota', model='Hilux',
+                    fuel_type='Diesel', assigned_for=fleet_app.ASSIGNMENT_TYPES[0]),
+            driver,
+        ])
+        db.session.flush()
+        # Active through today, over from tomorrow
+        db.session.add(Assignment(plate_number='AA-1', driver_id=driver.id, work_place='Addis Ababa',
+                                  start_date=TODAY - timedelta(days=7), end_date=TODAY, geofence_violations=0))
+        db.session.commit()
+    return app.test_client()
+
+
+def test_unassigned_vehicles_report_follows_the_date(client, monkeypatch):
+    assert b'AA-1' not in client.get('/reports/unassigned-vehicles').data
+    monkeypatch.setattr(fleet_app, 'date', Tomorrow)
+    assert b'AA-1' in client.get('/reports/unassigned-vehicles').data
+
+
+def test_driver_assignments_report_follows_the_date(client, monkeypatch):
+    assert b'AA-1' in client.get('/reports/driver-assignments').data
+    monkeypatch.setattr(fleet_app, 'date', Tomorrow)
+    assert b'AA-1' not in client.get('/reports/driver-assignments').data
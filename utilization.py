@@ -0,0 +1,114 @@
+"""Vectorized utilization arithmetic over assignment intervals.
+
+A vehicle is in use on a day when any of its assignments covers that day.
+Assignments are first merged into non-overlapping spans per vehicle, so
+overlapping or back-to-back records never count a day twice. Spans are
+turned into per-day counts with difference arrays and into per-month day
+totals by splitting them at month boundaries; neither loops over days or
+assignments in Python.
+
+Days are int64 day numbers as produced by ``availability.to_days``; open
+spans end at ``availability.OPEN_END``.
+"""
+from availability import OPEN_END
+from lazy import lazy_module
+
+np = lazy_module('numpy')
+pd = lazy_module('pandas')
+
+PERIODS = ('day', 'week', 'month')
+
+
+def merge_spans(owners, starts, ends):
+    """Merge each owner's overlapping or adjacent intervals.
+
+    Returns ``(owners, starts, ends)`` arrays, sorted by owner then start.
+    """
+    owners = np.asarray(owners, dtype=object)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if not len(owners):
+        return owners, starts, ends
+    _, rank = np.unique(owners.astype(str), return_inverse=True)
+    order = np.lexsort((starts, rank))
+    owners, rank, starts, ends = owners[order], rank[order], starts[order], ends[order]
+
+    # Running maximum of end per owner, offset by owner so one pass covers all owners
+    span = OPEN_END + 2
+    running = np.maximum.accumulate(rank.astype(np.int64) * span + ends) - rank * span
+    previous_end = np.concatenate(([-1], running[:-1]))
+    new_owner = np.concatenate(([True], rank[1:] != rank[:-1]))
+    first = new_owner | (starts > previous_end + 1)
+
+    group = np.cumsum(first) - 1
+    merged_ends = np.full(group[-1] + 1, -1, dtype=np.int64)
+    np.maximum.at(merged_ends, group, ends)
+    return owners[first], starts[first], merged_ends
+
+
+def daily_counts(starts, ends, weights=None):
+    """Number of spans covering each day, as ``(days, counts)`` with zero days left out.
+
+    `weights` (default 1 per span) lets a caller subtract old spans and add
+    new ones in one pass, so only days whose count changed come back.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if not len(starts):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    weights = np.ones(len(starts), dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+    first = starts.min()
+    size = ends.max() - first + 2
+    steps = np.bincount(starts - first, weights, minlength=size) - np.bincount(ends + 1 - first, weights, minlength=size)
+    counts = np.cumsum(steps)[:-1].astype(np.int64)
+    days = np.flatnonzero(counts)
+    return days + first, counts[days]
+
+
+def month_start(days):
+    return np.asarray(days, dtype='datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+
+
+def monthly_days(owners, starts, ends):
+    """Covered days per owner and month as a DataFrame (owner, month, days)."""
+    owners = np.asarray(owners, dtype=object)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    first_month = np.asarray(starts, dtype='datetime64[D]').astype('datetime64[M]')
+    last_month = np.asarray(ends, dtype='datetime64[D]').astype('datetime64[M]')
+    pieces = (last_month - first_month).astype(np.int64) + 1
+    span = np.repeat(np.arange(len(starts)), pieces)
+    offset = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    month = first_month[span] + offset
+    month_first = month.astype('datetime64[D]').astype(np.int64)
+    month_last = (month + 1).astype('datetime64[D]').astype(np.int64) - 1
+    days = np.minimum(ends[span], month_last) - np.maximum(starts[span], month_first) + 1
+    frame = pd.DataFrame({'owner': owners[span], 'month': month_first, 'days': days})
+    return frame.groupby(['owner', 'month'], as_index=False, sort=False)['days'].sum()
+
+
+def period_start(days, period):
+    """First day of the day, week (Monday) or month bucket holding each day."""
+    days = np.asarray(days, dtype=np.int64)
+    if period == 'day':
+        return days
+    if period == 'week':
+        # Day 0, 1970-01-01, was a Thursday
+        return days - (days + 3) % 7
+    return month_start(days)
+
+
+def open_counts(starts, first, last):
+    """Per-day number of open spans running on each day of [first, last]."""
+    starts = np.clip(np.asarray(starts, dtype=np.int64), first, None)
+    starts = starts[starts <= last]
+    return np.cumsum(np.bincount(starts - first, minlength=last - first + 1))
+
+
+def open_monthly_days(starts, months, last):
+    """Days each open span covers in each month, up to `last`, as a (spans, months) array."""
+    starts = np.asarray(starts, dtype=np.int64)[:, None]
+    months = np.asarray(months, dtype=np.int64)
+    month_last = np.minimum((months.astype('datetime64[D]').astype('datetime64[M]') + 1)
+                            .astype('datetime64[D]').astype(np.int64) - 1, last)
+    return np.clip(month_last[None, :] - np.maximum(starts, months[None, :]) + 1, 0, None)
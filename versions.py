@@ -0,0 +1,56 @@
+"""Per-table change versions kept by SQLite triggers.
+
+Every insert, update or delete on a tracked table bumps that table's row
+in ``table_version``, whatever made the change: the ORM, a bulk import or
+raw SQL. Readers compare versions to tell whether anything they derived
+from a table can still be reused, across all worker processes.
+"""
+import hashlib
+from datetime import datetime
+
+VERSIONED_TABLES = (
+    'vehicle', 'driver', 'assignment', 'maintenance', 'compliance',
+    'maintenance_schedule', 'compliance_status',
+    'utilization_span', 'utilization_day', 'utilization_month',
+    'fuel_log', 'fuel_stats', 'fuel_fleet_stats',
+)
+
+_BUMP = ("UPDATE table_version SET version = version + 1, "
+         "changed_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = '{table}';")
+
+
+def _schema_statements(table):
+    for suffix, action in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+        yield (f"CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {action} ON {table} "
+               f"BEGIN {_BUMP.format(table=table)} END")
+
+
+def ensure_version_tracking(conn):
+    """Create the version table, a row per tracked table and the triggers."""
+    conn.exec_driver_sql(
+        'CREATE TABLE IF NOT EXISTS table_version ('
+        'name VARCHAR(50) PRIMARY KEY, version INTEGER NOT NULL, changed_at VARCHAR(26) NOT NULL)')
+    for table in VERSIONED_TABLES:
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO table_version (name, version, changed_at) "
+            "VALUES (?, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))", (table,))
+        for statement in _schema_statements(table):
+            conn.exec_driver_sql(statement)
+
+
+def table_versions(conn, tables):
+    """Return ``{table: (version, changed_at)}`` with changed_at as a UTC datetime."""
+    placeholders = ', '.join('?' for _ in tables)
+    rows = conn.exec_driver_sql(
+        f'SELECT name, version, changed_at FROM table_version WHERE name IN ({placeholders})',
+        tuple(tables)).all()
+    return {name: (version, datetime.fromisoformat(changed_at)) for name, version, changed_at in rows}
+
+
+def version_key(versions):
+    """Compact string naming the state of `versions`, for cache keys and ETags."""
+    return '.'.join(f'{name}:{versions[name][0]}' for name in sorted(versions))
+
+
+def etag_for(*parts):
+    return hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()